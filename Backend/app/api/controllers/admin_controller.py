@@ -3,27 +3,20 @@ from sqlalchemy.orm import Session
 from typing import Optional
 from app.db.base import get_db
 from app.services.admin_service import ingest_products_from_excel, generate_sales_report, generate_inventory_report
-from app.api.controllers.auth_controller import oauth2_scheme
-from app.services.auth_service import get_current_user
+from app.api.deps import AdminUser
 from app.services.order_service import update_order_status
+from app.services.auth_service import revoke_tokens
 router = APIRouter()
 
 @router.post("/IngestProducts")
 async def ingest_products(
+    current_user: AdminUser,
     file: UploadFile = File(...),
-    token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
     """
     Upload an Excel file to add/update products (admin only).
     """
-    current_user = get_current_user(db, token)
-    if not current_user or current_user.role != 1:  # Admin role check
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission denied"
-        )
-    
     # Read the file content
     file_content = await file.read()
     print("hi")
@@ -41,19 +34,12 @@ async def ingest_products(
 @router.post("/AuthoriseDelivery/{order_id}")
 def authorize_delivery(
     order_id: int,
-    token: str = Depends(oauth2_scheme),
+    current_user: AdminUser,
     db: Session = Depends(get_db)
 ):
     """
     Mark an order as delivered (admin only).
     """
-    current_user = get_current_user(db, token)
-    if not current_user or current_user.role != 1:  # Admin role check
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission denied"
-        )
-    
     # Get the order and update its status to delivered (1)
     
     order = update_order_status(db, order_id=order_id, status=1)
@@ -66,5 +52,20 @@ def authorize_delivery(
     
     return {"success": True, "message": f"Order {order_id} marked as delivered"}
 
+@router.post("/RevokeTokens/{user_id}")
+def revoke_user_tokens(
+    user_id: int,
+    current_user: AdminUser,
+    db: Session = Depends(get_db)
+):
+    """
+    Invalidate every access token issued to a user (admin only).
+    """
+    version = revoke_tokens(db, user_id)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
 
-    
\ No newline at end of file
+    return {"success": True, "message": f"Tokens for user {user_id} revoked"}
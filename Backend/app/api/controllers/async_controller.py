@@ -0,0 +1,240 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.db.base import get_async_db
+from app.models.schemas import (
+    Product, Cart, CartItemBase, CartItemChange, CartItemPatch, Order, Suggestion, CategoryCount, ProductFacets,
+    ProductBatch, ProductBatchRequest, PricedCart
+)
+from app.services.product_service import (
+    get_products_json_async, get_product_json_async, get_products_by_category_json_async,
+    search_products_async, get_product_names_async, get_categories_json_async, get_facets_json_async,
+    get_products_batch_json_async
+)
+from app.services.suggest_service import get_suggestions_async
+from app.services.cart_service import (
+    get_user_cart_async, create_or_update_cart_async, change_cart_item_async, get_priced_cart_async, StaleCartVersion
+)
+from app.services.order_service import get_user_orders_async
+from app.api.deps import (
+    CurrentUser, IfNoneMatch, ProductCursor, OrderCursor, ProductIds, check_product_ids, ProductFields, OrderFields,
+    check_cart_item_patch
+)
+from app.api.responses import cart_version_conflict, catalog_response, fields_response, model_response
+from app.utils.pagination import set_next_cursor, order_sort_key
+
+# AsyncSession variants of the hot endpoints. main.py mounts these ahead of
+# the sync routers when DB_ENGINE=async so they take over the same paths.
+product_router = APIRouter()
+cart_router = APIRouter()
+order_router = APIRouter()
+
+@product_router.get("/", response_model=List[Product])
+async def read_products(
+    after: ProductCursor,
+    if_none_match: IfNoneMatch,
+    fields: ProductFields,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get list of products.
+    """
+    return catalog_response(
+        await get_products_json_async(db, skip=skip, limit=limit, after=after, fields=fields), if_none_match
+    )
+
+@product_router.get("/search", response_model=List[Product])
+async def search_products_endpoint(
+    query: str,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Search for products using a text query.
+    """
+    products = await search_products_async(db, query=query, skip=skip, limit=limit)
+    return model_response(List[Product], products)
+
+@product_router.get("/suggest", response_model=List[Suggestion])
+async def suggest_products(
+    q: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Product and category names starting with `q`, most popular first.
+    """
+    return catalog_response(await get_suggestions_async(db, query=q, limit=limit))
+
+@product_router.get("/categories", response_model=List[CategoryCount])
+async def read_categories(
+    if_none_match: IfNoneMatch,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Every category with its product and in-stock counts.
+    """
+    return catalog_response(await get_categories_json_async(db), if_none_match)
+
+@product_router.get("/facets", response_model=ProductFacets)
+async def read_facets(
+    if_none_match: IfNoneMatch,
+    category: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Product, in-stock and price band counts for a category or the whole catalog.
+    """
+    entry = await get_facets_json_async(db, category=category)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return catalog_response(entry, if_none_match)
+
+@product_router.get("/batch", response_model=ProductBatch)
+async def read_products_batch(
+    ids: ProductIds,
+    if_none_match: IfNoneMatch,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Several products by id (?ids=1,2,3), in request order, with missing ids.
+    """
+    return catalog_response(await get_products_batch_json_async(db, ids), if_none_match)
+
+@product_router.post("/batch", response_model=ProductBatch)
+async def read_products_batch_post(
+    batch: ProductBatchRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Same as GET /batch, for long id lists.
+    """
+    return catalog_response(await get_products_batch_json_async(db, check_product_ids(batch.ids)))
+
+@product_router.get("/category/{category}", response_model=List[Product])
+async def read_products_by_category(
+    category: str,
+    after: ProductCursor,
+    if_none_match: IfNoneMatch,
+    fields: ProductFields,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get products by category.
+    """
+    return catalog_response(
+        await get_products_by_category_json_async(
+            db, category=category, skip=skip, limit=limit, after=after, fields=fields
+        ),
+        if_none_match
+    )
+
+# The int convertor keeps this from shadowing the sync router's other GET paths
+@product_router.get("/{product_id:int}", response_model=Product)
+async def read_product(
+    product_id: int,
+    if_none_match: IfNoneMatch,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get a specific product by ID.
+    """
+    entry = await get_product_json_async(db, product_id=product_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return catalog_response(entry, if_none_match)
+
+@cart_router.get("/", response_model=Cart)
+async def read_cart(
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get current user's cart.
+    """
+    cart = await get_user_cart_async(db, user_id=current_user.id)
+    if not cart:
+        cart = await create_or_update_cart_async(db, current_user.id, [])
+    return cart
+
+@cart_router.get("/priced", response_model=PricedCart)
+async def read_priced_cart(
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get the current user's cart priced at current prices (see cart_controller.read_priced_cart).
+    """
+    cart = await get_priced_cart_async(db, user_id=current_user.id)
+    if cart is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart not found")
+    return model_response(PricedCart, cart)
+
+@cart_router.post("/", response_model=Cart)
+async def update_cart(
+    items: List[CartItemBase],
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Update the current user's cart.
+    """
+    try:
+        return await create_or_update_cart_async(db, user_id=current_user.id, items=items)
+    except StaleCartVersion as e:
+        raise cart_version_conflict(e)
+
+@cart_router.patch("/items/{product_id}", response_model=CartItemChange)
+async def change_item(
+    product_id: int,
+    patch: CartItemPatch,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Set, increment or remove one line of the cart (see cart_controller.change_item).
+    """
+    check_cart_item_patch(patch)
+    try:
+        change = await change_cart_item_async(
+            db, user_id=current_user.id, product_id=product_id, op=patch.op, quantity=patch.quantity,
+            product_name=patch.product_name, version=patch.version
+        )
+    except StaleCartVersion as e:
+        raise cart_version_conflict(e)
+    if change is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart not found")
+    return change
+
+@order_router.get("/", response_model=List[Order])
+async def read_user_orders(
+    current_user: CurrentUser,
+    after: OrderCursor,
+    fields: OrderFields,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get current user's orders with product_name injected in each product.
+    """
+    orders = await get_user_orders_async(
+        db, user_id=current_user.id, skip=skip, limit=limit, after=after, fields=fields
+    )
+
+    if fields is None or "products" in fields:
+        product_ids = {item["product_id"] for order in orders for item in order.products}
+        product_map = await get_product_names_async(db, list(product_ids)) if product_ids else {}
+
+        for order in orders:
+            for item in order.products:
+                item["product_name"] = product_map.get(item["product_id"], "Unknown")
+
+    response = fields_response(orders, fields) if fields else model_response(List[Order], orders)
+    set_next_cursor(response, orders, limit, order_sort_key)
+    return response
@@ -3,8 +3,10 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.db.base import get_db
 from app.models.schemas import Token, UserCreate, User, LoginRequest
-from app.services.auth_service import authenticate_user, create_access_token, create_refresh_token, refresh_token
-from app.services.user_service import create_user, get_user_by_email
+from app.services.auth_service import authenticate_user_async, get_user_and_release, create_access_token, create_refresh_token, refresh_token, access_token_claims
+from app.services.user_service import create_user
+from app.utils.security import get_password_hash_async, PasswordHasherBusy
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 from app.core.config.settings import settings
 from app.models.schemas import LoginRequestObject
@@ -12,12 +14,22 @@ from app.models.schemas import LoginRequestObject
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+def password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts in progress, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: LoginRequestObject,
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, form_data.email, form_data.password)
+    try:
+        user = await authenticate_user_async(db, form_data.email, form_data.password)
+    except PasswordHasherBusy:
+        raise password_pool_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -26,10 +38,11 @@ def login(
         )
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = access_token_claims(user)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=claims, expires_delta=access_token_expires
     )
-    refresh_token_str = create_refresh_token(data={"sub": user.email})
+    refresh_token_str = create_refresh_token(data=claims)
     
     return {
         "access_token": access_token,
@@ -38,18 +51,22 @@ def login(
     }
 
 @router.post("/signup", response_model=User)
-def signup(
+async def signup(
     user_data: UserCreate,
     db: Session = Depends(get_db)
 ):
-    existing_user = get_user_by_email(db, email=user_data.email)
+    existing_user = await run_in_threadpool(get_user_and_release, db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    user = create_user(db, user_data)
+    try:
+        hashed_password = await get_password_hash_async(user_data.password)
+    except PasswordHasherBusy:
+        raise password_pool_busy()
+    user = await run_in_threadpool(create_user, db, user_data, hashed_password=hashed_password)
 
     # Convert contact_number to string
     user.contact_number = str(user.contact_number)
@@ -2,28 +2,24 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.base import get_db
-from app.models.schemas import Cart, CartItemBase, RemoveItemRequest
-from app.services.cart_service import get_user_cart, create_or_update_cart, clear_cart, remove_item_from_cart
-from app.api.controllers.auth_controller import oauth2_scheme
-from app.services.auth_service import get_current_user
+from app.models.schemas import Cart, CartItemBase, CartItemChange, CartItemPatch, PricedCart, RemoveItemRequest
+from app.services.cart_service import (
+    get_user_cart, create_or_update_cart, clear_cart, remove_item_from_cart, change_cart_item, get_priced_cart,
+    StaleCartVersion
+)
+from app.api.deps import CurrentUser, check_cart_item_patch
+from app.api.responses import cart_version_conflict, model_response
 
 router = APIRouter()
 
 @router.get("/", response_model=Cart)
 def read_cart(
-    token: str = Depends(oauth2_scheme),
+    current_user: CurrentUser,
     db: Session = Depends(get_db)
 ):
     """
     Get current user's cart.
     """
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    
     cart = get_user_cart(db, user_id=current_user.id)
     if not cart:
         items =  List[CartItemBase]
@@ -32,40 +28,47 @@ def read_cart(
     
     return cart
 
+@router.get("/priced", response_model=PricedCart)
+def read_priced_cart(
+    current_user: CurrentUser,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the current user's cart with current unit prices, line totals, stock
+    availability and the cart total.
+    """
+    cart = get_priced_cart(db, user_id=current_user.id)
+    if cart is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cart not found"
+        )
+    return model_response(PricedCart, cart)
+
 @router.post("/", response_model=Cart)
 def update_cart(
     items: List[CartItemBase],
-    token: str = Depends(oauth2_scheme),
+    current_user: CurrentUser,
     db: Session = Depends(get_db)
 ):
     """
-    Update the current user's cart.
+    Update the current user's cart. Answers 409 if other changes to the
+    cart kept getting in the way.
     """
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    
-    cart = create_or_update_cart(db, user_id=current_user.id, items=items)
+    try:
+        cart = create_or_update_cart(db, user_id=current_user.id, items=items)
+    except StaleCartVersion as e:
+        raise cart_version_conflict(e)
     return cart
 
 @router.post("/clear", status_code=status.HTTP_204_NO_CONTENT)
 def clear_user_cart(
-    token: str = Depends(oauth2_scheme),
+    current_user: CurrentUser,
     db: Session = Depends(get_db)
 ):
     """
     Clear the current user's cart.
     """
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    
     success = clear_cart(db, user_id=current_user.id)
     if not success:
         raise HTTPException(
@@ -81,20 +84,16 @@ def clear_user_cart(
 @router.post("/remove_item", response_model=Cart)
 def remove_cart_item(
     request: RemoveItemRequest,  # Accept JSON payload
-    token: str = Depends(oauth2_scheme),
+    current_user: CurrentUser,
     db: Session = Depends(get_db)
 ):
     """
     Remove an item from the user's cart.
     """
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
-    cart = remove_item_from_cart(db, user_id=current_user.id, product_id=request.product_id)
+    try:
+        cart = remove_item_from_cart(db, user_id=current_user.id, product_id=request.product_id)
+    except StaleCartVersion as e:
+        raise cart_version_conflict(e)
     
     if not cart:
         raise HTTPException(
@@ -103,3 +102,31 @@ def remove_cart_item(
         )
     
     return cart
+
+@router.patch("/items/{product_id}", response_model=CartItemChange)
+def change_item(
+    product_id: int,
+    patch: CartItemPatch,
+    current_user: CurrentUser,
+    db: Session = Depends(get_db)
+):
+    """
+    Set, increment or remove one line of the cart and return just that line
+    with the cart's new version. A quantity at or below zero removes the
+    line. Pass the `version` the change is based on to have it rejected with
+    409 if the cart has changed since.
+    """
+    check_cart_item_patch(patch)
+    try:
+        change = change_cart_item(
+            db, user_id=current_user.id, product_id=product_id, op=patch.op, quantity=patch.quantity,
+            product_name=patch.product_name, version=patch.version
+        )
+    except StaleCartVersion as e:
+        raise cart_version_conflict(e)
+    if change is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cart not found"
+        )
+    return change
@@ -0,0 +1,69 @@
+from fastapi import APIRouter
+from app.api.deps import AdminUser
+from app.services.auth_service import principal_cache
+from app.services.product_service import catalog_cache, get_catalog_version
+from app.services.suggest_service import suggest_stats
+from app.services.cart_sweeper import cart_sweeper
+from app.db.cart_store import cart_store
+from app.db.base import engine, async_engine, replica_engines
+from app.db.invalidation import bus
+from app.db.pool import pool_status
+
+router = APIRouter()
+
+@router.get("/cache/principal")
+def principal_cache_stats(current_user: AdminUser):
+    """
+    Hit/miss counters for the resolved-principal cache (admin only).
+    """
+    return principal_cache.stats()
+
+@router.get("/cache/catalog")
+def catalog_cache_stats(current_user: AdminUser):
+    """
+    Hit/miss counters and current version of the product catalog cache (admin only).
+    """
+    return {"version": get_catalog_version(), **catalog_cache.stats()}
+
+@router.get("/cache/suggest")
+def suggest_index_stats(current_user: AdminUser):
+    """
+    Size and pending refresh work of the search suggestion index (admin only).
+    """
+    return suggest_stats()
+
+@router.get("/cache/cart")
+def cart_store_stats(current_user: AdminUser):
+    """
+    Pending and flushed counts of the write-behind cart store (admin only).
+    """
+    if cart_store is None:
+        return {"backend": "database"}
+    return cart_store.stats()
+
+@router.get("/cache/bus")
+def invalidation_bus_stats(current_user: AdminUser):
+    """
+    Published/received invalidation counts and listener health (admin only).
+    """
+    return bus.stats()
+
+@router.get("/jobs/cart_sweeper")
+def cart_sweeper_stats(current_user: AdminUser):
+    """
+    Runs, skips (another worker held the lock) and carts swept per run by the
+    expired-cart sweeper (admin only).
+    """
+    return cart_sweeper.stats()
+
+@router.get("/db/pool")
+def db_pool_stats(current_user: AdminUser):
+    """
+    Connection pool occupancy, checkout wait, overflow and connection age (admin only).
+    """
+    pools = {"primary": pool_status(engine)}
+    for index, replica in enumerate(replica_engines):
+        pools[f"replica_{index}"] = pool_status(replica)
+    if async_engine is not None:
+        pools["primary_async"] = pool_status(async_engine)
+    return pools
@@ -3,31 +3,26 @@ from sqlalchemy.orm import Session
 from typing import List
 from app.db.base import get_db
 from app.models.schemas import Order, OrderItemBase, OrderStatusUpdate, PaymentRequest, PaymentResponse
-from app.services.order_service import create_order, get_order, get_user_orders, update_order_status, process_payment, get_all_orders
+from app.services.order_service import create_order, get_order, get_user_orders, update_order_status, process_payment, get_all_orders, order_etag
 from app.services.payment_service import payment_service
-from app.api.controllers.auth_controller import oauth2_scheme
-from app.services.auth_service import get_current_user
+from app.api.deps import CurrentUser, AdminUser, IfNoneMatch, OrderCursor, OrderFields, get_user_read_db
+from app.api.responses import PRIVATE_CACHE_CONTROL, fields_response, model_response, not_modified
+from app.utils.etag import etag_matches
+from app.utils.pagination import set_next_cursor, order_sort_key
 # from app.services.mail_service import generate_email_body,send_order_email
-from app.models.models import Product
+from app.services.product_service import get_product_names
 
 
 router = APIRouter()
 
 @router.post("/", response_model=Order, status_code=status.HTTP_201_CREATED)
 def create_new_order(
-    token: str = Depends(oauth2_scheme),
+    current_user: CurrentUser,
     db: Session = Depends(get_db)
 ):
     """
     Create a new order from the current cart contents.
     """
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
     order = create_order(db, user_id=current_user.id)
     
     if not order:
@@ -43,76 +38,63 @@ def create_new_order(
 
 @router.get("/", response_model=List[Order])
 def read_user_orders(
+    current_user: CurrentUser,
+    after: OrderCursor,
+    fields: OrderFields,
     skip: int = 0,
     limit: int = 100,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_user_read_db)
 ):
     """
     Get current user's orders with product_name injected in each product.
+    Pass `fields` (e.g. order_id,order_status,total_order_price) to get just
+    those columns; the products JSON is then neither loaded nor enriched.
     """
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    
     # Step 1: Fetch user orders (each has products: List[Dict])
-    orders = get_user_orders(db, user_id=current_user.id, skip=skip, limit=limit)
+    orders = get_user_orders(db, user_id=current_user.id, skip=skip, limit=limit, after=after, fields=fields)
 
-    # Step 2: Collect all unique product_ids from all orders
-    product_ids = set()
-    for order in orders:
-        for item in order.products:
-            product_ids.add(item["product_id"])
+    if fields is None or "products" in fields:
+        # Step 2: Collect all unique product_ids from all orders
+        product_ids = set()
+        for order in orders:
+            for item in order.products:
+                product_ids.add(item["product_id"])
 
-    # Step 3: Query products and build map: product_id -> product_name
-    product_map = {
-        product.product_id: product.product_name
-        for product in db.query(Product.product_id, Product.product_name)
-        .filter(Product.product_id.in_(product_ids))
-        .all()
-    }
+        # Step 3: Query products and build map: product_id -> product_name
+        product_map = get_product_names(db, list(product_ids)) if product_ids else {}
 
-    # Step 4: Enrich each product in each order with product_name
-    for order in orders:
-        for item in order.products:
-            item["product_name"] = product_map.get(item["product_id"], "Unknown")
+        # Step 4: Enrich each product in each order with product_name
+        for order in orders:
+            for item in order.products:
+                item["product_name"] = product_map.get(item["product_id"], "Unknown")
 
-    return orders
+    response = fields_response(orders, fields) if fields else model_response(List[Order], orders)
+    set_next_cursor(response, orders, limit, order_sort_key)
+    return response
 
 
 @router.get("/all", response_model=List[Order])
 def get_All(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser,
+    fields: OrderFields,
+    db: Session = Depends(get_user_read_db)
 ):
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    orders = get_all_orders(db)
-    return orders
+    orders = get_all_orders(db, fields=fields)
+    if fields:
+        return fields_response(orders, fields)
+    return model_response(List[Order], orders)
 
 @router.get("/{order_id}", response_model=Order)
 def read_order(
     order_id: int,
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser,
+    if_none_match: IfNoneMatch,
+    db: Session = Depends(get_user_read_db)
 ):
     """
-    Get details of a specific order.
+    Get details of a specific order. Answers 304 without a body when
+    If-None-Match carries the order's current ETag.
     """
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    
     order = get_order(db, order_id=order_id)
     if not order:
         raise HTTPException(
@@ -127,25 +109,24 @@ def read_order(
             detail="Permission denied"
         )
     
-    return order
+    etag = order_etag(order)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, PRIVATE_CACHE_CONTROL)
+    response = model_response(Order, order)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
+    return response
 
 @router.put("/change-status", response_model=Order)
 def update_order_status_endpoint(
     order_id: int,
     status_update: OrderStatusUpdate,
-    token: str = Depends(oauth2_scheme),
+    current_user: AdminUser,
     db: Session = Depends(get_db)
 ):
     """
     Update order status (admin only).
     """
-    current_user = get_current_user(db, token)
-    if not current_user or current_user.role != 1:  # Admin role check
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission denied"
-        )
-    
     order = update_order_status(db, order_id=order_id, status=status_update.order_status)
     if not order:
         raise HTTPException(
@@ -158,19 +139,12 @@ def update_order_status_endpoint(
 @router.post("/payment", response_model=PaymentResponse)
 def process_payment_endpoint(
     payment_request: PaymentRequest,
-    token: str = Depends(oauth2_scheme),
+    current_user: CurrentUser,
     db: Session = Depends(get_db)
 ):
     """
     Process payment for an order.
     """
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    
     # Check if order exists and belongs to the user
     order = get_order(db, order_id=payment_request.order_id)
     if not order:
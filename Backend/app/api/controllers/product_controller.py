@@ -1,103 +1,165 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.db.base import get_db
-from app.models.schemas import Product, ProductCreate, ProductUpdate
+from app.db.base import get_db, get_read_db
+from app.models.schemas import (
+    Product, ProductCreate, ProductUpdate, Suggestion, CategoryCount, ProductFacets,
+    ProductBatch, ProductBatchRequest
+)
 from app.services.product_service import (
-    get_products, get_product, create_product, update_product, 
-    delete_product, get_products_by_category, search_products
+    get_products_json, get_product_json, create_product, update_product, 
+    delete_product, get_products_by_category_json, search_products,
+    get_categories_json, get_facets_json, get_products_batch_json
 )
-from app.api.controllers.auth_controller import oauth2_scheme
-from app.services.auth_service import get_current_user
+from app.services.suggest_service import get_suggestions
+from app.api.deps import AdminUser, IfNoneMatch, ProductCursor, ProductFields, ProductIds, check_product_ids
+from app.api.responses import catalog_response, model_response
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Product])
 def read_products(
+    after: ProductCursor,
+    if_none_match: IfNoneMatch,
+    fields: ProductFields,
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
-    Get list of products.
+    Get list of products. Pass the X-Next-Cursor response header back as
+    `cursor` to fetch the next page, and `fields` (e.g.
+    product_name,product_price) to load and return only those columns.
     """
-    products = get_products(db, skip=skip, limit=limit)
-    return products
+    return catalog_response(
+        get_products_json(db, skip=skip, limit=limit, after=after, fields=fields), if_none_match
+    )
 
 @router.get("/search", response_model=List[Product])
 def search_products_endpoint(
     query: str,
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Search for products using a text query.
     """
     products = search_products(db, query=query, skip=skip, limit=limit)
-    return products
+    return model_response(List[Product], products)
+
+@router.get("/suggest", response_model=List[Suggestion])
+def suggest_products(
+    q: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Product and category names starting with `q` (at any word), most
+    popular first. Served from memory, meant for search-as-you-type.
+    """
+    return catalog_response(get_suggestions(db, query=q, limit=limit))
+
+@router.get("/categories", response_model=List[CategoryCount])
+def read_categories(
+    if_none_match: IfNoneMatch,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Every category with its product and in-stock counts, by name.
+    """
+    return catalog_response(get_categories_json(db), if_none_match)
+
+@router.get("/facets", response_model=ProductFacets)
+def read_facets(
+    if_none_match: IfNoneMatch,
+    category: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Product, in-stock and price band counts for one category, or for the
+    whole catalog when no category is given.
+    """
+    entry = get_facets_json(db, category=category)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return catalog_response(entry, if_none_match)
+
+@router.get("/batch", response_model=ProductBatch)
+def read_products_batch(
+    ids: ProductIds,
+    if_none_match: IfNoneMatch,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Several products by id (?ids=1,2,3) in one call, in the order asked for.
+    Ids that don't exist are listed under `missing`.
+    """
+    return catalog_response(get_products_batch_json(db, ids), if_none_match)
+
+@router.post("/batch", response_model=ProductBatch)
+def read_products_batch_post(
+    batch: ProductBatchRequest,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Same as GET /batch, for id lists too long for a query string.
+    """
+    return catalog_response(get_products_batch_json(db, check_product_ids(batch.ids)))
 
 @router.get("/category/{category}", response_model=List[Product])
 def read_products_by_category(
     category: str,
+    after: ProductCursor,
+    if_none_match: IfNoneMatch,
+    fields: ProductFields,
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
-    Get products by category.
+    Get products by category, paged like the product list.
     """
-    products = get_products_by_category(db, category=category, skip=skip, limit=limit)
-    return products
+    return catalog_response(
+        get_products_by_category_json(db, category=category, skip=skip, limit=limit, after=after, fields=fields),
+        if_none_match
+    )
 
 @router.get("/{product_id}", response_model=Product)
 def read_product(
     product_id: int,
-    db: Session = Depends(get_db)
+    if_none_match: IfNoneMatch,
+    db: Session = Depends(get_read_db)
 ):
     """
     Get a specific product by ID.
     """
-    product = get_product(db, product_id=product_id)
-    if product is None:
+    entry = get_product_json(db, product_id=product_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return catalog_response(entry, if_none_match)
 
 @router.post("/", response_model=Product, status_code=status.HTTP_201_CREATED)
 def create_product_endpoint(
     product_data: ProductCreate,
-    token: str = Depends(oauth2_scheme),
+    current_user: AdminUser,
     db: Session = Depends(get_db)
 ):
     """
     Create a new product (admin only).
     """
-    current_user = get_current_user(db, token)
-    if not current_user or current_user.role != 1:  # Admin role check
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission denied"
-        )
-    
     return create_product(db, product_data)
 
 @router.put("/{product_id}", response_model=Product)
 def update_product_endpoint(
     product_id: int,
     product_data: ProductUpdate,
-    token: str = Depends(oauth2_scheme),
+    current_user: AdminUser,
     db: Session = Depends(get_db)
 ):
     """
     Update a product (admin only).
     """
-    current_user = get_current_user(db, token)
-    if not current_user or current_user.role != 1:  # Admin role check
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission denied"
-        )
-    
     product = update_product(db, product_id, product_data)
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -106,19 +168,12 @@ def update_product_endpoint(
 @router.delete("/{product_id}", response_model=Product)
 def delete_product_endpoint(
     product_id: int,
-    token: str = Depends(oauth2_scheme),
+    current_user: AdminUser,
     db: Session = Depends(get_db)
 ):
     """
     Delete a product (admin only).
     """
-    current_user = get_current_user(db, token)
-    if not current_user or current_user.role != 1:  # Admin role check
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission denied"
-        )
-    
     product = delete_product(db, product_id)
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
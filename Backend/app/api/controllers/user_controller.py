@@ -3,40 +3,23 @@ from sqlalchemy.orm import Session
 from app.db.base import get_db
 from app.models.schemas import User, UserUpdate
 from app.services.user_service import get_user, update_user
-from app.api.controllers.auth_controller import oauth2_scheme
-from app.services.auth_service import get_current_user
+from app.api.deps import CurrentUser, CurrentProfile
 
 router = APIRouter()
 
 @router.get("/profile", response_model=User)
 def get_user_profile(
-    token: str = Depends(oauth2_scheme),
+    current_user: CurrentProfile,
     db: Session = Depends(get_db)
 ):
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    current_user.contact_number = str(current_user.contact_number)
     return current_user
 
 @router.put("/profile", response_model=User)
 def update_user_profile(
     user_data: UserUpdate,
-    token: str = Depends(oauth2_scheme),
+    current_user: CurrentUser,
     db: Session = Depends(get_db)
 ):
-    current_user = get_current_user(db, token)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
     updated_user = update_user(db, current_user.id, user_data)
     if not updated_user:
         raise HTTPException(
@@ -0,0 +1,157 @@
+from datetime import datetime
+from typing import Annotated, List, Optional, Tuple
+from fastapi import Depends, Header, HTTPException, status
+from sqlalchemy.orm import Session
+from app.db.base import get_db, read_session
+from app.models.schemas import CartItemPatch, Principal, Product, Order
+from app.api.controllers.auth_controller import oauth2_scheme
+from app.services.auth_service import get_current_user
+from app.core.config.settings import settings
+from app.utils.pagination import decode_cursor, PRODUCT_CURSOR, ORDER_CURSOR
+
+def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Resolve the bearer token to a principal. FastAPI caches dependency results,
+    so this runs once per request however many dependants ask for it.
+    """
+    current_user = get_current_user(db, token)
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return current_user
+
+def get_current_profile(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Like get_current_principal, but always carries the full profile even when
+    the token is a claims-only access token.
+    """
+    current_user = get_current_user(db, token, require_profile=True)
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return current_user
+
+def get_admin_principal(
+    current_user: Principal = Depends(get_current_principal)
+) -> Principal:
+    if current_user.role != 1:  # Admin role check
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied"
+        )
+    return current_user
+
+def get_user_read_db(current_user: Principal = Depends(get_current_principal)):
+    """
+    Read-only session for the caller's own data. Sticks to the primary for a
+    short window after the caller's cart/order writes (read-your-writes).
+    """
+    db = read_session(current_user.id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _decode_cursor(cursor: str, types) -> tuple:
+    try:
+        return decode_cursor(cursor, types)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def get_product_cursor(cursor: Optional[str] = None) -> Optional[int]:
+    """
+    Keyset position for product lists; when given, `skip` is ignored.
+    """
+    return _decode_cursor(cursor, PRODUCT_CURSOR)[0] if cursor else None
+
+def get_order_cursor(cursor: Optional[str] = None) -> Optional[Tuple[datetime, int]]:
+    """
+    Keyset position for order lists; when given, `skip` is ignored.
+    """
+    return _decode_cursor(cursor, ORDER_CURSOR) if cursor else None
+
+def check_product_ids(ids: List[int]) -> List[int]:
+    if not ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No product ids given")
+    if len(ids) > settings.PRODUCT_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.PRODUCT_BATCH_MAX_IDS} product ids per request"
+        )
+    return ids
+
+def check_cart_item_patch(patch: CartItemPatch) -> CartItemPatch:
+    if patch.op != "remove" and patch.quantity is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'"{patch.op}" needs a quantity')
+    return patch
+
+def get_product_ids(ids: str) -> List[int]:
+    """
+    Comma-separated product ids from the query string, e.g. ?ids=1,2,3.
+    """
+    try:
+        product_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid product ids")
+    return check_product_ids(product_ids)
+
+def _parse_fields(fields: Optional[str], allowed: Tuple[str, ...]) -> Optional[Tuple[str, ...]]:
+    if not fields:
+        return None
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    # The id always comes back so clients can tell rows apart
+    return (allowed[0], *(name for name in requested if name != allowed[0]))
+
+PRODUCT_FIELDS = ("product_id", *(name for name in Product.model_fields if name != "product_id"))
+ORDER_FIELDS = ("order_id", *(name for name in Order.model_fields if name != "order_id"))
+
+def get_product_fields(fields: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+    """
+    Sparse fieldset for product lists, e.g. ?fields=product_name,product_price.
+    Only those columns are loaded and returned (plus product_id).
+    """
+    return _parse_fields(fields, PRODUCT_FIELDS)
+
+def get_order_fields(fields: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+    """
+    Sparse fieldset for order lists; leaving out products and
+    payment_details skips loading those JSON columns.
+    """
+    return _parse_fields(fields, ORDER_FIELDS)
+
+def get_if_none_match(if_none_match: Optional[str] = Header(None)) -> Optional[str]:
+    """
+    ETag(s) the client already holds; matching reads answer 304 Not Modified.
+    """
+    return if_none_match
+
+CurrentUser = Annotated[Principal, Depends(get_current_principal)]
+CurrentProfile = Annotated[Principal, Depends(get_current_profile)]
+AdminUser = Annotated[Principal, Depends(get_admin_principal)]
+ProductCursor = Annotated[Optional[int], Depends(get_product_cursor)]
+OrderCursor = Annotated[Optional[Tuple[datetime, int]], Depends(get_order_cursor)]
+ProductIds = Annotated[List[int], Depends(get_product_ids)]
+ProductFields = Annotated[Optional[Tuple[str, ...]], Depends(get_product_fields)]
+OrderFields = Annotated[Optional[Tuple[str, ...]], Depends(get_order_fields)]
+IfNoneMatch = Annotated[Optional[str], Depends(get_if_none_match)]
@@ -0,0 +1,59 @@
+from typing import Any, Optional, Sequence
+from fastapi import HTTPException, Response, status
+from app.core.config.settings import settings
+from app.services.cart_service import StaleCartVersion
+from app.services.product_service import CatalogEntry
+from app.utils.etag import etag_matches
+from app.utils.fields import dump_fields
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.serialization import dump_json
+
+# Catalog data is the same for everyone; per-user data may only be cached by
+# the browser, and must be revalidated before each use
+PUBLIC_CACHE_CONTROL = f"public, max-age={settings.CATALOG_MAX_AGE_SECONDS}"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+def catalog_response(entry: CatalogEntry, if_none_match: Optional[str] = None) -> Response:
+    """
+    Send a cached, already-serialised catalog body without re-validating it,
+    or an empty 304 when the client's If-None-Match still matches.
+    """
+    if entry.etag and etag_matches(if_none_match, entry.etag):
+        response = not_modified(entry.etag, PUBLIC_CACHE_CONTROL)
+    else:
+        response = Response(content=entry.body, media_type="application/json")
+        response.headers["Cache-Control"] = PUBLIC_CACHE_CONTROL
+        if entry.etag:
+            response.headers["ETag"] = entry.etag
+    if entry.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = entry.next_cursor
+    return response
+
+def fields_response(objs: Sequence[Any], fields: Sequence[str]) -> Response:
+    """
+    A sparse fieldset list, sent as-is instead of through the full response
+    model (which would demand the columns that were never loaded).
+    """
+    return Response(content=dump_fields(objs, fields), media_type="application/json")
+
+def model_response(type_: Any, content: Any) -> Response:
+    """
+    Validate ORM rows as `type_` and send the JSON bytes pydantic produces,
+    instead of letting FastAPI validate, convert to dicts and json.dumps them
+    again through the route's response_model.
+    """
+    return Response(content=dump_json(type_, content), media_type="application/json")
+
+def cart_version_conflict(e: StaleCartVersion) -> HTTPException:
+    # The client reloads the cart (or retries against this version)
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Cart has changed; it is now at version {e.version}",
+        headers={"X-Cart-Version": str(e.version)},
+    )
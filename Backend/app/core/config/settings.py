@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 import os
 from dotenv import load_dotenv
 
@@ -10,6 +10,13 @@ class Settings(BaseSettings):
     # API Settings
     API_V1_PREFIX: str = os.getenv("API_V1_PREFIX", "/api/v1")
     DEBUG: bool = os.getenv("DEBUG", "True") == "True"
+    # Level of the app.* loggers (per-request SQL stats on app.sql, cart store, sweeper...)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Send each request's query count and DB time as X-DB-* response headers;
+    # off by default so they aren't exposed in production
+    QUERY_STATS_HEADERS: bool = os.getenv("QUERY_STATS_HEADERS", "False") == "True"
+    # Statement shapes run this many times in one request are reported as N+1
+    QUERY_REPEAT_THRESHOLD: int = int(os.getenv("QUERY_REPEAT_THRESHOLD", "3"))
     PROJECT_NAME: str = os.getenv("PROJECT_NAME", "Farmers Mandi API")
     
     # Database Settings
@@ -19,16 +26,109 @@ class Settings(BaseSettings):
     DB_HOST: str = os.getenv("DB_HOST", "")
     DB_PORT: str = os.getenv("DB_PORT", "5432")
     DB_SSLMODE: str = os.getenv("DB_SSLMODE", "require")
+
+    # Connection Pool Settings
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "300"))  # Serverless Postgres drops idle connections
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True") == "True"
+
+    # Rows per statement for the repositories' bulk_* methods
+    DB_BULK_CHUNK_SIZE: int = int(os.getenv("DB_BULK_CHUNK_SIZE", "1000"))
+
+    # "sync" serves requests through the blocking Session path, "async" mounts
+    # the AsyncSession variants of the hot endpoints
+    DB_ENGINE: str = os.getenv("DB_ENGINE", "sync")
     
+    # Optional read replicas (comma separated) for read-only endpoints
+    REPLICA_DATABASE_URL: Optional[str] = os.getenv("REPLICA_DATABASE_URL")
+    # How long a user's reads stick to the primary after they write
+    READ_YOUR_WRITES_SECONDS: int = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}?sslmode={self.DB_SSLMODE}"
+
+    @property
+    def REPLICA_DATABASE_URLS(self) -> List[str]:
+        if not self.REPLICA_DATABASE_URL:
+            return []
+        return [url.strip() for url in self.REPLICA_DATABASE_URL.split(",") if url.strip()]
+
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}?ssl={self.DB_SSLMODE}"
     
     # JWT Settings
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
-    
+
+    # Principal Cache Settings (resolved users keyed by token subject)
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+    PRINCIPAL_CACHE_TTL_SECONDS: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+    # Catalog Cache Settings (serialised product pages, invalidated by catalog version)
+    CATALOG_CACHE_SIZE: int = int(os.getenv("CATALOG_CACHE_SIZE", "2048"))
+    CATALOG_CACHE_TTL_SECONDS: int = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+    # Most ids one /product/batch request may ask for
+    PRODUCT_BATCH_MAX_IDS: int = int(os.getenv("PRODUCT_BATCH_MAX_IDS", "500"))
+
+    # HTTP caching: max-age for public catalog responses (clients revalidate
+    # with If-None-Match afterwards) and the smallest body worth gzipping
+    CATALOG_MAX_AGE_SECONDS: int = int(os.getenv("CATALOG_MAX_AGE_SECONDS", "60"))
+    GZIP_MINIMUM_SIZE: int = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
+
+    # Product search: ranked full-text on Postgres, trigram name matching as a
+    # typo-tolerant fallback when pg_trgm is installed
+    SEARCH_TRIGRAM: bool = os.getenv("SEARCH_TRIGRAM", "False") == "True"
+
+    # Search-as-you-type suggestions, served from an in-memory prefix index;
+    # the full rebuild interval also refreshes popularity from orders
+    SUGGEST_REBUILD_SECONDS: int = int(os.getenv("SUGGEST_REBUILD_SECONDS", "900"))
+
+    # Upper bounds (comma separated, exclusive) of the price bands in product
+    # facets; a final open-ended band covers everything above the last one
+    PRICE_BAND_EDGES: str = os.getenv("PRICE_BAND_EDGES", "50,100,250,500,1000")
+
+    @property
+    def PRICE_BANDS(self) -> List[int]:
+        return sorted(int(edge) for edge in self.PRICE_BAND_EDGES.split(",") if edge.strip())
+
+    # Write-behind cart store: "database" (every change commits), "memory"
+    # (single worker) or "redis" (shared by workers). Changed carts are written
+    # to Postgres in batches of CART_FLUSH_BATCH every CART_FLUSH_SECONDS
+    CART_STORE: str = os.getenv("CART_STORE", "database")
+    CART_STORE_REDIS_URL: str = os.getenv("CART_STORE_REDIS_URL", "redis://localhost:6379/0")
+    CART_STORE_SIZE: int = int(os.getenv("CART_STORE_SIZE", "10000"))  # memory backend only
+    CART_STORE_TTL_SECONDS: int = int(os.getenv("CART_STORE_TTL_SECONDS", "86400"))  # redis backend only
+    CART_FLUSH_SECONDS: float = float(os.getenv("CART_FLUSH_SECONDS", "1.0"))
+    CART_FLUSH_BATCH: int = int(os.getenv("CART_FLUSH_BATCH", "500"))
+
+    # Expired-cart sweeper. Every CART_SWEEP_INTERVAL_SECONDS (give or take up
+    # to CART_SWEEP_JITTER_SECONDS) the worker holding a Postgres advisory lock
+    # deletes up to CART_SWEEP_MAX_BATCHES batches of CART_SWEEP_BATCH_SIZE
+    # expired carts, or moves them to carts_archive with CART_SWEEP_ARCHIVE
+    CART_SWEEP_ENABLED: bool = os.getenv("CART_SWEEP_ENABLED", "True") == "True"
+    CART_SWEEP_ARCHIVE: bool = os.getenv("CART_SWEEP_ARCHIVE", "False") == "True"
+    CART_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("CART_SWEEP_INTERVAL_SECONDS", "300"))
+    CART_SWEEP_JITTER_SECONDS: float = float(os.getenv("CART_SWEEP_JITTER_SECONDS", "30"))
+    CART_SWEEP_BATCH_SIZE: int = int(os.getenv("CART_SWEEP_BATCH_SIZE", "500"))
+    CART_SWEEP_MAX_BATCHES: int = int(os.getenv("CART_SWEEP_MAX_BATCHES", "20"))
+
+    # Cross-worker cache invalidation: "memory" (single process) or "postgres" (LISTEN/NOTIFY)
+    INVALIDATION_BUS: str = os.getenv("INVALIDATION_BUS", "memory")
+    INVALIDATION_CHANNEL: str = os.getenv("INVALIDATION_CHANNEL", "cache_invalidation")
+
+    # Sign uid/role/token version into access tokens so auth needs no user lookup
+    ACCESS_TOKEN_CLAIMS: bool = os.getenv("ACCESS_TOKEN_CLAIMS", "False") == "True"
+    TOKEN_VERSION_CACHE_TTL_SECONDS: int = int(os.getenv("TOKEN_VERSION_CACHE_TTL_SECONDS", "30"))
+
+    # Password Hashing Pool (bcrypt work for login/signup)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
     # Payment Gateway Settings
     PAYMENT_GATEWAY_API_KEY: Optional[str] = os.getenv("PAYMENT_GATEWAY_API_KEY")
     PAYMENT_GATEWAY_SECRET: Optional[str] = os.getenv("PAYMENT_GATEWAY_SECRET")
@@ -1,14 +1,129 @@
-from sqlalchemy import create_engine
+import itertools
+from contextlib import contextmanager
+from typing import Callable, Hashable, Iterator, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config.settings import settings
+from app.db.invalidation import bus
+from app.db.pool import InstrumentedQueuePool, InstrumentedAsyncAdaptedQueuePool
+from app.utils.cache import TTLCache
 
 # Create engine with the database URL
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_logging_name="primary",
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
 
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create SessionLocal class. Sessions live for one request, and the models
+# fetch server defaults with RETURNING, so nothing needs reloading after commit.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Read replicas, used round-robin by the read-only dependencies below
+replica_engines = [
+    create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name=f"replica_{index}",
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    for index, url in enumerate(settings.REPLICA_DATABASE_URLS)
+]
+_replica_sessions = itertools.cycle([
+    sessionmaker(autocommit=False, autoflush=False, bind=replica, info={"read_only": True})
+    for replica in replica_engines
+])
+
+@event.listens_for(Session, "before_flush")
+def _reject_replica_writes(session, flush_context, instances):
+    if session.info.get("read_only"):
+        raise RuntimeError("Write attempted through a read replica session")
+
+# Keys (user ids, "catalog") that wrote recently; their reads go to the primary
+# until the replicas have had time to catch up
+recent_writes = TTLCache(maxsize=10000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+def _pin_to_primary(key: Hashable) -> None:
+    recent_writes.set(key, True)
+
+bus.subscribe("write", _pin_to_primary)
+
+def mark_write(key: Hashable) -> None:
+    # Published so every worker pins the key, not just the one that wrote
+    if replica_engines:
+        bus.publish("write", key)
+
+def read_session(key: Optional[Hashable] = None) -> Session:
+    """
+    Session for read-only work: a replica, unless there are none or `key`
+    wrote within the read-your-writes window.
+    """
+    if not replica_engines or (key is not None and recent_writes.get(key)):
+        return SessionLocal()
+    return next(_replica_sessions)()
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    """
+    Run a service operation as one transaction. Repository writes inside the
+    block only flush; the block commits once on exit and rolls back on error.
+    Nested blocks join the outermost one.
+    """
+    if db.info.get("unit_of_work"):
+        yield db
+        return
+    db.info["unit_of_work"] = True
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.info.pop("unit_of_work", None)
+        callbacks = db.info.pop("after_commit", [])
+    for callback in callbacks:
+        callback()
+
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """
+    Run `callback` once the enclosing unit_of_work commits (never, if it rolls
+    back), or right away outside one, where repository writes commit at once.
+    """
+    if db.info.get("unit_of_work"):
+        db.info.setdefault("after_commit", []).append(callback)
+    else:
+        callback()
+
+# Async engine, only built when DB_ENGINE=async so asyncpg stays optional
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ENGINE == "async":
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_logging_name="primary_async",
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
 
 # Create Base class for models
 Base = declarative_base()
@@ -19,4 +134,17 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Read-only database dependency for catalog endpoints
+def get_read_db():
+    db = read_session("catalog")
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async database dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,391 @@
+import atexit
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+import orjson
+
+from app.core.config.settings import settings
+
+logger = logging.getLogger("app.cart_store")
+
+CartState = Dict[str, Any]
+Writer = Callable[[List[CartState]], None]
+Updater = Callable[[Optional[CartState]], CartState]
+
+class CartStore(ABC):
+    """
+    Write-behind cache of carts keyed by user id. Reads and changes are served
+    by the backend; changed carts are marked dirty and a daemon thread hands
+    the latest state of every dirty cart to the writer in batches, so a burst
+    of edits to one cart costs one database write. stop() drains whatever is
+    still pending.
+
+    Cart states are JSON-compatible dicts; each get() returns a fresh copy.
+    """
+
+    def __init__(self, flush_seconds: float, batch_size: int):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.writer: Optional[Writer] = None
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def set_writer(self, writer: Writer) -> None:
+        self.writer = writer
+
+    # Backend operations
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[CartState]:
+        ...
+
+    @abstractmethod
+    def add(self, user_id: int, cart: CartState) -> CartState:
+        """
+        Cache a cart loaded from the database unless the store already holds
+        one (which may be newer); returns whichever is kept.
+        """
+
+    @abstractmethod
+    def update(self, user_id: int, updater: Updater, default: Optional[CartState] = None) -> CartState:
+        """
+        Atomically replace a cart with updater(current) and mark it dirty.
+        `default` stands in for a cart that isn't in the store.
+        """
+
+    @abstractmethod
+    def discard(self, user_ids: Sequence[int]) -> None:
+        # Forget carts deleted from the database; dirty ones (changed since) stay
+        ...
+
+    @abstractmethod
+    def take_dirty(self, limit: int) -> List[CartState]:
+        # Claim up to `limit` dirty carts for writing
+        ...
+
+    @abstractmethod
+    def written(self, carts: Sequence[CartState]) -> None:
+        # Release the claim on carts (as taken) whose write has committed
+        ...
+
+    @abstractmethod
+    def mark_dirty(self, carts: Sequence[CartState]) -> None:
+        # Give claimed carts (as taken) back to be written again (their write failed)
+        ...
+
+    @abstractmethod
+    def pending(self) -> int:
+        ...
+
+    # Flushing
+
+    def flush(self) -> int:
+        """
+        Write every dirty cart, a batch at a time. A batch stays claimed until
+        the writer returns; a failed one is marked dirty again and retried on
+        the next flush.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                carts = self.take_dirty(self.batch_size)
+                if not carts:
+                    break
+                try:
+                    self.writer(carts)
+                except Exception as e:
+                    self.mark_dirty(carts)
+                    self.failures += 1
+                    self.last_error = repr(e)
+                    logger.exception("Writing %d carts failed", len(carts))
+                    break
+                self.written(carts)
+                self.batches += 1
+                self.flushed += len(carts)
+                written += len(carts)
+        return written
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._flush_forever, name="cart-flusher", daemon=True)
+        self._thread.start()
+        # Shutdowns that skip the app lifespan still drain pending carts
+        atexit.register(self.flush)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_seconds + 5)
+            self._thread = None
+            atexit.unregister(self.flush)
+        self.flush()
+
+    def _flush_forever(self) -> None:
+        while not self._stopped.wait(self.flush_seconds):
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "pending": self.pending(),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "flushing": self._thread is not None and self._thread.is_alive(),
+        }
+
+class MemoryCartStore(CartStore):
+    """
+    Carts in this process, least recently used first out. Dirty carts, and
+    claimed ones whose write is in flight, are never evicted. Only correct with a single worker: other workers would
+    serve their own copies. Carts changed within the last flush interval are
+    lost if the process is killed without shutting down.
+    """
+
+    def __init__(self, maxsize: int, flush_seconds: float, batch_size: int):
+        super().__init__(flush_seconds, batch_size)
+        self.maxsize = maxsize
+        self._carts: "OrderedDict[int, bytes]" = OrderedDict()
+        self._dirty: Set[int] = set()
+        # Taken by a flush and not yet written; kept so a failed write can
+        # mark them dirty again
+        self._claimed: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[CartState]:
+        with self._lock:
+            raw = self._carts.get(user_id)
+            if raw is None:
+                return None
+            self._carts.move_to_end(user_id)
+        return orjson.loads(raw)
+
+    def add(self, user_id: int, cart: CartState) -> CartState:
+        with self._lock:
+            raw = self._carts.get(user_id)
+            if raw is None:
+                self._set(user_id, orjson.dumps(cart))
+                return cart
+        return orjson.loads(raw)
+
+    def update(self, user_id: int, updater: Updater, default: Optional[CartState] = None) -> CartState:
+        with self._lock:
+            raw = self._carts.get(user_id)
+            cart = updater(orjson.loads(raw) if raw is not None else default)
+            self._set(user_id, orjson.dumps(cart))
+            self._dirty.add(user_id)
+        return cart
+
+    def _set(self, user_id: int, raw: bytes) -> None:
+        self._carts[user_id] = raw
+        self._carts.move_to_end(user_id)
+        if len(self._carts) > self.maxsize:
+            for key in self._carts:
+                if key not in self._dirty and key not in self._claimed:
+                    del self._carts[key]
+                    break
+
+    def discard(self, user_ids: Sequence[int]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                if user_id not in self._dirty and user_id not in self._claimed:
+                    self._carts.pop(user_id, None)
+
+    def take_dirty(self, limit: int) -> List[CartState]:
+        with self._lock:
+            user_ids = [self._dirty.pop() for _ in range(min(limit, len(self._dirty)))]
+            self._claimed.update(user_ids)
+            raws = [self._carts[user_id] for user_id in user_ids]
+        return [orjson.loads(raw) for raw in raws]
+
+    def written(self, carts: Sequence[CartState]) -> None:
+        with self._lock:
+            self._claimed.difference_update(cart["user_id"] for cart in carts)
+
+    def mark_dirty(self, carts: Sequence[CartState]) -> None:
+        user_ids = [cart["user_id"] for cart in carts]
+        with self._lock:
+            self._claimed.difference_update(user_ids)
+            self._dirty.update(user_ids)
+
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["carts"] = len(self._carts)
+        return stats
+
+class RedisCartStore(CartStore):
+    """
+    Carts in Redis (or anything speaking its protocol), shared by every worker.
+    Each cart is a JSON string under `cart:<user id>` with a TTL, dirty user
+    ids live in the `cart:dirty` set, and updates are WATCH/MULTI
+    transactions. A flush moves the ids it claims to `cart:flushing` and only
+    drops them once the write commits, so dirty carts survive a worker crash:
+    start() hands any claims left behind back to `cart:dirty`.
+    """
+
+    DIRTY_KEY = "cart:dirty"
+    FLUSHING_KEY = "cart:flushing"
+
+    def __init__(self, url: str, ttl: int, flush_seconds: float, batch_size: int, client: Any = None):
+        super().__init__(flush_seconds, batch_size)
+        self.url = url
+        self.ttl = ttl
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"cart:{user_id}"
+
+    def get(self, user_id: int) -> Optional[CartState]:
+        raw = self.client.get(self._key(user_id))
+        return orjson.loads(raw) if raw is not None else None
+
+    def add(self, user_id: int, cart: CartState) -> CartState:
+        if self.client.set(self._key(user_id), orjson.dumps(cart), ex=self.ttl, nx=True):
+            return cart
+        return self.get(user_id) or cart
+
+    def update(self, user_id: int, updater: Updater, default: Optional[CartState] = None) -> CartState:
+        from redis.exceptions import WatchError
+
+        key = self._key(user_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    cart = updater(orjson.loads(raw) if raw is not None else default)
+                    pipe.multi()
+                    pipe.set(key, orjson.dumps(cart), ex=self.ttl)
+                    pipe.sadd(self.DIRTY_KEY, user_id)
+                    pipe.execute()
+                    return cart
+                except WatchError:
+                    # Changed by another request in between; retry on the new value
+                    continue
+
+    def discard(self, user_ids: Sequence[int]) -> None:
+        if not user_ids:
+            return
+        with self.client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.sismember(self.DIRTY_KEY, user_id)
+            dirty = pipe.execute()
+        stale = [self._key(user_id) for user_id, is_dirty in zip(user_ids, dirty) if not is_dirty]
+        if stale:
+            self.client.delete(*stale)
+
+    def _move(self, source: str, destination: str, user_ids: Sequence[Any]) -> List[Any]:
+        # SMOVE is atomic per id, so of two workers claiming one id only one gets it
+        with self.client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.smove(source, destination, user_id)
+            moved = pipe.execute()
+        return [user_id for user_id, was_moved in zip(user_ids, moved) if was_moved]
+
+    def take_dirty(self, limit: int) -> List[CartState]:
+        user_ids = self._move(self.DIRTY_KEY, self.FLUSHING_KEY, self.client.srandmember(self.DIRTY_KEY, limit))
+        if not user_ids:
+            return []
+        raws = self.client.mget([self._key(int(user_id)) for user_id in user_ids])
+        expired = [user_id for user_id, raw in zip(user_ids, raws) if raw is None]
+        if expired:
+            # Nothing left to write
+            self.client.srem(self.FLUSHING_KEY, *expired)
+        return [orjson.loads(raw) for raw in raws if raw is not None]
+
+    def _release(self, carts: Sequence[CartState], dirty: bool) -> None:
+        """
+        Drop this worker's claims on `carts`, marking them dirty again first
+        when `dirty`. A cart changed since it was taken is already dirty, and
+        may by now be claimed by another worker, so its claim is left alone
+        for that worker (or the next flush) to release.
+        """
+        from redis.exceptions import WatchError
+
+        if not carts:
+            return
+        keys = [self._key(cart["user_id"]) for cart in carts]
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*keys)
+                    unchanged = [
+                        cart["user_id"] for cart, raw in zip(carts, pipe.mget(keys))
+                        if raw is None or orjson.loads(raw)["version"] == cart["version"]
+                    ]
+                    if not unchanged:
+                        return
+                    pipe.multi()
+                    if dirty:
+                        pipe.sadd(self.DIRTY_KEY, *unchanged)
+                    pipe.srem(self.FLUSHING_KEY, *unchanged)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    # A cart changed in between; decide again on the new versions
+                    continue
+
+    def written(self, carts: Sequence[CartState]) -> None:
+        self._release(carts, dirty=False)
+
+    def mark_dirty(self, carts: Sequence[CartState]) -> None:
+        self._release(carts, dirty=True)
+
+    def recover(self) -> int:
+        """
+        Return every claimed id to the dirty set. A claim still in flight on
+        another worker is then written twice, which the upsert's expires_at
+        guard makes harmless.
+        """
+        return len(self._move(self.FLUSHING_KEY, self.DIRTY_KEY, self.client.smembers(self.FLUSHING_KEY)))
+
+    def start(self) -> None:
+        recovered = self.recover()
+        if recovered:
+            logger.warning("Recovered %d cart writes left unfinished by a stopped worker", recovered)
+        super().start()
+
+    def pending(self) -> int:
+        return self.client.scard(self.DIRTY_KEY)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["url"] = self.url
+        stats["claimed"] = self.client.scard(self.FLUSHING_KEY)
+        return stats
+
+def create_cart_store() -> Optional[CartStore]:
+    if settings.CART_STORE == "memory":
+        return MemoryCartStore(settings.CART_STORE_SIZE, settings.CART_FLUSH_SECONDS, settings.CART_FLUSH_BATCH)
+    if settings.CART_STORE == "redis":
+        return RedisCartStore(
+            settings.CART_STORE_REDIS_URL, settings.CART_STORE_TTL_SECONDS,
+            settings.CART_FLUSH_SECONDS, settings.CART_FLUSH_BATCH,
+        )
+    return None
+
+# None when carts are read and written straight through the database
+cart_store = create_cart_store()
@@ -0,0 +1,138 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config.settings import settings
+
+logger = logging.getLogger("app.sql")
+
+_PARAM = re.compile(r"%\(\w+\)s|\$\d+|\?")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalise a statement so the same query with different parameters (or a
+    different number of IN items) counts as one shape.
+    """
+    shape = _PARAM.sub("?", statement)
+    shape = _PARAM_LIST.sub("(?)", shape)
+    return " ".join(shape.split())
+
+class QueryStats:
+    """
+    SQL issued while one request (or test block) was running.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_time += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Dict[str, Any]]:
+        # Shapes run `threshold` or more times: the usual N+1 signature
+        threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+        return [
+            {"statement": shape, "count": count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.total_time * 1000, 3),
+            "repeated": self.repeated(),
+        }
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Process-wide collectors for tests, where TestClient runs the app on another thread
+_global_stats: List[QueryStats] = []
+
+# The start time lives on the statement's execution context, which is
+# dropped with the statement, so one that raises leaves nothing behind on
+# the (pooled) connection
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and (_current_stats.get() is not None or _global_stats):
+        context._query_start = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for collector in _global_stats:
+        collector.record(statement, elapsed)
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Collect every statement executed in this context (including sync
+    endpoints run in the threadpool, which inherit the context).
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+@contextmanager
+def assert_max_queries(max_count: int) -> Iterator[QueryStats]:
+    """
+    Test helper: fail if the block runs more than `max_count` statements.
+    Counts statements from every thread, so it works around TestClient calls.
+
+        with assert_max_queries(3):
+            client.post("/cart/", json=items, headers=auth)
+    """
+    stats = QueryStats()
+    _global_stats.append(stats)
+    try:
+        yield stats
+    finally:
+        _global_stats.remove(stats)
+    if stats.count > max_count:
+        shapes = "\n".join(f"  {count}x {shape}" for shape, count in stats.shapes.most_common())
+        raise AssertionError(f"Expected at most {max_count} queries, got {stats.count}:\n{shapes}")
+
+async def query_stats_middleware(request, call_next):
+    """
+    Count the SQL behind each request. With QUERY_STATS_HEADERS the numbers
+    are sent as response headers; otherwise they are logged as one JSON line.
+    Repeated statement shapes (likely N+1 loops) are logged as warnings.
+    """
+    with track_queries() as stats:
+        response = await call_next(request)
+    summary = stats.summary()
+    if settings.QUERY_STATS_HEADERS:
+        response.headers["X-DB-Queries"] = str(summary["queries"])
+        response.headers["X-DB-Time-Ms"] = str(summary["db_time_ms"])
+        response.headers["X-DB-Repeated-Queries"] = str(sum(item["count"] for item in summary["repeated"]))
+    record = json.dumps({
+        "method": request.method,
+        "path": request.url.path,
+        "status": response.status_code,
+        **summary,
+    })
+    if summary["repeated"]:
+        logger.warning(record)
+    elif not settings.QUERY_STATS_HEADERS:
+        logger.info(record)
+    return response
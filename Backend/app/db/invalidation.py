@@ -0,0 +1,209 @@
+import json
+import logging
+import select
+import threading
+import uuid
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config.settings import settings
+
+logger = logging.getLogger("app.invalidation")
+
+Handler = Callable[[Any], None]
+
+class InvalidationBus:
+    """
+    Fans cache invalidations out to every worker. Modules subscribe a handler
+    per topic ("catalog", "principal", ...) that evicts their local entries;
+    publish() runs the local handlers immediately and forwards the message to
+    the other workers through the backend.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._flush_handlers: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.published = 0
+        self.received = 0
+        self.flushes = 0
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic].append(handler)
+
+    def on_flush(self, handler: Callable[[], None]) -> None:
+        # Called when messages may have been missed; should drop everything
+        self._flush_handlers.append(handler)
+
+    def publish(self, topic: str, key: Any = None) -> None:
+        self._dispatch(topic, key)
+        with self._lock:
+            self.published += 1
+        self._send(json.dumps({"origin": self.origin, "topic": topic, "key": key}))
+
+    def receive(self, payload: str) -> None:
+        """
+        Apply a message from another worker. Our own messages were already
+        applied by publish() and are ignored.
+        """
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation message: %r", payload)
+            return
+        if message.get("origin") == self.origin:
+            return
+        with self._lock:
+            self.received += 1
+        self._dispatch(message.get("topic"), message.get("key"))
+
+    def flush(self) -> None:
+        with self._lock:
+            self.flushes += 1
+        for handler in self._flush_handlers:
+            handler()
+
+    def _dispatch(self, topic: str, key: Any) -> None:
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", topic)
+
+    def _send(self, payload: str) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": type(self).__name__,
+                "published": self.published,
+                "received": self.received,
+                "flushes": self.flushes,
+            }
+
+class MemoryInvalidationBus(InvalidationBus):
+    """
+    Single-process bus. The latest messages are kept in `sent` so tests can
+    hand them to another bus with receive() to simulate a second worker.
+    """
+
+    def __init__(self, keep: int = 1000):
+        super().__init__()
+        self.sent: deque = deque(maxlen=keep)
+
+    def _send(self, payload: str) -> None:
+        self.sent.append(payload)
+
+class PostgresInvalidationBus(InvalidationBus):
+    """
+    Bus over Postgres LISTEN/NOTIFY. A daemon thread holds its own connection
+    (outside the pool) listening on `channel`; after a dropped connection it
+    reconnects and flushes every subscriber, since NOTIFYs sent while it was
+    away are lost.
+    """
+
+    def __init__(self, dsn: str, channel: str, poll_seconds: float = 5.0):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.poll_seconds = poll_seconds
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self._publisher = None
+        self._publisher_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connect(self):
+        import psycopg2
+
+        connection = psycopg2.connect(self.dsn)
+        connection.autocommit = True
+        return connection
+
+    def _send(self, payload: str) -> None:
+        with self._publisher_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None or self._publisher.closed:
+                        self._publisher = self._connect()
+                    with self._publisher.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                    return
+                except Exception as e:
+                    self.last_error = repr(e)
+                    self._publisher = None
+            logger.error("Could not publish invalidation on %s: %s", self.channel, self.last_error)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._listen_forever, name="invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 1)
+            self._thread = None
+
+    def _listen_forever(self) -> None:
+        backoff = 1.0
+        connected_before = False
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                if connected_before:
+                    self.reconnects += 1
+                    self.flush()
+                connected_before = True
+                backoff = 1.0
+                self._listen(connection)
+            except Exception as e:
+                self.last_error = repr(e)
+                logger.warning("Invalidation listener disconnected: %s", self.last_error)
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if connection is not None and not connection.closed:
+                    connection.close()
+
+    def _listen(self, connection) -> None:
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([connection], [], [], self.poll_seconds)
+            if not readable:
+                # Idle: make sure the connection is still alive
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            connection.poll()
+            while connection.notifies:
+                self.receive(connection.notifies.pop(0).payload)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({
+            "channel": self.channel,
+            "listening": self._thread is not None and self._thread.is_alive(),
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        })
+        return stats
+
+def create_bus() -> InvalidationBus:
+    if settings.INVALIDATION_BUS == "postgres":
+        return PostgresInvalidationBus(settings.DATABASE_URL, settings.INVALIDATION_CHANNEL)
+    return MemoryInvalidationBus()
+
+bus = create_bus()
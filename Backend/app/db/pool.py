@@ -0,0 +1,151 @@
+import threading
+import time
+from typing import Any, Dict
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+class PoolStats:
+    """
+    Counters collected from one engine's connection pool.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._connected_at: Dict[int, float] = {}
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.overflow_checkouts = 0
+        self.overflow_peak = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.closed_age_total = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+                return
+            self.checkouts += 1
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+
+    def record_overflow(self, overflow: int) -> None:
+        with self._lock:
+            if overflow > 0:
+                self.overflow_checkouts += 1
+            self.overflow_peak = max(self.overflow_peak, overflow)
+
+    def record_connect(self, key: int) -> None:
+        with self._lock:
+            self.connects += 1
+            self._connected_at[key] = time.monotonic()
+
+    def record_close(self, key: int) -> None:
+        with self._lock:
+            connected_at = self._connected_at.pop(key, None)
+            if connected_at is not None:
+                self.closes += 1
+                self.closed_age_total += time.monotonic() - connected_at
+
+    def record_invalidate(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    # Pool event listeners. They live here rather than on the pool because
+    # engine.dispose() recreates the pool and copies its listeners across;
+    # bound to these shared stats, the copies are recognised and not added twice.
+
+    def on_connect(self, dbapi_connection, connection_record) -> None:
+        self.record_connect(id(dbapi_connection))
+
+    def on_close(self, dbapi_connection, connection_record) -> None:
+        self.record_close(id(dbapi_connection))
+
+    def on_close_detached(self, dbapi_connection) -> None:
+        self.record_close(id(dbapi_connection))
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        self.record_invalidate()
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - connected_at for connected_at in self._connected_at.values()]
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait_avg_ms": round(self.checkout_wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+                "overflow_checkouts": self.overflow_checkouts,
+                "overflow_peak": self.overflow_peak,
+                "connects": self.connects,
+                "closes": self.closes,
+                "invalidations": self.invalidations,
+                "open_connections": len(ages),
+                "connection_age_max_s": round(max(ages), 1) if ages else 0.0,
+                "connection_age_avg_s": round(sum(ages) / len(ages), 1) if ages else 0.0,
+                "closed_connection_age_avg_s": round(self.closed_age_total / self.closes, 1) if self.closes else 0.0,
+            }
+
+_pool_stats: Dict[str, PoolStats] = {}
+
+def get_pool_stats(name: str) -> PoolStats:
+    # Keyed by pool name so counters survive engine.dispose()/pool recreation
+    if name not in _pool_stats:
+        _pool_stats[name] = PoolStats(name)
+    return _pool_stats[name]
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that reports checkout wait time, overflow use and connection age.
+    The pool is named through create_engine(pool_logging_name=...).
+    """
+
+    def __init__(self, creator, **kw):
+        super().__init__(creator, **kw)
+        self.stats = get_pool_stats(kw.get("logging_name") or "default")
+        for identifier, listener in (
+            ("connect", self.stats.on_connect),
+            ("close", self.stats.on_close),
+            ("close_detached", self.stats.on_close_detached),
+            ("invalidate", self.stats.on_invalidate),
+        ):
+            # Already there when this pool replaces a disposed one
+            if listener not in getattr(self.dispatch, identifier):
+                event.listen(self, identifier, listener)
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except Exception:
+            self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started)
+        self.stats.record_overflow(self.overflow())
+        return connection
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """
+    InstrumentedQueuePool for AsyncEngine, which requires an asyncio-aware queue.
+    """
+
+def pool_status(engine) -> Dict[str, Any]:
+    """
+    Live pool occupancy merged with the collected counters.
+    """
+    pool = getattr(engine, "sync_engine", engine).pool
+    status = {
+        "pool": type(pool).__name__,
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+        "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+    }
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(pool.stats.snapshot())
+    return status
@@ -1,9 +1,20 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, TIMESTAMP, JSON, ARRAY
+from sqlalchemy import Column, Computed, Integer, String, Float, Boolean, ForeignKey, TIMESTAMP, JSON, ARRAY, Index
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.db.base import Base
 
+# Weighted search document: name ranks above category above description.
+# 'simple' (no stemming) keeps prefix matches on partial product names exact.
+PRODUCT_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(product_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(product_category, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(product_description, '')), 'C')"
+)
+
 class User(Base):
     __tablename__ = "users"
+    __mapper_args__ = {"eager_defaults": True}  # Fetch server defaults/onupdate values with RETURNING
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
@@ -12,14 +23,20 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     password = Column(String)  # Storing hashed password
     role = Column(Integer)  # 1: Admin, 2: Customer, 3: Delivery Boy
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped to revoke access tokens
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
 class Product(Base):
     __tablename__ = "products"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_products_product_category", "product_category", "product_id"),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     product_id = Column(Integer, primary_key=True, index=True)
-    product_name = Column(String)
+    product_name = Column(String, index=True)
     product_category = Column(String)
     product_description = Column(String)
     product_weight = Column(Integer)  # In kilograms
@@ -27,20 +44,43 @@ class Product(Base):
     stock_quantity = Column(Integer)
     images = Column(ARRAY(String))  # Array of image URLs
     ratings = Column(Float)
+    # Maintained by Postgres; deferred so normal product loads never fetch it
+    search_vector = deferred(Column(TSVECTOR, Computed(PRODUCT_SEARCH_VECTOR, persisted=True)))
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
 class Cart(Base):
     __tablename__ = "carts"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_carts_expires_at", "expires_at"),
+    )
     
     cart_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    products = Column(JSON)  # List of products with quantities
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
+    products = Column(JSONB)  # List of products with quantities
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped on every change
     expires_at = Column(TIMESTAMP)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+class CartArchive(Base):
+    # Expired carts moved out of carts by the sweeper (CART_SWEEP_ARCHIVE)
+    __tablename__ = "carts_archive"
+
+    cart_id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, index=True)
+    products = Column(JSONB)
+    version = Column(Integer)
+    expires_at = Column(TIMESTAMP)
+    created_at = Column(TIMESTAMP)
+    archived_at = Column(TIMESTAMP, server_default=func.now())
+
 class Order(Base):
     __tablename__ = "orders"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
     
     order_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -54,6 +94,7 @@ class Order(Base):
 
 class OrderHistory(Base):
     __tablename__ = "order_history"
+    __mapper_args__ = {"eager_defaults": True}
     
     history_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
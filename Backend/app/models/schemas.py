@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
 
 # User Schemas
@@ -42,6 +42,21 @@ class Token(BaseModel):
 class TokenPayload(BaseModel):
     sub: str
     exp: int
+    # Present only on tokens issued in claims mode
+    uid: Optional[int] = None
+    role: Optional[int] = None
+    ver: Optional[int] = None
+
+class Principal(BaseModel):
+    # Snapshot of the authenticated user, safe to cache across requests
+    id: int
+    email: str
+    role: int
+    name: Optional[str] = None
+    location: Optional[str] = None
+    contact_number: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 class LoginRequest(BaseModel):
     email: EmailStr
@@ -82,6 +97,37 @@ class ProductInDB(ProductBase):
 class Product(ProductInDB):
     pass
 
+class ProductBatchRequest(BaseModel):
+    ids: List[int]
+
+class ProductBatch(BaseModel):
+    products: List[Product]  # in request order
+    missing: List[int]
+
+class PriceBand(BaseModel):
+    min_price: Optional[int] = None  # inclusive
+    max_price: Optional[int] = None  # exclusive
+    count: int
+
+class CategoryCount(BaseModel):
+    category: str
+    count: int
+    in_stock: int
+
+class ProductFacets(BaseModel):
+    category: Optional[str] = None  # None: the whole catalog
+    count: int
+    in_stock: int
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    price_bands: List[PriceBand]
+
+class Suggestion(BaseModel):
+    text: str
+    kind: str  # "product" or "category"
+    product_id: Optional[int] = None
+    category: Optional[str] = None
+
 # Cart Schemas
 class CartItemBase(BaseModel):
     product_id: int
@@ -104,9 +150,35 @@ class CartUpdate(BaseModel):
 
 class CartInDB(CartBase):
     cart_id: int
+    version: int = 0
     expires_at: datetime
     created_at: datetime
 
+class CartItemPatch(BaseModel):
+    op: Literal["set", "increment", "remove"]
+    quantity: Optional[int] = None  # the new quantity for "set", the change for "increment"
+    product_name: Optional[str] = None  # kept on a line this adds
+    version: Optional[int] = None  # cart version the change was based on; stale ones are rejected
+
+class CartItemChange(BaseModel):
+    product_id: int
+    item: Optional[CartItemBase] = None  # None once the line is gone
+    version: int
+
+class PricedCartItem(CartItemBase):
+    unit_price: Optional[int] = None  # None when the product no longer exists or has no price
+    line_total: int = 0
+    stock_quantity: int = 0
+    available: bool  # the product exists, is priced and its stock covers the quantity
+
+class PricedCart(BaseModel):
+    cart_id: int
+    user_id: int
+    version: int
+    products: List[PricedCartItem]
+    total: int  # sum of line totals at current prices
+    available: bool  # every line is available
+
 class CartCleared(BaseModel):
     response: str
 
@@ -1,30 +1,65 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
-from sqlalchemy.orm import Session
+from typing import Any, Dict, Generic, Iterator, List, NamedTuple, Optional, Sequence, Type, TypeVar, Union
+from sqlalchemy import cast, column, literal_column, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
 from pydantic import BaseModel
 from app.db.base import Base
+from app.core.config.settings import settings
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound="BaseModel")
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound="BaseModel")
 
+class BulkOutcome(NamedTuple):
+    # Per-row result of a bulk write: status is "created", "updated" or "missing"
+    obj: Optional[Any]
+    status: str
+
+def _chunks(rows: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def only_columns(model: Type[ModelType], fields: Optional[Sequence[str]]) -> list:
+    """
+    Loader options that load just `fields` (plus the primary key) and defer
+    every other column; touching a deferred one raises instead of lazy
+    loading it row by row.
+    """
+    if not fields:
+        return []
+    return [load_only(*[getattr(model, name) for name in fields], raiseload=True)]
+
 class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
+        self.pk = model.__mapper__.primary_key[0]
 
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == id).first()
 
+    def _commit(self, db: Session) -> None:
+        # Inside unit_of_work only flush; the unit of work commits once at the end
+        if db.info.get("unit_of_work"):
+            db.flush()
+        else:
+            db.commit()
+
     def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+        self, db: Session, *, skip: int = 0, limit: int = 100, after: Optional[Any] = None,
+        fields: Optional[Sequence[str]] = None
     ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        # `after` is the last primary key of the previous page (keyset pagination)
+        query = db.query(self.model).options(*only_columns(self.model, fields)).order_by(self.pk)
+        if after is not None:
+            return query.filter(self.pk > after).limit(limit).all()
+        return query.offset(skip).limit(limit).all()
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = dict(obj_in)
         db_obj = self.model(**obj_in_data)  # type: ignore
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self._commit(db)
         return db_obj
 
     def update(
@@ -43,12 +78,183 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self._commit(db)
         return db_obj
 
     def remove(self, db: Session, *, id: int) -> ModelType:
         obj = db.query(self.model).get(id)
         db.delete(obj)
-        db.commit()
-        return obj
\ No newline at end of file
+        self._commit(db)
+        return obj
+
+    def _row_data(self, obj_in: Union[CreateSchemaType, UpdateSchemaType, Dict[str, Any]]) -> Dict[str, Any]:
+        # Drop keys that are not table columns (schemas and spreadsheets carry extras)
+        data = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+        columns = self.model.__table__.columns
+        return {key: value for key, value in data.items() if key in columns}
+
+    def bulk_create(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        chunk_size: Optional[int] = None
+    ) -> List[BulkOutcome]:
+        """
+        Insert many rows with one multi-row INSERT ... RETURNING per chunk and a
+        single commit. Outcomes are in input order.
+        """
+        rows = [self._row_data(obj_in) for obj_in in objs_in]
+        outcomes: List[BulkOutcome] = []
+        stmt = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+        for chunk in _chunks(rows, chunk_size or settings.DB_BULK_CHUNK_SIZE):
+            created = db.scalars(stmt, list(chunk)).all()
+            outcomes.extend(BulkOutcome(obj, "created") for obj in created)
+        self._commit(db)
+        return outcomes
+
+    def bulk_upsert(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        index_elements: Sequence[str],
+        chunk_size: Optional[int] = None
+    ) -> List[BulkOutcome]:
+        """
+        INSERT ... ON CONFLICT (index_elements) DO UPDATE for many rows.
+        index_elements must name a unique constraint or index. A row's status is
+        "created" or "updated"; rows that repeat a key within one chunk are
+        rejected by Postgres, so dedupe the input first.
+        """
+        rows = [self._row_data(obj_in) for obj_in in objs_in]
+        outcomes: List[BulkOutcome] = []
+        for chunk in _chunks(rows, chunk_size or settings.DB_BULK_CHUNK_SIZE):
+            stmt = insert(self.model).values(list(chunk))
+            update_columns = {
+                name: stmt.excluded[name]
+                for name in chunk[0]
+                if name not in index_elements and name != self.pk.key
+            }
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(index_elements), set_=update_columns
+            ).returning(
+                self.model,
+                # xmax is zero only for tuples this statement inserted
+                literal_column("xmax = 0").label("inserted"),
+            )
+            result = db.execute(stmt, execution_options={"populate_existing": True})
+            # Multi-row VALUES has no guaranteed RETURNING order; match rows back by key
+            by_key = {
+                tuple(getattr(obj, name) for name in index_elements): BulkOutcome(
+                    obj, "created" if inserted else "updated"
+                )
+                for obj, inserted in result.all()
+            }
+            outcomes.extend(
+                by_key[tuple(row[name] for name in index_elements)] for row in chunk
+            )
+        self._commit(db)
+        return outcomes
+
+    def bulk_update(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Dict[str, Any]],
+        chunk_size: Optional[int] = None
+    ) -> List[BulkOutcome]:
+        """
+        Update many rows by primary key with UPDATE ... FROM (VALUES ...) RETURNING.
+        Each dict must carry the primary key; rows are grouped by the set of
+        columns they change. Keys not found in the table come back "missing".
+        """
+        pk_name = self.pk.key
+        rows = [self._row_data(obj_in) for obj_in in objs_in]
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        updated: Dict[Any, ModelType] = {}
+        table_columns = self.model.__table__.columns
+        for names, group in groups.items():
+            fields = [name for name in names if name != pk_name]
+            if pk_name not in names or not fields:
+                continue
+            for chunk in _chunks(group, chunk_size or settings.DB_BULK_CHUNK_SIZE):
+                data = values(
+                    *[column(name, table_columns[name].type) for name in names],
+                    name="bulk_rows",
+                ).data([tuple(row[name] for name in names) for row in chunk])
+                stmt = (
+                    update(self.model)
+                    .where(self.pk == data.c[pk_name])
+                    .values({name: cast(data.c[name], table_columns[name].type) for name in fields})
+                    .returning(self.model)
+                )
+                returned = db.scalars(stmt, execution_options={"synchronize_session": "fetch", "populate_existing": True})
+                for obj in returned:
+                    updated[getattr(obj, pk_name)] = obj
+        self._commit(db)
+
+        outcomes: List[BulkOutcome] = []
+        for row in rows:
+            obj = updated.get(row.get(pk_name))
+            outcomes.append(BulkOutcome(obj, "updated" if obj is not None else "missing"))
+        return outcomes
+
+
+class AsyncBaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    AsyncSession counterpart of BaseRepository, used when DB_ENGINE=async.
+    """
+    def __init__(self, model: Type[ModelType]):
+        self.model = model
+        self.pk = model.__mapper__.primary_key[0]
+
+    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        return await db.get(self.model, id)
+
+    async def get_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, after: Optional[Any] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[ModelType]:
+        query = select(self.model).options(*only_columns(self.model, fields)).order_by(self.pk)
+        if after is not None:
+            query = query.filter(self.pk > after)
+        else:
+            query = query.offset(skip)
+        result = await db.execute(query.limit(limit))
+        return list(result.scalars().all())
+
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+        obj_in_data = dict(obj_in)
+        db_obj = self.model(**obj_in_data)  # type: ignore
+        db.add(db_obj)
+        await db.commit()
+        return db_obj
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        obj_data = db_obj.__dict__
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        for field in obj_data:
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+        db.add(db_obj)
+        await db.commit()
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, id: int) -> Optional[ModelType]:
+        obj = await db.get(self.model, id)
+        await db.delete(obj)
+        await db.commit()
+        return obj
@@ -1,92 +1,299 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import (
+    TIMESTAMP, Integer, String, Text, bindparam, case, cast, column, delete, func, literal, literal_column, or_, select, update
+)
+from sqlalchemy.dialects.postgresql import JSONB, array, insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.models import Cart
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm.attributes import flag_modified
+from app.models.models import Cart, CartArchive
 from app.models.schemas import CartCreate, CartUpdate, CartItemBase
-from app.repositories.base import BaseRepository
+from app.repositories.base import BaseRepository, AsyncBaseRepository
 from datetime import datetime, timedelta
 
+def merge_cart_products(existing: Optional[list], items: List[CartItemBase]) -> list:
+    # Ensure products is a list
+    existing_products = existing if isinstance(existing, list) else []
+
+    # Create a dictionary for fast lookup of existing products
+    product_map = {item['product_id']: item for item in existing_products}
+
+    # Replace existing products with new ones
+    for new_item in items:
+        item_dict = new_item.dict()
+        product_id = item_dict['product_id']
+        product_map[product_id] = item_dict  # Replace instead of adding quantity
+
+    # Convert back to list
+    return list(product_map.values())
+
+# Prebuilt statement for the per-request cart lookup (see product_repository).
+# It refreshes a cart already in the session, so a retry after a stale write
+# (see _SAVE_LOADED) starts from the row as it is now.
+_BY_USER = select(Cart).where(Cart.user_id == bindparam("user_id")).limit(1).execution_options(populate_existing=True)
+
+# A user's first cart. Two concurrent first requests race on the unique
+# carts.user_id index: the loser inserts nothing and merges into the winner's.
+_CREATE = insert(Cart).on_conflict_do_nothing(index_elements=[Cart.user_id]).returning(Cart)
+
+# Whole-cart upsert for write-behind flushes. Every change pushes expires_at
+# forward, so a row only takes a write at least as new as what it holds; a
+# snapshot flushed late can't undo a later write (e.g. the clear on ordering).
+_SAVE = insert(Cart)
+_SAVE = _SAVE.on_conflict_do_update(
+    index_elements=[Cart.user_id],
+    set_={
+        "products": _SAVE.excluded.products,
+        "version": _SAVE.excluded.version,
+        "expires_at": _SAVE.excluded.expires_at,
+    },
+    where=or_(Cart.expires_at.is_(None), Cart.expires_at <= _SAVE.excluded.expires_at),
+)
+
+# One line of a cart changed in place by a single UPDATE. Every expression
+# reads the row being updated, so a concurrent change to the same cart is
+# re-read (not overwritten) when Postgres re-checks the locked row.
+_PRODUCT_ID = bindparam("product_id", type_=Integer)
+_LINES = func.jsonb_array_elements(Cart.products).table_valued(
+    column("value", JSONB), with_ordinality="position"
+).render_derived()
+_MATCH = _LINES.c.value["product_id"].astext.cast(Integer) == _PRODUCT_ID
+# jsonb arrays count from 0, ordinality from 1
+_POSITION = select(cast(_LINES.c.position, Integer) - 1).where(_MATCH).limit(1).scalar_subquery()
+_CURRENT_QUANTITY = select(_LINES.c.value["quantity"].astext.cast(Integer)).where(_MATCH).limit(1).scalar_subquery()
+_LINE = select(_LINES.c.value).where(_MATCH).limit(1).scalar_subquery()
+
+def _change_item_statement(new_quantity):
+    # Explicit casts: jsonb_build_object()/to_jsonb() can't infer parameter types
+    new_quantity = cast(new_quantity, Integer)
+    new_line = func.jsonb_build_object(
+        literal_column("'product_id'"), cast(_PRODUCT_ID, Integer),
+        literal_column("'product_name'"), cast(bindparam("product_name", type_=String), String),
+        literal_column("'quantity'"), new_quantity,
+    )
+    products = case(
+        (new_quantity <= 0, func.coalesce(Cart.products.op("-", return_type=JSONB)(_POSITION), Cart.products)),
+        (_POSITION.is_(None), Cart.products.op("||", return_type=JSONB)(func.jsonb_build_array(new_line))),
+        else_=func.jsonb_set(
+            Cart.products, array([cast(_POSITION, Text), literal_column("'quantity'", Text)]), func.to_jsonb(new_quantity)
+        ),
+    )
+    return (
+        update(Cart)
+        .where(Cart.user_id == bindparam("cart_user_id"))
+        .values(products=products, version=Cart.version + 1, expires_at=bindparam("new_expires_at"))
+        .returning(Cart.version, _LINE.label("item"))
+    )
+
+_CHANGE_ITEM = {
+    "set": _change_item_statement(bindparam("quantity", type_=Integer)),
+    "increment": _change_item_statement(func.coalesce(_CURRENT_QUANTITY, 0) + bindparam("quantity", type_=Integer)),
+    "remove": _change_item_statement(literal(0)),
+}
+_VERSION = select(Cart.version).where(Cart.user_id == bindparam("user_id"))
+
+# Whole-cart writes of a cart read earlier in the request. Postgres bumps the
+# version, and only while the row is still at the version that was read, so
+# a concurrent change (e.g. a PATCH of one line) is never overwritten and the
+# version it returned never comes back with other contents.
+_SAVE_LOADED = (
+    update(Cart)
+    .where(Cart.cart_id == bindparam("loaded_cart_id"), Cart.version == bindparam("loaded_version"))
+    .values(
+        # SQL expressions rather than bare parameters, so the "fetch" sync
+        # copies them from RETURNING into the cart already in the session
+        products=cast(bindparam("new_products", type_=JSONB), JSONB),
+        version=Cart.version + 1,
+        expires_at=cast(bindparam("new_expires_at"), TIMESTAMP),
+    )
+    .returning(Cart)
+    .execution_options(synchronize_session="fetch")
+)
+_CLEAR = (
+    update(Cart)
+    .where(Cart.user_id == bindparam("cart_user_id"))
+    .values(products=func.jsonb_build_array(), version=Cart.version + 1)
+    .returning(Cart.version)
+)
+
+# Oldest expired carts first, via ix_carts_expires_at. Rows another sweeper
+# (or a request) has locked are skipped rather than waited on.
+_EXPIRED = (
+    select(Cart.cart_id)
+    .where(Cart.expires_at < bindparam("before"))
+    .order_by(Cart.expires_at)
+    .limit(bindparam("limit"))
+    .with_for_update(skip_locked=True)
+)
+_SWEEP = delete(Cart).where(Cart.cart_id.in_(_EXPIRED.scalar_subquery()))
+_DELETE_EXPIRED = _SWEEP.returning(Cart.user_id)
+_ARCHIVE_COLUMNS = ["cart_id", "user_id", "products", "version", "expires_at", "created_at"]
+_SWEPT = _SWEEP.returning(*(getattr(Cart, name) for name in _ARCHIVE_COLUMNS)).cte("swept")
+# On the Table: an ORM insert() run with parameters is taken for a bulk insert
+_ARCHIVE_EXPIRED = (
+    insert(CartArchive.__table__)
+    .from_select(_ARCHIVE_COLUMNS, select(*(_SWEPT.c[name] for name in _ARCHIVE_COLUMNS)))
+    .returning(CartArchive.__table__.c.user_id)
+)
+
+def _change_item(op: str, version: Optional[int]):
+    stmt = _CHANGE_ITEM[op]
+    if version is not None:
+        stmt = stmt.where(Cart.version == bindparam("cart_version", type_=Integer))
+    return stmt
+
 class CartRepository(BaseRepository[Cart, CartCreate, CartUpdate]):
     def get_by_user(self, db: Session, *, user_id: int) -> Optional[Cart]:
-        return db.query(Cart).filter(Cart.user_id == user_id).first()
+        return db.scalars(_BY_USER, {"user_id": user_id}).first()
     
-    def create(self, db: Session, *, obj_in: CartCreate) -> Cart:
+    def create(self, db: Session, *, obj_in: CartCreate) -> Optional[Cart]:
         # Convert products list to list of dictionaries for JSONB
         products_json = [item.dict() for item in obj_in.products]
         # Set expiry to 7 days
         expires_at = datetime.now() + timedelta(days=7)
         
-        db_obj = Cart(
-            user_id=obj_in.user_id,
-            products=products_json,
-            expires_at=expires_at
-        )
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        db_obj = db.scalars(
+            _CREATE.values(user_id=obj_in.user_id, products=products_json, expires_at=expires_at)
+        ).first()
+        if db_obj is None:
+            # Another request created the cart first; add these items to it
+            # (None if it changes again before they land, as with update)
+            existing = self.get_by_user(db, user_id=obj_in.user_id)
+            return self.update(db, db_obj=existing, obj_in=CartUpdate(products=obj_in.products))
+        self._commit(db)
         return db_obj
     
     
 
-    def update(self, db: Session, *, db_obj: Cart, obj_in: CartUpdate) -> Cart:
-        # Ensure products is a list
-        existing_products = db_obj.products if isinstance(db_obj.products, list) else []
-
-        # Create a dictionary for fast lookup of existing products
-        product_map = {item['product_id']: item for item in existing_products}
+    def update(self, db: Session, *, db_obj: Cart, obj_in: CartUpdate) -> Optional[Cart]:
+        """
+        Merge `obj_in`'s lines into the cart. Returns None, changing nothing,
+        when the cart has changed since `db_obj` was read.
+        """
+        return self._save_loaded(db, db_obj, merge_cart_products(db_obj.products, obj_in.products))
 
-        # Replace existing products with new ones
-        for new_item in obj_in.products:
-            item_dict = new_item.dict()
-            product_id = item_dict['product_id']
-            product_map[product_id] = item_dict  # Replace instead of adding quantity
+    def _save_loaded(self, db: Session, db_obj: Cart, products: list) -> Optional[Cart]:
+        cart = db.scalars(_SAVE_LOADED, {
+            "loaded_cart_id": db_obj.cart_id, "loaded_version": db_obj.version, "new_products": products,
+            # Reset expiry
+            "new_expires_at": datetime.now() + timedelta(days=7),
+        }).first()
+        self._commit(db)
+        return cart
 
-        # Convert back to list
-        db_obj.products = list(product_map.values())
+    def save_many(self, db: Session, *, carts: Sequence[Dict[str, Any]]) -> None:
+        """
+        Write whole carts (user_id, products, version, expires_at) by user,
+        in one batched INSERT ... ON CONFLICT statement.
+        """
+        if carts:
+            db.execute(_SAVE, [
+                {
+                    "user_id": cart["user_id"], "products": cart["products"],
+                    "version": cart["version"], "expires_at": cart["expires_at"],
+                }
+                for cart in carts
+            ])
+            self._commit(db)
 
-        # Mark column as modified for SQLAlchemy
-        flag_modified(db_obj, "products")
-
-        # Reset expiry
-        db_obj.expires_at = datetime.now() + timedelta(days=7)
-
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+    def change_item(
+        self, db: Session, *, user_id: int, product_id: int, op: str, quantity: Optional[int] = None,
+        product_name: Optional[str] = None, version: Optional[int] = None
+    ) -> Optional[Row]:
+        """
+        Set, increment or remove one line of a user's cart in a single
+        statement; a quantity that ends up at or below zero removes the line.
+        With `version`, only a cart still at that version is changed. Returns
+        (version, item) with the line as it is now (None once removed), or
+        None when no cart was changed.
+        """
+        row = db.execute(_change_item(op, version), {
+            "cart_user_id": user_id, "product_id": product_id, "quantity": quantity,
+            "product_name": product_name, "cart_version": version,
+            "new_expires_at": datetime.now() + timedelta(days=7),
+        }).first()
+        self._commit(db)
+        return row
 
+    def get_version(self, db: Session, *, user_id: int) -> Optional[int]:
+        return db.scalar(_VERSION, {"user_id": user_id})
 
+    def sweep_expired(self, db: Session, *, before: datetime, limit: int, archive: bool = False) -> List[int]:
+        """
+        Delete up to `limit` carts that expired before `before`, copying them
+        to carts_archive first when `archive` is set. Returns the swept
+        carts' user ids.
+        """
+        stmt = _ARCHIVE_EXPIRED if archive else _DELETE_EXPIRED
+        user_ids = list(db.scalars(
+            stmt, {"before": before, "limit": limit}, execution_options={"synchronize_session": False}
+        ))
+        self._commit(db)
+        return user_ids
 
     def clear_cart(self, db: Session, *, user_id: int) -> bool:
-        cart = self.get_by_user(db, user_id=user_id)
-        if cart:
-            cart.products = []
-            db.add(cart)
-            db.commit()
-            return True
-        return False
-
-    def remove_item(self, db: Session, *, db_obj: Cart, product_id: int) -> Cart:
+        # Whatever the cart holds now is dropped, so there's no version to check
+        version = db.scalar(_CLEAR, {"cart_user_id": user_id})
+        self._commit(db)
+        return version is not None
+
+    def remove_item(self, db: Session, *, db_obj: Cart, product_id: int) -> Optional[Cart]:
+        """
+        Drop the product's line from the cart. Returns None, changing
+        nothing, when the cart has changed since `db_obj` was read.
+        """
         # Ensure products is a list
         existing_products = db_obj.products if isinstance(db_obj.products, list) else []
 
         # Filter out the product to be removed
         updated_products = [item for item in existing_products if item["product_id"] != product_id]
 
-        # Update the cart
-        db_obj.products = updated_products
-
-        # Mark column as modified for SQLAlchemy
-        flag_modified(db_obj, "products")
+        return self._save_loaded(db, db_obj, updated_products)
 
-        # Reset expiry
-        db_obj.expires_at = datetime.now() + timedelta(days=7)
+class AsyncCartRepository(AsyncBaseRepository[Cart, CartCreate, CartUpdate]):
+    async def get_by_user(self, db: AsyncSession, *, user_id: int) -> Optional[Cart]:
+        result = await db.scalars(_BY_USER, {"user_id": user_id})
+        return result.first()
 
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+    async def create(self, db: AsyncSession, *, obj_in: CartCreate) -> Optional[Cart]:
+        result = await db.scalars(_CREATE.values(
+            user_id=obj_in.user_id,
+            products=[item.dict() for item in obj_in.products],
+            expires_at=datetime.now() + timedelta(days=7)
+        ))
+        db_obj = result.first()
+        if db_obj is None:
+            existing = await self.get_by_user(db, user_id=obj_in.user_id)
+            return await self.update(db, db_obj=existing, obj_in=CartUpdate(products=obj_in.products))
+        await db.commit()
         return db_obj
 
+    async def update(self, db: AsyncSession, *, db_obj: Cart, obj_in: CartUpdate) -> Optional[Cart]:
+        result = await db.scalars(_SAVE_LOADED, {
+            "loaded_cart_id": db_obj.cart_id, "loaded_version": db_obj.version,
+            "new_products": merge_cart_products(db_obj.products, obj_in.products),
+            "new_expires_at": datetime.now() + timedelta(days=7),
+        })
+        cart = result.first()
+        await db.commit()
+        return cart
+
+    async def change_item(
+        self, db: AsyncSession, *, user_id: int, product_id: int, op: str, quantity: Optional[int] = None,
+        product_name: Optional[str] = None, version: Optional[int] = None
+    ) -> Optional[Row]:
+        result = await db.execute(_change_item(op, version), {
+            "cart_user_id": user_id, "product_id": product_id, "quantity": quantity,
+            "product_name": product_name, "cart_version": version,
+            "new_expires_at": datetime.now() + timedelta(days=7),
+        })
+        row = result.first()
+        await db.commit()
+        return row
+
+    async def get_version(self, db: AsyncSession, *, user_id: int) -> Optional[int]:
+        return await db.scalar(_VERSION, {"user_id": user_id})
+
 # Create instance
-cart_repository = CartRepository(Cart)
\ No newline at end of file
+cart_repository = CartRepository(Cart)
+async_cart_repository = AsyncCartRepository(Cart)
\ No newline at end of file
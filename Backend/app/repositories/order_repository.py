@@ -1,15 +1,55 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import JSON, bindparam, func, select, tuple_, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.models import Order
 from app.models.schemas import OrderCreate, OrderStatusUpdate
-from app.repositories.base import BaseRepository
+from app.repositories.base import BaseRepository, AsyncBaseRepository, only_columns
+
+# Prebuilt statements for the hot lookups (see product_repository)
+_BY_ID = select(Order).where(Order.order_id == bindparam("order_id"))
+# Newest first; keyset pages continue below (created_at, order_id) of the last row
+_BY_USER = (
+    select(Order)
+    .where(Order.user_id == bindparam("user_id"))
+    .order_by(Order.created_at.desc(), Order.order_id.desc())
+    .limit(bindparam("limit"))
+)
+_BY_USER_OFFSET = _BY_USER.offset(bindparam("skip"))
+_BY_USER_AFTER = _BY_USER.where(
+    tuple_(Order.created_at, Order.order_id) < tuple_(bindparam("after_created_at"), bindparam("after_order_id"))
+)
+
+# Units ordered per product across all non-cancelled orders, unpacked from
+# the products JSON in the database rather than loading every order
+_LINE = type_coerce(func.json_array_elements(Order.products).column_valued("line", joins_implicitly=True), JSON)
+_LINE_PRODUCT_ID = _LINE["product_id"].as_integer()
+_UNITS_ORDERED = (
+    select(_LINE_PRODUCT_ID.label("product_id"), func.sum(_LINE["quantity"].as_integer()).label("units"))
+    .select_from(Order)
+    .where(Order.order_status != 0)
+    .group_by(_LINE_PRODUCT_ID)
+)
+
+def _user_page(user_id: int, skip: int, limit: int, after: Optional[Tuple[datetime, int]]):
+    if after is not None:
+        return _BY_USER_AFTER, {
+            "user_id": user_id, "limit": limit,
+            "after_created_at": after[0], "after_order_id": after[1],
+        }
+    return _BY_USER_OFFSET, {"user_id": user_id, "limit": limit, "skip": skip}
 
 class OrderRepository(BaseRepository[Order, OrderCreate, OrderStatusUpdate]):
     def get_by_id(self, db: Session, *, order_id: int) -> Optional[Order]:
-        return db.query(Order).filter(Order.order_id == order_id).first()
+        return db.scalars(_BY_ID, {"order_id": order_id}).first()
     
-    def get_by_user(self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100) -> List[Order]:
-        return db.query(Order).filter(Order.user_id == user_id).offset(skip).limit(limit).all()
+    def get_by_user(
+        self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100,
+        after: Optional[Tuple[datetime, int]] = None, fields: Optional[Sequence[str]] = None
+    ) -> List[Order]:
+        stmt, params = _user_page(user_id, skip, limit, after)
+        return list(db.scalars(stmt.options(*only_columns(Order, fields)), params).all())
     
     def create(self, db: Session, *, obj_in: OrderCreate) -> Order:
         # Convert products list to JSON
@@ -24,8 +64,7 @@ class OrderRepository(BaseRepository[Order, OrderCreate, OrderStatusUpdate]):
             payment_details={}  # Empty payment details
         )
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self._commit(db)
         return db_obj
     
     def update_status(self, db: Session, *, order_id: int, status: int) -> Optional[Order]:
@@ -33,14 +72,16 @@ class OrderRepository(BaseRepository[Order, OrderCreate, OrderStatusUpdate]):
         if order:
             order.order_status = status
             db.add(order)
-            db.commit()
-            db.refresh(order)
+            self._commit(db)
             return order
         return None
     
-    def get_all_order(self, db: Session) -> List[Order]:
+    def get_units_ordered(self, db: Session) -> Dict[int, int]:
+        return {row.product_id: row.units for row in db.execute(_UNITS_ORDERED) if row.product_id is not None}
+    
+    def get_all_order(self, db: Session, fields: Optional[Sequence[str]] = None) -> List[Order]:
         try:
-            orders = db.query(Order).all()
+            orders = db.query(Order).options(*only_columns(Order, fields)).all()
             print(orders)
             return orders
         except Exception as e:
@@ -48,5 +89,23 @@ class OrderRepository(BaseRepository[Order, OrderCreate, OrderStatusUpdate]):
             return []
 
 
+class AsyncOrderRepository(AsyncBaseRepository[Order, OrderCreate, OrderStatusUpdate]):
+    async def get_by_id(self, db: AsyncSession, *, order_id: int) -> Optional[Order]:
+        return await db.get(Order, order_id)
+
+    async def get_by_user(
+        self, db: AsyncSession, *, user_id: int, skip: int = 0, limit: int = 100,
+        after: Optional[Tuple[datetime, int]] = None, fields: Optional[Sequence[str]] = None
+    ) -> List[Order]:
+        stmt, params = _user_page(user_id, skip, limit, after)
+        result = await db.scalars(stmt.options(*only_columns(Order, fields)), params)
+        return list(result.all())
+
+    async def get_units_ordered(self, db: AsyncSession) -> Dict[int, int]:
+        result = await db.execute(_UNITS_ORDERED)
+        return {row.product_id: row.units for row in result if row.product_id is not None}
+
+
 # Create instance
-order_repository = OrderRepository(Order)
\ No newline at end of file
+order_repository = OrderRepository(Order)
+async_order_repository = AsyncOrderRepository(Order)
\ No newline at end of file
@@ -1,29 +1,210 @@
-from typing import List, Optional
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import Row, and_, bindparam, func, literal_column, or_, select
+from app.core.config.settings import settings
 from app.models.models import Product
 from app.models.schemas import ProductCreate, ProductUpdate
-from app.repositories.base import BaseRepository
+from app.repositories.base import BaseRepository, AsyncBaseRepository, only_columns
+
+# Hot lookups are built once at import and executed with bound parameters, so
+# each call skips query construction and hits SQLAlchemy's compiled cache
+_BY_ID = select(Product).where(Product.product_id == bindparam("product_id"))
+_PRICE_BY_ID = select(Product.product_price).where(Product.product_id == bindparam("product_id"))
+_BY_IDS = select(Product).where(Product.product_id.in_(bindparam("product_ids", expanding=True)))
+_NAMES_BY_IDS = select(Product.product_id, Product.product_name).where(
+    Product.product_id.in_(bindparam("product_ids", expanding=True))
+)
+# What pricing a cart needs, without loading whole products
+_PRICES_BY_IDS = select(
+    Product.product_id, Product.product_name, Product.product_price, Product.stock_quantity
+).where(Product.product_id.in_(bindparam("product_ids", expanding=True)))
+# Just the columns the suggestion index needs
+_INDEX_ROWS = select(Product.product_id, Product.product_name, Product.product_category, Product.ratings)
+_INDEX_ROWS_BY_IDS = _INDEX_ROWS.where(Product.product_id.in_(bindparam("product_ids", expanding=True)))
+
+def _facet_counts():
+    # One row per category: totals, in-stock and a count per price band
+    edges = settings.PRICE_BANDS
+    bands = [Product.product_price < edges[0]] if edges else []
+    bands += [and_(Product.product_price >= low, Product.product_price < high) for low, high in zip(edges, edges[1:])]
+    if edges:
+        bands.append(Product.product_price >= edges[-1])
+    return (
+        select(
+            Product.product_category.label("category"),
+            func.count().label("count"),
+            func.count().filter(Product.stock_quantity > 0).label("in_stock"),
+            func.min(Product.product_price).label("min_price"),
+            func.max(Product.product_price).label("max_price"),
+            *[func.count().filter(band).label(f"band_{index}") for index, band in enumerate(bands)],
+        )
+        .group_by(Product.product_category)
+    )
+
+_FACET_COUNTS = _facet_counts()
+_BY_CATEGORY = (
+    select(Product)
+    .where(Product.product_category == bindparam("category"))
+    .order_by(Product.product_id)
+    .limit(bindparam("limit"))
+)
+_BY_CATEGORY_OFFSET = _BY_CATEGORY.offset(bindparam("skip"))
+_BY_CATEGORY_AFTER = _BY_CATEGORY.where(Product.product_id > bindparam("after"))
+
+# Full-text search: every word of the query must match a word prefix
+_TSQUERY = func.to_tsquery(literal_column("'simple'::regconfig"), bindparam("tsquery"))
+_SEARCH = (
+    select(Product)
+    .where(Product.search_vector.bool_op("@@")(_TSQUERY))
+    .order_by(func.ts_rank_cd(Product.search_vector, _TSQUERY).desc(), Product.product_id)
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+_SEARCH_TRIGRAM = (
+    select(Product)
+    .where(Product.product_name.bool_op("%")(bindparam("query")))
+    .order_by(func.similarity(Product.product_name, bindparam("query")).desc(), Product.product_id)
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+_WORD = re.compile(r"\w+")
+
+def prefix_tsquery(query: str) -> Optional[str]:
+    """
+    'red tom' -> 'red:* & tom:*'. Only word characters get through, so the
+    result is always valid to_tsquery input; None when nothing is searchable.
+    """
+    words = _WORD.findall(query.lower())
+    return " & ".join(f"{word}:*" for word in words) or None
+
+def _search_ilike(query: str):
+    search_query = f"%{query}%"
+    return select(Product).filter(
+        or_(
+            Product.product_name.ilike(search_query),
+            Product.product_description.ilike(search_query),
+            Product.product_category.ilike(search_query)
+        )
+    )
+
+def _full_text(db) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def _category_page(category: str, skip: int, limit: int, after: Optional[int]):
+    if after is not None:
+        return _BY_CATEGORY_AFTER, {"category": category, "limit": limit, "after": after}
+    return _BY_CATEGORY_OFFSET, {"category": category, "limit": limit, "skip": skip}
 
 class ProductRepository(BaseRepository[Product, ProductCreate, ProductUpdate]):
     def get_by_id(self, db: Session, *, product_id: int) -> Optional[Product]:
-        return db.query(Product).filter(Product.product_id == product_id).first()
+        return db.scalars(_BY_ID, {"product_id": product_id}).first()
+    
+    def get_price(self, db: Session, *, product_id: int) -> Optional[int]:
+        return db.scalar(_PRICE_BY_ID, {"product_id": product_id})
+    
+    def get_names(self, db: Session, *, product_ids: Iterable[int]) -> Dict[int, str]:
+        rows = db.execute(_NAMES_BY_IDS, {"product_ids": list(product_ids)})
+        return {row.product_id: row.product_name for row in rows}
+    
+    def get_prices(self, db: Session, *, product_ids: Iterable[int]) -> Dict[int, Row]:
+        # (product_id, product_name, product_price, stock_quantity) by id, in one IN query
+        rows = db.execute(_PRICES_BY_IDS, {"product_ids": list(product_ids)})
+        return {row.product_id: row for row in rows}
+    
+    def get_by_ids(self, db: Session, *, product_ids: Iterable[int]) -> Dict[int, Product]:
+        products = db.scalars(_BY_IDS, {"product_ids": list(product_ids)})
+        return {product.product_id: product for product in products}
+    
+    def get_index_rows(self, db: Session, *, product_ids: Optional[Iterable[int]] = None) -> List[Row]:
+        # (product_id, product_name, product_category, ratings) for all products or just `product_ids`
+        if product_ids is None:
+            return list(db.execute(_INDEX_ROWS).all())
+        return list(db.execute(_INDEX_ROWS_BY_IDS, {"product_ids": list(product_ids)}).all())
+    
+    def get_facet_rows(self, db: Session) -> List[Row]:
+        return list(db.execute(_FACET_COUNTS).all())
     
     def get_by_name(self, db: Session, *, product_name: str) -> Optional[Product]:
         return db.query(Product).filter(Product.product_name == product_name).first()
     
-    def get_by_category(self, db: Session, *, category: str, skip: int = 0, limit: int = 100) -> List[Product]:
-        return db.query(Product).filter(Product.product_category == category).offset(skip).limit(limit).all()
+    def get_ids_by_names(self, db: Session, *, names: Iterable[str]) -> Dict[str, int]:
+        # Lowest id wins when a name is duplicated, matching get_by_name's first()
+        rows = db.query(Product.product_name, func.min(Product.product_id)).filter(
+            Product.product_name.in_(list(names))
+        ).group_by(Product.product_name).all()
+        return {name: product_id for name, product_id in rows}
+    
+    def get_by_category(
+        self, db: Session, *, category: str, skip: int = 0, limit: int = 100, after: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[Product]:
+        stmt, params = _category_page(category, skip, limit, after)
+        return list(db.scalars(stmt.options(*only_columns(Product, fields)), params).all())
     
     def search(self, db: Session, *, query: str, skip: int = 0, limit: int = 100) -> List[Product]:
-        search_query = f"%{query}%"
-        return db.query(Product).filter(
-            or_(
-                Product.product_name.ilike(search_query),
-                Product.product_description.ilike(search_query),
-                Product.product_category.ilike(search_query)
-            )
-        ).offset(skip).limit(limit).all()
+        """
+        Products matching every word of `query` as a prefix, best match first.
+        Falls back to ILIKE on backends without full-text search, and for
+        queries with no words in them.
+        """
+        tsquery = prefix_tsquery(query)
+        if tsquery is None or not _full_text(db):
+            return list(db.scalars(_search_ilike(query).offset(skip).limit(limit)).all())
+        products = list(db.scalars(_SEARCH, {"tsquery": tsquery, "skip": skip, "limit": limit}).all())
+        if not products and skip == 0 and settings.SEARCH_TRIGRAM:
+            # Nothing matched as typed; offer a first page of similar names (typos)
+            products = list(db.scalars(_SEARCH_TRIGRAM, {"query": query, "skip": skip, "limit": limit}).all())
+        return products
+
+class AsyncProductRepository(AsyncBaseRepository[Product, ProductCreate, ProductUpdate]):
+    async def get_by_id(self, db: AsyncSession, *, product_id: int) -> Optional[Product]:
+        return await db.get(Product, product_id)
+
+    async def get_by_category(
+        self, db: AsyncSession, *, category: str, skip: int = 0, limit: int = 100, after: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[Product]:
+        stmt, params = _category_page(category, skip, limit, after)
+        result = await db.scalars(stmt.options(*only_columns(Product, fields)), params)
+        return list(result.all())
+
+    async def search(self, db: AsyncSession, *, query: str, skip: int = 0, limit: int = 100) -> List[Product]:
+        tsquery = prefix_tsquery(query)
+        if tsquery is None or not _full_text(db):
+            result = await db.scalars(_search_ilike(query).offset(skip).limit(limit))
+            return list(result.all())
+        result = await db.scalars(_SEARCH, {"tsquery": tsquery, "skip": skip, "limit": limit})
+        products = list(result.all())
+        if not products and skip == 0 and settings.SEARCH_TRIGRAM:
+            result = await db.scalars(_SEARCH_TRIGRAM, {"query": query, "skip": skip, "limit": limit})
+            products = list(result.all())
+        return products
+
+    async def get_by_ids(self, db: AsyncSession, *, product_ids: Iterable[int]) -> Dict[int, Product]:
+        products = await db.scalars(_BY_IDS, {"product_ids": list(product_ids)})
+        return {product.product_id: product for product in products}
+
+    async def get_names(self, db: AsyncSession, *, product_ids: Iterable[int]) -> Dict[int, str]:
+        result = await db.execute(_NAMES_BY_IDS, {"product_ids": list(product_ids)})
+        return {row.product_id: row.product_name for row in result}
+
+    async def get_prices(self, db: AsyncSession, *, product_ids: Iterable[int]) -> Dict[int, Row]:
+        result = await db.execute(_PRICES_BY_IDS, {"product_ids": list(product_ids)})
+        return {row.product_id: row for row in result}
+
+    async def get_facet_rows(self, db: AsyncSession) -> List[Row]:
+        result = await db.execute(_FACET_COUNTS)
+        return list(result.all())
+
+    async def get_index_rows(self, db: AsyncSession, *, product_ids: Optional[Iterable[int]] = None) -> List[Row]:
+        if product_ids is None:
+            result = await db.execute(_INDEX_ROWS)
+        else:
+            result = await db.execute(_INDEX_ROWS_BY_IDS, {"product_ids": list(product_ids)})
+        return list(result.all())
 
 # Create instance
-product_repository = ProductRepository(Product)
\ No newline at end of file
+product_repository = ProductRepository(Product)
+async_product_repository = AsyncProductRepository(Product)
\ No newline at end of file
@@ -1,26 +1,47 @@
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, select, update
 from app.models.models import User
 from app.models.schemas import UserCreate, UserUpdate
 from app.repositories.base import BaseRepository
 from app.utils.security import get_password_hash
 
+# Prebuilt statements for the auth lookups (see product_repository)
+_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+_ID_BY_EMAIL = select(User.id).where(User.email == bindparam("email"))
+_TOKEN_VERSION = select(User.token_version).where(User.id == bindparam("user_id"))
+
 class UserRepository(BaseRepository[User, UserCreate, UserUpdate]):
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
-        return db.query(User).filter(User.email == email).first()
+        return db.scalars(_BY_EMAIL, {"email": email}).first()
+    
+    def email_exists(self, db: Session, *, email: str) -> bool:
+        return db.scalar(_ID_BY_EMAIL, {"email": email}) is not None
     
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+    def get_token_version(self, db: Session, *, user_id: int) -> Optional[int]:
+        return db.scalar(_TOKEN_VERSION, {"user_id": user_id})
+
+    def bump_token_version(self, db: Session, *, user_id: int) -> Optional[int]:
+        version = db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(token_version=User.token_version + 1)
+            .returning(User.token_version)
+        ).scalar()
+        self._commit(db)
+        return version
+
+    def create(self, db: Session, *, obj_in: UserCreate, hashed_password: Optional[str] = None) -> User:
         db_obj = User(
             name=obj_in.name,
             location=obj_in.location,
             contact_number=obj_in.contact_number,
             email=obj_in.email,
-            password=get_password_hash(obj_in.password),
+            password=hashed_password or get_password_hash(obj_in.password),
             role=obj_in.role
         )
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self._commit(db)
         return db_obj
 
 # Create instance
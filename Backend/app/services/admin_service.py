@@ -1,9 +1,10 @@
 from typing import List, Dict, Any, Optional
 import pandas as pd
 from sqlalchemy.orm import Session
-from app.models.schemas import ProductCreate, Product
+from app.models.schemas import ProductCreate, ProductUpdate, Product
 from app.repositories.product_repository import product_repository
 from app.repositories.order_repository import order_repository
+from app.services.product_service import catalog_changed
 from io import BytesIO
 
 def ingest_products_from_excel(db: Session, file_content: bytes) -> Dict[str, Any]:
@@ -14,16 +15,16 @@ def ingest_products_from_excel(db: Session, file_content: bytes) -> Dict[str, An
         # Read Excel file
         excel_data = BytesIO(file_content)
         df = pd.read_excel(excel_data)
-        # Transform DataFrame to list of ProductCreate objects
-        products_added = 0
-        products_updated = 0
+        # Transform rows into product dicts; the last row wins for a repeated name
+        products: Dict[str, Dict[str, Any]] = {}
+        # Spreadsheet row numbers (the header is row 1) that were left out, and why
+        skipped: List[Dict[str, Any]] = []
         
-        for _, row in df.iterrows():
+        for index, row in df.iterrows():
             try:
-                existing_product = product_repository.get_by_name(
-                db, product_name=row.get('product_name', '')
-            )
-                
+                # Empty cells come through as NaN; make them None so they
+                # fail validation instead of reaching the database as NaN
+                row = row.astype(object).where(row.notna(), None)
                 # Prepare product data
                 product_data = {
                     'product_name': row.get('product_name', ''),
@@ -34,34 +35,41 @@ def ingest_products_from_excel(db: Session, file_content: bytes) -> Dict[str, An
                     'stock_quantity': int(row.get('stock_quantity', 0)),
                     'seasonal_availability': bool(row.get('seasonal_availability', False)),
                     'images': row.get('images', '').split(',') if isinstance(row.get('images'), str) else [],
-                    'ratings': float(row.get('ratings', 0.0))
+                    'ratings': float(row.get('ratings') or 0.0)
                 }
-                print("hi")
-                print(product_data)
-                
-                if existing_product:
-                    # Update existing product
-                    product_repository.update(
-                        db, 
-                        db_obj=existing_product, 
-                        obj_in=product_data
-                    )
-                    products_updated += 1
-                else:
-                    # Create new product
-                    product_create = ProductCreate(**product_data)
-                    product_repository.create(db, obj_in=product_create)
-                    products_added += 1
+                if not product_data['product_name']:
+                    raise ValueError("product_name is missing")
+                # Validated one row at a time, so a bad value costs its own
+                # row rather than the batched statement it would land in
+                ProductCreate(**product_data)
+                products[product_data['product_name']] = product_data
                     
             except Exception as e:
                 # Continue with next product if there's an error
+                skipped.append({"row": int(index) + 2, "error": str(e)})
                 continue
+        
+        # One lookup for every name, then one batched statement per chunk
+        existing = product_repository.get_ids_by_names(db, names=products.keys())
+        updates = [
+            {**ProductUpdate(**data).dict(exclude_unset=True), 'product_id': existing[name]}
+            for name, data in products.items() if name in existing
+        ]
+        creates = [ProductCreate(**data) for name, data in products.items() if name not in existing]
+        
+        products_updated = sum(
+            outcome.status == "updated"
+            for outcome in product_repository.bulk_update(db, objs_in=updates)
+        )
+        products_added = len(product_repository.bulk_create(db, objs_in=creates))
                 
+        catalog_changed()
         return {
             "success": True,
             "products_added": products_added,
             "products_updated": products_updated,
-            "total_processed": products_added + products_updated
+            "total_processed": products_added + products_updated,
+            "rows_skipped": skipped
         }
             
     except Exception as e:
@@ -2,12 +2,37 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt, JWTError
 from app.core.config.settings import settings
-from app.models.schemas import TokenPayload, User
-from app.utils.security import verify_password
+from app.models.schemas import TokenPayload, User, Principal
+from app.models.models import User as UserModel
+from app.utils.security import verify_password, verify_password_async
+from starlette.concurrency import run_in_threadpool
+from app.utils.cache import TTLCache
+from app.db.base import after_commit
+from app.db.invalidation import bus
 from app.repositories.user_repository import user_repository
 from sqlalchemy.orm import Session
 import time
 
+# Resolved principals keyed by token subject (email)
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+# Current token version per user id, used to revoke claims tokens
+token_version_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS,
+)
+
+def _clear_auth_caches() -> None:
+    principal_cache.clear()
+    token_version_cache.clear()
+
+bus.subscribe("principal", principal_cache.pop)
+bus.subscribe("token_version", token_version_cache.pop)
+bus.on_flush(_clear_auth_caches)
+
 def create_access_token(*, data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -31,6 +56,16 @@ def create_refresh_token(*, data: dict) -> str:
     )
     return encoded_jwt
 
+def access_token_claims(user: UserModel) -> dict:
+    """
+    Claims signed into access tokens. In claims mode the token also carries
+    uid/role/ver so requests can be authorised without loading the user.
+    """
+    claims = {"sub": user.email}
+    if settings.ACCESS_TOKEN_CLAIMS:
+        claims.update({"uid": user.id, "role": user.role, "ver": user.token_version or 0})
+    return claims
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     user = user_repository.get_by_email(db, email=email)
     if not user:
@@ -39,7 +74,83 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
         return None
     return user
 
-def get_current_user(db: Session, token: str) -> Optional[User]:
+def build_principal(user: UserModel) -> Principal:
+    return Principal(
+        id=user.id,
+        email=user.email,
+        role=user.role,
+        name=user.name,
+        location=user.location,
+        contact_number=str(user.contact_number) if user.contact_number is not None else None,
+        created_at=user.created_at,
+        updated_at=user.updated_at,
+    )
+
+def invalidate_principal(email: Optional[str]) -> None:
+    if email:
+        bus.publish("principal", email)
+
+def get_user_and_release(db: Session, email: str) -> Optional[UserModel]:
+    """
+    Look the user up, then end the read so the session hands its connection
+    back to the pool before a (slow, queued) bcrypt job; a login storm would
+    otherwise hold every pooled connection. The user stays loaded
+    (expire_on_commit=False).
+    """
+    user = user_repository.get_by_email(db, email=email)
+    db.commit()
+    return user
+
+async def authenticate_user_async(db: Session, email: str, password: str) -> Optional[User]:
+    """
+    authenticate_user for async endpoints: the lookup runs on the threadpool
+    and bcrypt on the password pool, so the event loop never blocks.
+    """
+    user = await run_in_threadpool(get_user_and_release, db, email)
+    if not user:
+        return None
+    if not await verify_password_async(password, user.password):
+        return None
+    return user
+
+def get_token_version(db: Session, user_id: int) -> Optional[int]:
+    version = token_version_cache.get(user_id)
+    if version is None:
+        version = user_repository.get_token_version(db, user_id=user_id)
+        if version is None:
+            return None
+        token_version_cache.set(user_id, version)
+    return version
+
+def revoke_tokens(db: Session, user_id: int) -> Optional[int]:
+    """
+    Bump the user's token version so previously issued claims tokens stop working.
+    """
+    version = user_repository.bump_token_version(db, user_id=user_id)
+    if version is not None:
+        # Only once the bump is committed: other workers drop their cached
+        # version and re-read it, which before the commit would be the old one
+        def publish() -> None:
+            bus.publish("token_version", user_id)
+            token_version_cache.set(user_id, version)
+
+        after_commit(db, publish)
+    return version
+
+def resolve_principal(db: Session, email: str) -> Optional[Principal]:
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    user = user_repository.get_by_email(db, email=email)
+    if user is None:
+        return None
+
+    principal = build_principal(user)
+    principal_cache.set(email, principal)
+    return principal
+
+def get_current_user(db: Session, token: str, require_profile: bool = False) -> Optional[Principal]:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=["HS256"]
@@ -49,11 +160,15 @@ def get_current_user(db: Session, token: str) -> Optional[User]:
             return None
     except JWTError:
         return None
-    
-    user = user_repository.get_by_email(db, email=token_data.sub)
-    if user is None:
-        return None
-    return user
+
+    if token_data.uid is not None and token_data.role is not None:
+        # Claims token: only the version needs checking, and that is cached
+        if token_data.ver != get_token_version(db, token_data.uid):
+            return None
+        if not require_profile:
+            return Principal(id=token_data.uid, email=token_data.sub, role=token_data.role)
+
+    return resolve_principal(db, token_data.sub)
 
 def refresh_token(db: Session, refresh_token: str) -> Optional[dict]:
     try:
@@ -69,9 +184,12 @@ def refresh_token(db: Session, refresh_token: str) -> Optional[dict]:
     user = user_repository.get_by_email(db, email=token_data.sub)
     if user is None:
         return None
+    if token_data.ver is not None and token_data.ver != (user.token_version or 0):
+        return None
     
-    access_token = create_access_token(data={"sub": user.email})
-    new_refresh_token = create_refresh_token(data={"sub": user.email})
+    claims = access_token_claims(user)
+    access_token = create_access_token(data=claims)
+    new_refresh_token = create_refresh_token(data=claims)
     
     return {
         "access_token": access_token,
@@ -1,29 +1,341 @@
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.schemas import CartCreate, CartUpdate, Cart, CartItemBase
-from app.repositories.cart_repository import cart_repository
+from app.models import models
+from app.models.schemas import CartCreate, CartUpdate, Cart, CartItemBase, CartItemChange
+from app.repositories.cart_repository import cart_repository, async_cart_repository, merge_cart_products
+from app.repositories.product_repository import product_repository, async_product_repository
+from app.db.base import SessionLocal, after_commit, mark_write
+from app.db.cart_store import CartState, cart_store
+
+# With a cart store configured (settings.CART_STORE) carts are read and
+# changed in the store and written to Postgres behind the request; only a new
+# cart's first insert, and the clear when an order is placed, go straight to
+# the database.
+
+# Whole-cart writes (merge, remove a line) read the cart and write it back
+# only if it's unchanged; when another write got in between they re-read and
+# try again, up to this many times, before giving up with StaleCartVersion
+CART_WRITE_ATTEMPTS = 3
+
+def _expiry() -> str:
+    # Fixed-width ISO timestamps, so states compare by expiry as strings
+    return (datetime.now() + timedelta(days=7)).isoformat(timespec="microseconds")
+
+def _state(cart: models.Cart) -> CartState:
+    return {
+        "cart_id": cart.cart_id,
+        "user_id": cart.user_id,
+        "products": cart.products if isinstance(cart.products, list) else [],
+        "version": cart.version,
+        "expires_at": cart.expires_at.isoformat(timespec="microseconds"),
+        "created_at": cart.created_at.isoformat(timespec="microseconds"),
+    }
+
+def _cart(state: CartState) -> models.Cart:
+    # Detached, never added to a session
+    return models.Cart(
+        cart_id=state["cart_id"],
+        user_id=state["user_id"],
+        products=state["products"],
+        version=state["version"],
+        expires_at=datetime.fromisoformat(state["expires_at"]),
+        created_at=datetime.fromisoformat(state["created_at"]),
+    )
+
+def _row(state: CartState) -> Dict[str, Any]:
+    return {
+        "user_id": state["user_id"],
+        "products": state["products"],
+        "version": state["version"],
+        "expires_at": datetime.fromisoformat(state["expires_at"]),
+    }
+
+def _write_carts(carts: List[CartState]) -> None:
+    db = SessionLocal()
+    try:
+        cart_repository.save_many(db, carts=[_row(cart) for cart in carts])
+    finally:
+        db.close()
+
+if cart_store is not None:
+    cart_store.set_writer(_write_carts)
+
+def _load(db: Session, user_id: int) -> Optional[CartState]:
+    cart = cart_store.get(user_id)
+    if cart is None:
+        db_cart = cart_repository.get_by_user(db, user_id=user_id)
+        if db_cart is None:
+            return None
+        cart = cart_store.add(user_id, _state(db_cart))
+    return cart
+
+async def _load_async(db: AsyncSession, user_id: int) -> Optional[CartState]:
+    cart = cart_store.get(user_id)
+    if cart is None:
+        db_cart = await async_cart_repository.get_by_user(db, user_id=user_id)
+        if db_cart is None:
+            return None
+        cart = cart_store.add(user_id, _state(db_cart))
+    return cart
+
+def _changed(cart: CartState, products: list) -> CartState:
+    return {**cart, "products": products, "version": cart["version"] + 1, "expires_at": _expiry()}
+
+def _change_stored(user_id: int, state: CartState, change: Callable[[list], list]) -> models.Cart:
+    # Nothing reaches the database yet, so there's no replica read to pin (mark_write)
+    cart = cart_store.update(user_id, lambda current: _changed(current, change(current["products"])), default=state)
+    return _cart(cart)
 
 def get_user_cart(db: Session, user_id: int) -> Optional[Cart]:
+    if cart_store is not None:
+        state = _load(db, user_id)
+        return _cart(state) if state else None
     return cart_repository.get_by_user(db, user_id=user_id)
 
 def create_or_update_cart(db: Session, user_id: int, items: List[CartItemBase]) -> Cart:
-    existing_cart = cart_repository.get_by_user(db, user_id=user_id)
-    
-    if existing_cart:
-        cart_update = CartUpdate(products=items)
-        return cart_repository.update(db, db_obj=existing_cart, obj_in=cart_update)
+    if cart_store is not None:
+        state = _load(db, user_id)
+        if state is not None:
+            return _change_stored(user_id, state, lambda products: merge_cart_products(products, items))
+        existing_cart = None
+    else:
+        existing_cart = cart_repository.get_by_user(db, user_id=user_id)
+
+    for attempt in range(CART_WRITE_ATTEMPTS):
+        if attempt:
+            existing_cart = cart_repository.get_by_user(db, user_id=user_id)
+        if existing_cart:
+            cart_update = CartUpdate(products=items)
+            cart = cart_repository.update(db, db_obj=existing_cart, obj_in=cart_update)
+        else:
+            cart_create = CartCreate(user_id=user_id, products=items)
+            cart = cart_repository.create(db, obj_in=cart_create)
+        if cart is not None:
+            break
     else:
-        cart_create = CartCreate(user_id=user_id, products=items)
-        return cart_repository.create(db, obj_in=cart_create)
+        raise StaleCartVersion(cart_repository.get_version(db, user_id=user_id))
+    if cart_store is not None:
+        cart_store.add(user_id, _state(cart))
+    mark_write(user_id)
+    return cart
 
 
 def clear_cart(db: Session, user_id: int) -> bool:
-    return cart_repository.clear_cart(db, user_id=user_id)
+    if cart_store is not None:
+        state = _load(db, user_id)
+        if state is None:
+            return False
+        if not db.info.get("unit_of_work"):
+            _change_stored(user_id, state, lambda products: [])
+            return True
+        # Part of placing an order: written through so the clear commits or
+        # rolls back with the order, then applied to the store unless the
+        # cart has changed again since
+        cleared = _changed(state, [])
+        cart_repository.save_many(db, carts=[_row(cleared)])
+        after_commit(db, lambda: cart_store.update(
+            user_id,
+            lambda current: cleared if current is None or current["expires_at"] <= cleared["expires_at"] else current,
+        ))
+        mark_write(user_id)
+        return True
+    cleared = cart_repository.clear_cart(db, user_id=user_id)
+    mark_write(user_id)
+    return cleared
 
 def remove_item_from_cart(db: Session, user_id: int, product_id: int) -> Cart:
-    existing_cart = cart_repository.get_by_user(db, user_id=user_id)
-    
-    if not existing_cart:
-        return None  # Cart not found
-    
-    return cart_repository.remove_item(db, db_obj=existing_cart, product_id=product_id)
+    if cart_store is not None:
+        state = _load(db, user_id)
+        if state is None:
+            return None  # Cart not found
+        return _change_stored(
+            user_id, state, lambda products: [item for item in products if item["product_id"] != product_id]
+        )
+
+    for _ in range(CART_WRITE_ATTEMPTS):
+        existing_cart = cart_repository.get_by_user(db, user_id=user_id)
+
+        if not existing_cart:
+            return None  # Cart not found
+
+        cart = cart_repository.remove_item(db, db_obj=existing_cart, product_id=product_id)
+        if cart is not None:
+            mark_write(user_id)
+            return cart
+    raise StaleCartVersion(cart_repository.get_version(db, user_id=user_id))
+
+class StaleCartVersion(Exception):
+    """The cart changed since the version a change was based on."""
+
+    def __init__(self, version: int):
+        super().__init__(f"Cart is at version {version}")
+        self.version = version
+
+def _change_line(products: list, product_id: int, op: str, quantity: Optional[int], product_name: Optional[str]) -> list:
+    # The store's copy of CartRepository.change_item
+    products = list(products)
+    position = next((i for i, item in enumerate(products) if item["product_id"] == product_id), None)
+    if op == "set":
+        new_quantity = quantity
+    elif op == "increment":
+        new_quantity = (products[position]["quantity"] if position is not None else 0) + quantity
+    else:
+        new_quantity = 0
+    if new_quantity <= 0:
+        if position is not None:
+            del products[position]
+    elif position is None:
+        products.append({"product_id": product_id, "product_name": product_name, "quantity": new_quantity})
+    else:
+        products[position] = {**products[position], "quantity": new_quantity}
+    return products
+
+def _change_item_stored(
+    state: CartState, user_id: int, product_id: int, op: str, quantity: Optional[int],
+    product_name: Optional[str], version: Optional[int]
+) -> CartItemChange:
+    def change(current: CartState) -> CartState:
+        if version is not None and current["version"] != version:
+            raise StaleCartVersion(current["version"])
+        return _changed(current, _change_line(current["products"], product_id, op, quantity, product_name))
+
+    cart = cart_store.update(user_id, change, default=state)
+    item = next((item for item in cart["products"] if item["product_id"] == product_id), None)
+    return CartItemChange(product_id=product_id, item=item, version=cart["version"])
+
+def change_cart_item(
+    db: Session, user_id: int, product_id: int, op: str, quantity: Optional[int] = None,
+    product_name: Optional[str] = None, version: Optional[int] = None
+) -> Optional[CartItemChange]:
+    """
+    Apply one line change ("set", "increment" or "remove") to the user's cart.
+    Returns the changed line, or None when the user has no cart; raises
+    StaleCartVersion when `version` is given and no longer current.
+    """
+    if cart_store is not None:
+        state = _load(db, user_id)
+        if state is None:
+            return None
+        return _change_item_stored(state, user_id, product_id, op, quantity, product_name, version)
+
+    row = cart_repository.change_item(
+        db, user_id=user_id, product_id=product_id, op=op, quantity=quantity,
+        product_name=product_name, version=version,
+    )
+    if row is None:
+        current = cart_repository.get_version(db, user_id=user_id)
+        if current is None:
+            return None
+        raise StaleCartVersion(current)
+    mark_write(user_id)
+    return CartItemChange(product_id=product_id, item=row.item, version=row.version)
+
+def _priced(cart: Cart, prices: Dict[int, Any]) -> Dict[str, Any]:
+    # PricedCart fields for `cart` at the prices in `prices` (product id -> row)
+    lines = []
+    total = 0
+    for item in cart.products:
+        product = prices.get(item["product_id"])
+        # Gone or unpriced products can't be bought; NULL stock counts as none
+        if product is None or product.product_price is None:
+            lines.append({
+                **item,
+                "product_name": item.get("product_name") or (product.product_name if product else None),
+                "unit_price": None, "line_total": 0,
+                "stock_quantity": (product.stock_quantity or 0) if product else 0,
+                "available": False,
+            })
+            continue
+        stock_quantity = product.stock_quantity or 0
+        line_total = product.product_price * item["quantity"]
+        total += line_total
+        lines.append({
+            **item,
+            "product_name": item.get("product_name") or product.product_name,
+            "unit_price": product.product_price,
+            "line_total": line_total,
+            "stock_quantity": stock_quantity,
+            "available": stock_quantity >= item["quantity"],
+        })
+    return {
+        "cart_id": cart.cart_id, "user_id": cart.user_id, "version": cart.version,
+        "products": lines, "total": total, "available": all(line["available"] for line in lines),
+    }
+
+def get_priced_cart(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    The user's cart with each line's current unit price, line total and
+    stock, plus the cart total, as PricedCart fields (None without a cart).
+    Every line is priced from one IN query over products.
+    """
+    cart = get_user_cart(db, user_id)
+    if cart is None:
+        return None
+    prices = product_repository.get_prices(db, product_ids=[item["product_id"] for item in cart.products])
+    return _priced(cart, prices)
+
+async def get_user_cart_async(db: AsyncSession, user_id: int) -> Optional[Cart]:
+    if cart_store is not None:
+        state = await _load_async(db, user_id)
+        return _cart(state) if state else None
+    return await async_cart_repository.get_by_user(db, user_id=user_id)
+
+async def create_or_update_cart_async(db: AsyncSession, user_id: int, items: List[CartItemBase]) -> Cart:
+    if cart_store is not None:
+        state = await _load_async(db, user_id)
+        if state is not None:
+            return _change_stored(user_id, state, lambda products: merge_cart_products(products, items))
+        existing_cart = None
+    else:
+        existing_cart = await async_cart_repository.get_by_user(db, user_id=user_id)
+
+    for attempt in range(CART_WRITE_ATTEMPTS):
+        if attempt:
+            existing_cart = await async_cart_repository.get_by_user(db, user_id=user_id)
+        if existing_cart:
+            cart_update = CartUpdate(products=items)
+            cart = await async_cart_repository.update(db, db_obj=existing_cart, obj_in=cart_update)
+        else:
+            cart_create = CartCreate(user_id=user_id, products=items)
+            cart = await async_cart_repository.create(db, obj_in=cart_create)
+        if cart is not None:
+            break
+    else:
+        raise StaleCartVersion(await async_cart_repository.get_version(db, user_id=user_id))
+    if cart_store is not None:
+        cart_store.add(user_id, _state(cart))
+    mark_write(user_id)
+    return cart
+
+async def change_cart_item_async(
+    db: AsyncSession, user_id: int, product_id: int, op: str, quantity: Optional[int] = None,
+    product_name: Optional[str] = None, version: Optional[int] = None
+) -> Optional[CartItemChange]:
+    if cart_store is not None:
+        state = await _load_async(db, user_id)
+        if state is None:
+            return None
+        return _change_item_stored(state, user_id, product_id, op, quantity, product_name, version)
+
+    row = await async_cart_repository.change_item(
+        db, user_id=user_id, product_id=product_id, op=op, quantity=quantity,
+        product_name=product_name, version=version,
+    )
+    if row is None:
+        current = await async_cart_repository.get_version(db, user_id=user_id)
+        if current is None:
+            return None
+        raise StaleCartVersion(current)
+    mark_write(user_id)
+    return CartItemChange(product_id=product_id, item=row.item, version=row.version)
+
+async def get_priced_cart_async(db: AsyncSession, user_id: int) -> Optional[Dict[str, Any]]:
+    cart = await get_user_cart_async(db, user_id)
+    if cart is None:
+        return None
+    prices = await async_product_repository.get_prices(
+        db, product_ids=[item["product_id"] for item in cart.products]
+    )
+    return _priced(cart, prices)
@@ -0,0 +1,136 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.config.settings import settings
+from app.db.base import engine
+from app.db.cart_store import cart_store
+from app.repositories.cart_repository import cart_repository
+
+logger = logging.getLogger("app.cart_sweeper")
+
+# Session-level advisory lock naming the sweeper's leader for a run
+_LOCK_KEY = func.hashtext("cart_sweeper")
+_TRY_LOCK = select(func.pg_try_advisory_lock(_LOCK_KEY))
+_UNLOCK = select(func.pg_advisory_unlock(_LOCK_KEY))
+
+class CartSweeper:
+    """
+    Background job that deletes (or archives) carts whose expires_at has
+    passed. Every worker runs the timer; each run first tries a Postgres
+    advisory lock, so only one worker sweeps at a time and the others skip.
+    A run takes at most `max_batches` batches of `batch_size` carts, oldest
+    first, each in its own short transaction.
+    """
+
+    def __init__(
+        self, interval_seconds: float, jitter_seconds: float, batch_size: int, max_batches: int,
+        archive: bool = False, keep_runs: int = 20
+    ):
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.archive = archive
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.swept = 0
+        self.last_error: Optional[str] = None
+        # (finished at, carts swept, batches, milliseconds) of recent runs
+        self.recent: deque = deque(maxlen=keep_runs)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep(self) -> Optional[int]:
+        """
+        One run. Returns the number of carts swept, or None when another
+        worker holds the lock.
+        """
+        started = time.perf_counter()
+        with engine.connect() as connection:
+            if not connection.scalar(_TRY_LOCK):
+                connection.rollback()
+                self.skipped += 1
+                return None
+            # The lock outlives this commit; it is held until _UNLOCK
+            connection.commit()
+            swept = batches = 0
+            try:
+                with Session(bind=connection) as db:
+                    while batches < self.max_batches and not self._stopped.is_set():
+                        user_ids = cart_repository.sweep_expired(
+                            db, before=datetime.now(), limit=self.batch_size, archive=self.archive
+                        )
+                        batches += 1
+                        swept += len(user_ids)
+                        if cart_store is not None:
+                            cart_store.discard(user_ids)
+                        if len(user_ids) < self.batch_size:
+                            break
+            finally:
+                connection.execute(_UNLOCK)
+                connection.commit()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.runs += 1
+        self.swept += swept
+        self.recent.append((datetime.now().isoformat(timespec="seconds"), swept, batches, elapsed_ms))
+        if swept:
+            logger.info("Swept %d expired carts in %d batches (%.1f ms)", swept, batches, elapsed_ms)
+        return swept
+
+    def _delay(self) -> float:
+        # Jitter keeps workers started together from all trying the lock at once
+        return max(1.0, self.interval_seconds + random.uniform(-self.jitter_seconds, self.jitter_seconds))
+
+    def _sweep_forever(self) -> None:
+        while not self._stopped.wait(self._delay()):
+            try:
+                self.sweep()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = repr(e)
+                logger.exception("Expired cart sweep failed")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sweep_forever, name="cart-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            # A run in progress finishes its current batch at most
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "mode": "archive" if self.archive else "delete",
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "max_batches": self.max_batches,
+            "runs": self.runs,
+            "skipped_not_leader": self.skipped,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "swept": self.swept,
+            "last_run": dict(zip(("finished_at", "swept", "batches", "ms"), self.recent[-1])) if self.recent else None,
+            "recent_swept": [run[1] for run in self.recent],
+        }
+
+cart_sweeper = CartSweeper(
+    settings.CART_SWEEP_INTERVAL_SECONDS,
+    settings.CART_SWEEP_JITTER_SECONDS,
+    settings.CART_SWEEP_BATCH_SIZE,
+    settings.CART_SWEEP_MAX_BATCHES,
+    archive=settings.CART_SWEEP_ARCHIVE,
+)
@@ -1,37 +1,371 @@
-from typing import List, Optional
+import json
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.schemas import ProductCreate, ProductUpdate, Product
-from app.repositories.product_repository import product_repository
+from app.core.config.settings import settings
+from app.models.schemas import ProductCreate, ProductUpdate, Product, CategoryCount, PriceBand, ProductFacets
+from app.repositories.product_repository import product_repository, async_product_repository
+from app.db.base import mark_write
+from app.db.invalidation import bus
+from app.utils.cache import TTLCache
+from app.utils.etag import make_etag
+from app.utils.fields import dump_fields
+from app.utils.pagination import next_cursor, product_sort_key
+from app.utils.serialization import adapter, dump_json
+
+class CatalogEntry(NamedTuple):
+    # A serialised catalog response, ready to send as-is
+    body: bytes
+    next_cursor: Optional[str] = None
+    etag: Optional[str] = None
+
+# Serialised product pages keyed by (kind, catalog version, ...). Bumping the
+# version makes every older entry unreachable, including ones still being
+# filled by requests that started before the change.
+catalog_cache = TTLCache(maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL_SECONDS)
+_catalog_version = 0
+_catalog_version_lock = threading.Lock()
+
+def get_catalog_version() -> int:
+    return _catalog_version
+
+def _bump_catalog_version(key: Any = None) -> None:
+    global _catalog_version
+    with _catalog_version_lock:
+        _catalog_version += 1
+        catalog_cache.clear()
+
+bus.subscribe("catalog", _bump_catalog_version)
+bus.on_flush(_bump_catalog_version)
+
+def catalog_changed(product_id: Optional[int] = None) -> int:
+    """
+    Call after any product write: bumps the catalog version on every worker,
+    drops cached pages and pins catalog reads to the primary for the replica
+    lag window. Pass the product id when only one product changed, so
+    per-product indexes can patch just that entry.
+    """
+    bus.publish("catalog", product_id)
+    mark_write("catalog")
+    return _catalog_version
+
+# ETags come from the rows' ids and updated_at rather than the catalog
+# version, which is a per-worker counter; the version only decides whether a
+# cached entry (and so its ETag) is still current.
+def _product_entry(product: Any) -> CatalogEntry:
+    body = dump_json(Product, product)
+    return CatalogEntry(body, etag=make_etag("product", product.product_id, product.updated_at))
+
+def _product_page_entry(products: List[Any], limit: int, fields: Optional[Sequence[str]] = None) -> CatalogEntry:
+    if fields:
+        body = dump_fields(products, fields)
+    else:
+        body = dump_json(List[Product], products)
+    cursor = next_cursor(products, limit, product_sort_key)
+    etag = make_etag("products", fields, [(product.product_id, product.updated_at) for product in products], cursor)
+    return CatalogEntry(body, cursor, etag)
+
+def _load_fields(fields: Optional[Sequence[str]]) -> Optional[Sequence[str]]:
+    # updated_at feeds the ETag even when the client didn't ask for it
+    if fields and "updated_at" not in fields:
+        return (*fields, "updated_at")
+    return fields
+
+def _batch_entry(product_ids: List[int], entries: Dict[int, CatalogEntry]) -> CatalogEntry:
+    # Splice the cached per-product bodies instead of serialising again
+    found = [entries[product_id] for product_id in product_ids if product_id in entries]
+    missing = [product_id for product_id in product_ids if product_id not in entries]
+    body = b"".join((
+        b'{"products":[', b",".join(entry.body for entry in found),
+        b'],"missing":', json.dumps(missing).encode(), b"}",
+    ))
+    return CatalogEntry(body, etag=make_etag("batch", [entry.etag for entry in found], missing))
+
+def _cached_products(product_ids: List[int]) -> Tuple[int, Dict[int, CatalogEntry], List[int]]:
+    version = get_catalog_version()
+    entries: Dict[int, CatalogEntry] = {}
+    misses: List[int] = []
+    for product_id in product_ids:
+        entry = catalog_cache.get(("product", version, product_id))
+        if entry is None:
+            misses.append(product_id)
+        else:
+            entries[product_id] = entry
+    return version, entries, misses
+
+def _cache_products(version: int, products: Dict[int, Any], entries: Dict[int, CatalogEntry]) -> None:
+    for product_id, product in products.items():
+        entry = _product_entry(product)
+        catalog_cache.set(("product", version, product_id), entry)
+        entries[product_id] = entry
+
+def _page_key(
+    kind: str, *args: Any, skip: int, limit: int, after: Optional[int], fields: Optional[Sequence[str]] = None
+) -> tuple:
+    # With a cursor the offset is ignored, so leave it out of the key
+    return (kind, get_catalog_version(), *args, 0 if after is not None else skip, limit, after, fields)
 
 def create_product(db: Session, product_data: ProductCreate) -> Product:
-    return product_repository.create(db, obj_in=product_data)
+    product = product_repository.create(db, obj_in=product_data)
+    catalog_changed(product.product_id)
+    return product
 
 def get_product(db: Session, product_id: int) -> Optional[Product]:
     return product_repository.get_by_id(db, product_id=product_id)
 
 def get_product_price(db: Session, product_id: int) -> Optional[float]:
-    product = get_product(db, product_id)
-    return product.product_price
+    return product_repository.get_price(db, product_id=product_id)
 
 def update_product(db: Session, product_id: int, product_data: ProductUpdate) -> Optional[Product]:
     db_product = product_repository.get_by_id(db, product_id=product_id)
     if not db_product:
         return None
     
-    return product_repository.update(db, db_obj=db_product, obj_in=product_data)
+    product = product_repository.update(db, db_obj=db_product, obj_in=product_data)
+    catalog_changed(product_id)
+    return product
 
 def delete_product(db: Session, product_id: int) -> Optional[Product]:
     db_product = product_repository.get_by_id(db, product_id=product_id)
     if not db_product:
         return None
     
-    return product_repository.remove(db, id=product_id)
+    product = product_repository.remove(db, id=product_id)
+    catalog_changed(product_id)
+    return product
+
+def get_products(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[int] = None, fields: Optional[Sequence[str]] = None
+) -> List[Product]:
+    return product_repository.get_multi(db, skip=skip, limit=limit, after=after, fields=fields)
+
+def get_products_by_category(
+    db: Session, category: str, skip: int = 0, limit: int = 100, after: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None
+) -> List[Product]:
+    return product_repository.get_by_category(db, category=category, skip=skip, limit=limit, after=after, fields=fields)
+
+def get_product_json(db: Session, product_id: int) -> Optional[CatalogEntry]:
+    key = ("product", get_catalog_version(), product_id)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        product = get_product(db, product_id)
+        if product is None:
+            return None
+        entry = _product_entry(product)
+        catalog_cache.set(key, entry)
+    return entry
+
+def get_products_batch_json(db: Session, product_ids: List[int]) -> CatalogEntry:
+    """
+    Products for `product_ids` in request order (repeats dropped), plus the
+    ids that don't exist. Cached products are reused; the rest come from one
+    IN query and are cached for the next single or batch read.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    version, entries, misses = _cached_products(product_ids)
+    if misses:
+        _cache_products(version, product_repository.get_by_ids(db, product_ids=misses), entries)
+    return _batch_entry(product_ids, entries)
+
+def get_products_json(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[int] = None, fields: Optional[Sequence[str]] = None
+) -> CatalogEntry:
+    key = _page_key("products", skip=skip, limit=limit, after=after, fields=fields)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        products = get_products(db, skip=skip, limit=limit, after=after, fields=_load_fields(fields))
+        entry = _product_page_entry(products, limit, fields)
+        catalog_cache.set(key, entry)
+    return entry
+
+def get_products_by_category_json(
+    db: Session, category: str, skip: int = 0, limit: int = 100, after: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None
+) -> CatalogEntry:
+    key = _page_key("category", category, skip=skip, limit=limit, after=after, fields=fields)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        products = get_products_by_category(
+            db, category=category, skip=skip, limit=limit, after=after, fields=_load_fields(fields)
+        )
+        entry = _product_page_entry(products, limit, fields)
+        catalog_cache.set(key, entry)
+    return entry
 
-def get_products(db: Session, skip: int = 0, limit: int = 100) -> List[Product]:
-    return product_repository.get_multi(db, skip=skip, limit=limit)
+def _price_bounds() -> List[tuple]:
+    edges = settings.PRICE_BANDS
+    return list(zip([None, *edges], [*edges, None])) if edges else []
 
-def get_products_by_category(db: Session, category: str, skip: int = 0, limit: int = 100) -> List[Product]:
-    return product_repository.get_by_category(db, category=category, skip=skip, limit=limit)
+def _build_facets(rows: List[Any]) -> Dict[Optional[str], ProductFacets]:
+    """
+    Per-category facets from the aggregate rows, plus the whole catalog
+    under the None key, summed here instead of with a second query.
+    """
+    bounds = _price_bounds()
+    total = ProductFacets(
+        count=0, in_stock=0,
+        price_bands=[PriceBand(min_price=low, max_price=high, count=0) for low, high in bounds],
+    )
+    facets: Dict[Optional[str], ProductFacets] = {}
+    for row in rows:
+        band_counts = row[5:]
+        if row.category is not None:
+            facets[row.category] = ProductFacets(
+                category=row.category, count=row.count, in_stock=row.in_stock,
+                min_price=row.min_price, max_price=row.max_price,
+                price_bands=[
+                    PriceBand(min_price=low, max_price=high, count=count)
+                    for (low, high), count in zip(bounds, band_counts)
+                ],
+            )
+        total.count += row.count
+        total.in_stock += row.in_stock
+        if row.min_price is not None:
+            total.min_price = min(row.min_price, total.min_price if total.min_price is not None else row.min_price)
+            total.max_price = max(row.max_price, total.max_price if total.max_price is not None else row.max_price)
+        for band, count in zip(total.price_bands, band_counts):
+            band.count += count
+    facets[None] = total
+    return facets
+
+def _categories_entry(facets: Dict[Optional[str], ProductFacets]) -> CatalogEntry:
+    categories = [
+        CategoryCount(category=name, count=facet.count, in_stock=facet.in_stock)
+        for name, facet in sorted((name, facet) for name, facet in facets.items() if name is not None)
+    ]
+    body = adapter(List[CategoryCount]).dump_json(categories)
+    return CatalogEntry(body, etag=make_etag("categories", body))
+
+def _facets_entry(facets: Dict[Optional[str], ProductFacets], category: Optional[str]) -> Optional[CatalogEntry]:
+    facet = facets.get(category)
+    if facet is None:
+        return None
+    body = adapter(ProductFacets).dump_json(facet)
+    return CatalogEntry(body, etag=make_etag("facets", body))
+
+# The facet rollup is one GROUP BY over products, cached per catalog version
+# like the pages above: the next catalog change drops it and the first read
+# after that recomputes it. Category and facet reads never touch the table
+# while it is cached.
+def get_facet_rollup(db: Session) -> Dict[Optional[str], ProductFacets]:
+    key = ("facet_rollup", get_catalog_version())
+    facets = catalog_cache.get(key)
+    if facets is None:
+        facets = _build_facets(product_repository.get_facet_rows(db))
+        catalog_cache.set(key, facets)
+    return facets
+
+def get_categories_json(db: Session) -> CatalogEntry:
+    key = ("categories", get_catalog_version())
+    entry = catalog_cache.get(key)
+    if entry is None:
+        entry = _categories_entry(get_facet_rollup(db))
+        catalog_cache.set(key, entry)
+    return entry
+
+def get_facets_json(db: Session, category: Optional[str] = None) -> Optional[CatalogEntry]:
+    key = ("facets", get_catalog_version(), category)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        entry = _facets_entry(get_facet_rollup(db), category)
+        if entry is None:
+            return None
+        catalog_cache.set(key, entry)
+    return entry
 
 def search_products(db: Session, query: str, skip: int = 0, limit: int = 100) -> List[Product]:
-    return product_repository.search(db, query=query, skip=skip, limit=limit)
\ No newline at end of file
+    return product_repository.search(db, query=query, skip=skip, limit=limit)
+
+async def get_product_async(db: AsyncSession, product_id: int) -> Optional[Product]:
+    return await async_product_repository.get_by_id(db, product_id=product_id)
+
+async def get_products_async(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None, fields: Optional[Sequence[str]] = None
+) -> List[Product]:
+    return await async_product_repository.get_multi(db, skip=skip, limit=limit, after=after, fields=fields)
+
+async def get_products_by_category_async(
+    db: AsyncSession, category: str, skip: int = 0, limit: int = 100, after: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None
+) -> List[Product]:
+    return await async_product_repository.get_by_category(db, category=category, skip=skip, limit=limit, after=after, fields=fields)
+
+async def get_product_json_async(db: AsyncSession, product_id: int) -> Optional[CatalogEntry]:
+    key = ("product", get_catalog_version(), product_id)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        product = await get_product_async(db, product_id)
+        if product is None:
+            return None
+        entry = _product_entry(product)
+        catalog_cache.set(key, entry)
+    return entry
+
+async def get_products_batch_json_async(db: AsyncSession, product_ids: List[int]) -> CatalogEntry:
+    product_ids = list(dict.fromkeys(product_ids))
+    version, entries, misses = _cached_products(product_ids)
+    if misses:
+        _cache_products(version, await async_product_repository.get_by_ids(db, product_ids=misses), entries)
+    return _batch_entry(product_ids, entries)
+
+async def get_products_json_async(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None, fields: Optional[Sequence[str]] = None
+) -> CatalogEntry:
+    key = _page_key("products", skip=skip, limit=limit, after=after, fields=fields)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        products = await get_products_async(db, skip=skip, limit=limit, after=after, fields=_load_fields(fields))
+        entry = _product_page_entry(products, limit, fields)
+        catalog_cache.set(key, entry)
+    return entry
+
+async def get_products_by_category_json_async(
+    db: AsyncSession, category: str, skip: int = 0, limit: int = 100, after: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None
+) -> CatalogEntry:
+    key = _page_key("category", category, skip=skip, limit=limit, after=after, fields=fields)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        products = await get_products_by_category_async(
+            db, category=category, skip=skip, limit=limit, after=after, fields=_load_fields(fields)
+        )
+        entry = _product_page_entry(products, limit, fields)
+        catalog_cache.set(key, entry)
+    return entry
+
+async def get_facet_rollup_async(db: AsyncSession) -> Dict[Optional[str], ProductFacets]:
+    key = ("facet_rollup", get_catalog_version())
+    facets = catalog_cache.get(key)
+    if facets is None:
+        facets = _build_facets(await async_product_repository.get_facet_rows(db))
+        catalog_cache.set(key, facets)
+    return facets
+
+async def get_categories_json_async(db: AsyncSession) -> CatalogEntry:
+    key = ("categories", get_catalog_version())
+    entry = catalog_cache.get(key)
+    if entry is None:
+        entry = _categories_entry(await get_facet_rollup_async(db))
+        catalog_cache.set(key, entry)
+    return entry
+
+async def get_facets_json_async(db: AsyncSession, category: Optional[str] = None) -> Optional[CatalogEntry]:
+    key = ("facets", get_catalog_version(), category)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        entry = _facets_entry(await get_facet_rollup_async(db), category)
+        if entry is None:
+            return None
+        catalog_cache.set(key, entry)
+    return entry
+
+async def search_products_async(db: AsyncSession, query: str, skip: int = 0, limit: int = 100) -> List[Product]:
+    return await async_product_repository.search(db, query=query, skip=skip, limit=limit)
+
+def get_product_names(db: Session, product_ids: List[int]) -> dict:
+    return product_repository.get_names(db, product_ids=product_ids)
+
+async def get_product_names_async(db: AsyncSession, product_ids: List[int]) -> dict:
+    return await async_product_repository.get_names(db, product_ids=product_ids)
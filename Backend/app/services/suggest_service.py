@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config.settings import settings
+from app.models.schemas import Suggestion
+from app.repositories.order_repository import order_repository
+from app.repositories.product_repository import product_repository, async_product_repository
+from app.db.base import read_session
+from app.db.invalidation import bus
+from app.services.product_service import CatalogEntry
+from app.utils.prefix_index import PrefixIndex
+from app.utils.serialization import adapter
+
+# Product names and categories for search-as-you-type, ranked by units
+# ordered (ratings break ties). Built from the database on startup, then
+# patched per product on "catalog" messages; a message without a product id
+# (bulk ingestion, bus reconnect) or the rebuild interval triggers a full
+# rebuild, which also refreshes popularity. Full rebuilds run on a
+# background thread and swap the new index in, so lookups never wait on one.
+logger = logging.getLogger("app.suggest")
+
+_index = PrefixIndex()
+_suggestions: Dict[tuple, Suggestion] = {}
+_units: Dict[int, int] = {}
+_product_categories: Dict[int, str] = {}
+
+_state_lock = threading.Lock()
+_rebuild_needed = True
+_rebuild_at = 0.0
+_rebuilding = False
+# Bumped when a rebuild starts; patches claimed before then are dropped
+_generation = 0
+_dirty: Set[int] = set()
+
+def _catalog_changed(key: Any = None) -> None:
+    global _rebuild_needed
+    with _state_lock:
+        if key is None:
+            _rebuild_needed = True
+        else:
+            _dirty.add(int(key))
+
+bus.subscribe("catalog", _catalog_changed)
+bus.on_flush(_catalog_changed)
+
+def _start_rebuild() -> None:
+    # Called with _state_lock held. Changes before this point are in the
+    # rebuild's snapshot; later ones wait in _dirty until it is swapped in.
+    global _rebuild_needed, _rebuild_at, _rebuilding, _generation, _dirty
+    _rebuild_needed = False
+    _rebuilding = True
+    _generation += 1
+    _rebuild_at = time.monotonic() + settings.SUGGEST_REBUILD_SECONDS
+    _dirty = set()
+    threading.Thread(target=_rebuild_in_background, name="suggest-rebuild", daemon=True).start()
+
+def _claim_work() -> Optional[Tuple[int, Set[int]]]:
+    """
+    Product ids whose entries the caller should reload before answering
+    (with the generation to pass to _update), or None. A due full rebuild is started in the background instead; while it
+    runs, product changes stay pending, since patching the index it is about
+    to replace would lose them. Claiming clears the pending work so
+    concurrent requests don't repeat it.
+    """
+    global _dirty
+    with _state_lock:
+        if _rebuilding:
+            return None
+        if _rebuild_needed or time.monotonic() >= _rebuild_at:
+            _start_rebuild()
+            return None
+        if not _dirty:
+            return None
+        dirty, _dirty = _dirty, set()
+        return _generation, dirty
+
+def _release_work(work: Tuple[int, Set[int]]) -> None:
+    # Loading failed: put the work back for the next request
+    with _state_lock:
+        _dirty.update(work[1])
+
+def warm_suggestions() -> None:
+    # Start the first build at startup so early lookups aren't empty
+    with _state_lock:
+        if _rebuild_needed and not _rebuilding:
+            _start_rebuild()
+
+def _product_score(product_id: int, ratings: Optional[float], units: Optional[Dict[int, int]] = None) -> float:
+    return (_units if units is None else units).get(product_id, 0) + (ratings or 0) / 10
+
+def _rebuild(rows: Iterable[Any], units: Dict[int, int]) -> None:
+    global _index, _units, _product_categories, _suggestions
+    suggestions: Dict[tuple, Suggestion] = {}
+    categories: Dict[int, str] = {}
+    category_scores: Dict[str, float] = {}
+    entries = []
+    for product_id, name, category, ratings in rows:
+        if not name:
+            continue
+        score = _product_score(product_id, ratings, units)
+        suggestions[("product", product_id)] = Suggestion(
+            text=name, kind="product", product_id=product_id, category=category
+        )
+        entries.append((("product", product_id), [name], score))
+        if category:
+            categories[product_id] = category
+            category_scores[category] = category_scores.get(category, 0) + score
+    for category, score in category_scores.items():
+        suggestions[("category", category)] = Suggestion(text=category, kind="category", category=category)
+        entries.append((("category", category), [category], score))
+    index = PrefixIndex()
+    index.build(entries)
+    with _state_lock:
+        _index, _suggestions, _units, _product_categories = index, suggestions, units, categories
+
+def _rebuild_in_background() -> None:
+    global _rebuild_needed, _rebuilding
+    db = read_session()
+    try:
+        _rebuild(product_repository.get_index_rows(db), order_repository.get_units_ordered(db))
+    except Exception:
+        logger.exception("Rebuilding the suggestion index failed")
+        with _state_lock:
+            _rebuild_needed = True
+    finally:
+        db.close()
+        with _state_lock:
+            _rebuilding = False
+
+def _adjust_category(category: str, delta: float) -> None:
+    # Called with _state_lock held. A category scores the sum of its
+    # products' scores, and goes once it has no products left.
+    key = ("category", category)
+    if category not in _product_categories.values():
+        _index.remove(key)
+        _suggestions.pop(key, None)
+        return
+    _suggestions.setdefault(key, Suggestion(text=category, kind="category", category=category))
+    _index.add(key, [category], max(0.0, _index.score(key) + delta))
+
+def _replace_product(product_id: int, name: Optional[str], category: Optional[str], ratings: Optional[float]) -> None:
+    # Called with _state_lock held; no name removes the product
+    key = ("product", product_id)
+    old_category = _product_categories.pop(product_id, None)
+    if old_category:
+        _adjust_category(old_category, -_index.score(key))
+    if not name:
+        _index.remove(key)
+        _suggestions.pop(key, None)
+        return
+    score = _product_score(product_id, ratings)
+    _suggestions[key] = Suggestion(text=name, kind="product", product_id=product_id, category=category)
+    _index.add(key, [name], score)
+    if category:
+        _product_categories[product_id] = category
+        _adjust_category(category, score)
+
+def _update(work: Tuple[int, Set[int]], rows: Iterable[Any]) -> None:
+    generation, product_ids = work
+    rows = list(rows)
+    with _state_lock:
+        if generation != _generation:
+            # A rebuild started since the work was claimed; it read these afresh
+            return
+        found = set()
+        for product_id, name, category, ratings in rows:
+            found.add(product_id)
+            _replace_product(product_id, name, category, ratings)
+        for product_id in product_ids - found:
+            _replace_product(product_id, None, None, None)
+
+def _search(query: str, limit: int) -> CatalogEntry:
+    with _state_lock:
+        index, suggestions = _index, _suggestions
+    suggestions = [suggestions[key] for key in index.search(query, limit) if key in suggestions]
+    return CatalogEntry(adapter(List[Suggestion]).dump_json(suggestions))
+
+def get_suggestions(db: Session, query: str, limit: int = 10) -> CatalogEntry:
+    work = _claim_work()
+    if work is not None:
+        try:
+            _update(work, product_repository.get_index_rows(db, product_ids=work[1]))
+        except Exception:
+            _release_work(work)
+            raise
+    return _search(query, limit)
+
+async def get_suggestions_async(db: AsyncSession, query: str, limit: int = 10) -> CatalogEntry:
+    work = _claim_work()
+    if work is not None:
+        try:
+            _update(work, await async_product_repository.get_index_rows(db, product_ids=work[1]))
+        except Exception:
+            _release_work(work)
+            raise
+    return _search(query, limit)
+
+def suggest_stats() -> Dict[str, Any]:
+    with _state_lock:
+        return {
+            "entries": len(_index),
+            "pending_products": len(_dirty),
+            "rebuild_pending": _rebuild_needed,
+            "rebuilding": _rebuilding,
+            "rebuild_in_seconds": max(0, round(_rebuild_at - time.monotonic())),
+        }
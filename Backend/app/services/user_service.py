@@ -2,14 +2,15 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.models.schemas import UserCreate, UserUpdate, User
 from app.repositories.user_repository import user_repository
+from app.services.auth_service import invalidate_principal, revoke_tokens
+from app.db.base import unit_of_work
 
-def create_user(db: Session, user_data: UserCreate) -> User:
+def create_user(db: Session, user_data: UserCreate, hashed_password: Optional[str] = None) -> User:
     # Check if email already exists
-    existing_user = user_repository.get_by_email(db, email=user_data.email)
-    if existing_user:
+    if user_repository.email_exists(db, email=user_data.email):
         raise ValueError("Email already registered")
     
-    return user_repository.create(db, obj_in=user_data)
+    return user_repository.create(db, obj_in=user_data, hashed_password=hashed_password)
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
     return user_repository.get(db, id=user_id)
@@ -18,11 +19,21 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
     return user_repository.get_by_email(db, email=email)
 
 def update_user(db: Session, user_id: int, user_data: UserUpdate) -> Optional[User]:
-    db_user = user_repository.get(db, id=user_id)
-    if not db_user:
-        return None
-    
-    return user_repository.update(db, db_obj=db_user, obj_in=user_data)
+    # The profile change and any token revocation commit together
+    with unit_of_work(db):
+        db_user = user_repository.get(db, id=user_id)
+        if not db_user:
+            return None
+
+        previous_email, previous_role = db_user.email, db_user.role
+        updated_user = user_repository.update(db, db_obj=db_user, obj_in=user_data)
+        # Email and role are signed into claims tokens, so those must be reissued
+        if updated_user.email != previous_email or updated_user.role != previous_role:
+            revoke_tokens(db, user_id)
+    # Drop cached principals so the next request sees the new profile/role
+    invalidate_principal(previous_email)
+    invalidate_principal(updated_user.email)
+    return updated_user
 
 def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
     return user_repository.get_multi(db, skip=skip, limit=limit)
@@ -0,0 +1,21 @@
+import hashlib
+from typing import Any, Optional
+
+def make_etag(*parts: Any) -> str:
+    """
+    Weak ETag over `parts` (ids and updated_at values). Depends only on the
+    data, so every worker hands out the same tag for the same rows. Weak
+    because GZipMiddleware sends the same tag on the identity and the
+    gzip-encoded body, which are equivalent but not byte-identical.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
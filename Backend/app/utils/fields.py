@@ -0,0 +1,9 @@
+from typing import Any, Dict, List, Sequence
+from app.utils.serialization import adapter
+
+def dump_fields(objs: Sequence[Any], fields: Sequence[str]) -> bytes:
+    """
+    JSON list holding only `fields` of each object, for sparse fieldset
+    responses whose objects were loaded with just those columns.
+    """
+    return adapter(List[Dict[str, Any]]).dump_json([{name: getattr(obj, name) for name in fields} for obj in objs])
@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the sort key of the last row on a page as an opaque cursor.
+    """
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, types: Sequence[Callable[[Any], Any]]) -> Tuple[Any, ...]:
+    """
+    Decode a cursor produced by encode_cursor, converting each part with `types`.
+    Raises ValueError for anything that is not a cursor of that shape.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError("Malformed cursor") from e
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Malformed cursor")
+    try:
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (TypeError, ValueError) as e:
+        raise ValueError("Malformed cursor") from e
+
+def next_cursor(rows: List[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> Optional[str]:
+    """
+    Cursor for the page after `rows`, or None when this was the last page.
+    """
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(key(rows[-1]))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def set_next_cursor(response: Any, rows: List[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> None:
+    # List endpoints keep returning plain arrays; the cursor travels in a header
+    cursor = next_cursor(rows, limit, key)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+PRODUCT_CURSOR = (int,)
+ORDER_CURSOR = (datetime.fromisoformat, int)
+
+def product_sort_key(product: Any) -> Sequence[Any]:
+    return (product.product_id,)
+
+def order_sort_key(order: Any) -> Sequence[Any]:
+    return (order.created_at, order.order_id)
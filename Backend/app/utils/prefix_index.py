@@ -0,0 +1,116 @@
+import bisect
+import heapq
+import re
+import threading
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+_SPACES = re.compile(r"\s+")
+
+def normalize(text: str) -> str:
+    return _SPACES.sub(" ", text.strip().lower())
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index. Each entry is indexed under its full text and
+    under the text starting at every later word, so "tom" and "red" both find
+    "Tomato Red". Lookups bisect to the matching range and return the highest
+    scoring entries. Short prefixes (up to `memo_length` characters), whose
+    ranges are large, are ranked over the whole range and memoised until the
+    next change; longer ones rank the first `scan_limit` matching terms.
+    """
+
+    def __init__(self, scan_limit: int = 5000, memo_length: int = 2):
+        self.scan_limit = scan_limit
+        self.memo_length = memo_length
+        self._terms: List[Tuple[str, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[List[str], float]] = {}
+        self._memo: Dict[Tuple[str, int], List[Hashable]] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _terms_for(texts: Iterable[str]) -> List[str]:
+        terms = set()
+        for text in texts:
+            words = normalize(text).split(" ")
+            for start in range(len(words)):
+                term = " ".join(words[start:])
+                if term:
+                    terms.add(term)
+        return sorted(terms)
+
+    def build(self, entries: Iterable[Tuple[Hashable, Iterable[str], float]]) -> None:
+        """
+        Replace the whole index with (key, texts, score) entries.
+        """
+        index_entries: Dict[Hashable, Tuple[List[str], float]] = {}
+        terms: List[Tuple[str, Hashable]] = []
+        for key, texts, score in entries:
+            entry_terms = self._terms_for(texts)
+            index_entries[key] = (entry_terms, score)
+            terms.extend((term, key) for term in entry_terms)
+        terms.sort(key=lambda item: item[0])
+        with self._lock:
+            self._terms = terms
+            self._entries = index_entries
+            self._memo = {}
+
+    def add(self, key: Hashable, texts: Iterable[str], score: float = 0.0) -> None:
+        # Incremental insert/replace; O(n) list inserts, fine for catalog sizes
+        with self._lock:
+            self._remove(key)
+            entry_terms = self._terms_for(texts)
+            for term in entry_terms:
+                bisect.insort(self._terms, (term, key), key=lambda item: item[0])
+            self._entries[key] = (entry_terms, score)
+            self._memo = {}
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+            self._memo = {}
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry[0]:
+            position = bisect.bisect_left(self._terms, term, key=lambda item: item[0])
+            while position < len(self._terms) and self._terms[position][0] == term:
+                if self._terms[position][1] == key:
+                    del self._terms[position]
+                    break
+                position += 1
+
+    def score(self, key: Hashable) -> float:
+        entry = self._entries.get(key)
+        return entry[1] if entry else 0.0
+
+    def search(self, prefix: str, limit: int = 10) -> List[Hashable]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            memoise = len(prefix) <= self.memo_length
+            memo_key = (prefix, limit)
+            if memoise and memo_key in self._memo:
+                return self._memo[memo_key]
+            terms = self._terms
+            start = bisect.bisect_left(terms, prefix, key=lambda item: item[0])
+            stop = len(terms) if memoise else min(len(terms), start + self.scan_limit)
+            # dict keeps term order, so equal scores come back alphabetically
+            candidates: Dict[Hashable, None] = {}
+            # Walk forward from the bisected position; islice() would step
+            # through every term before `start` first
+            for position in range(start, stop):
+                term, key = terms[position]
+                if not term.startswith(prefix):
+                    break
+                candidates[key] = None
+            entries = self._entries
+            results = heapq.nlargest(limit, candidates, key=lambda key: entries[key][1])
+            if memoise:
+                self._memo[memo_key] = results
+            return results
+
+    def __len__(self) -> int:
+        return len(self._entries)
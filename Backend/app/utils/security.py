@@ -1,11 +1,27 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Callable, Union
 from jose import jwt
 from app.core.config.settings import settings
+import asyncio
+import threading
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt gets its own small pool so a login burst cannot starve the
+# threadpool that serves every other sync endpoint
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_password_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when too many password hash/verify jobs are already queued.
+    """
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify if the plain password matches the hashed password.
@@ -18,6 +34,32 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+async def _run_password_job(func: Callable[..., Any], *args: Any) -> Any:
+    if not _password_slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = password_executor.submit(func, *args)
+    except BaseException:
+        _password_slots.release()
+        raise
+    # The slot is held until the job itself is done (or cancelled before it
+    # started), not just until the caller stops waiting: a cancelled request
+    # leaves its bcrypt job queued or running on the pool
+    future.add_done_callback(lambda _: _password_slots.release())
+    return await asyncio.wrap_future(future)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    verify_password on the dedicated password pool.
+    """
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    get_password_hash on the dedicated password pool.
+    """
+    return await _run_password_job(get_password_hash, password)
+
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
 ) -> str:
@@ -0,0 +1,19 @@
+from functools import lru_cache
+from typing import Any
+from pydantic import TypeAdapter
+
+@lru_cache(maxsize=None)
+def adapter(type_: Any) -> TypeAdapter:
+    """
+    TypeAdapter for a schema or list type, built once per type: building one
+    compiles the validator and serializer, which costs more than using it.
+    """
+    return TypeAdapter(type_)
+
+def dump_json(type_: Any, value: Any) -> bytes:
+    """
+    Validate ORM objects (or dicts) as `type_` and serialise straight to JSON
+    bytes in pydantic's core, skipping the intermediate Python dicts.
+    """
+    type_adapter = adapter(type_)
+    return type_adapter.dump_json(type_adapter.validate_python(value, from_attributes=True))
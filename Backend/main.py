@@ -1,16 +1,55 @@
+import logging.config
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 # Import controllers or routers
 from app.api.controllers.admin_controller import router as admin_router
 from app.api.controllers.auth_controller import router as auth_router
 from app.api.controllers.cart_controller import router as cart_router
+from app.api.controllers.internal_controller import router as internal_router
 from app.api.controllers.order_controller import router as order_router
 from app.api.controllers.product_controller import router as product_router
 from app.api.controllers.user_controller import router as user_router
+from app.core.config.settings import settings
+from app.db.instrumentation import query_stats_middleware
+from app.db.cart_store import cart_store
+from app.db.invalidation import bus
+from app.services.cart_sweeper import cart_sweeper
+from app.services.suggest_service import warm_suggestions
 
-# Initialize the FastAPI app
-app = FastAPI()
+# uvicorn only configures its own loggers; without this the app.* records
+# (SQL stats on app.sql, cart store, sweeper, ...) would fall through to the
+# root logger's WARNING default and the INFO ones would be dropped
+logging.config.dictConfig({
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"default": {"format": "%(levelname)s:     %(name)s %(message)s"}},
+    "handlers": {"default": {"class": "logging.StreamHandler", "formatter": "default"}},
+    "loggers": {"app": {"handlers": ["default"], "level": settings.LOG_LEVEL, "propagate": False}},
+})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker listens for cache invalidations published by the others
+    bus.start()
+    if cart_store is not None:
+        cart_store.start()
+    if settings.CART_SWEEP_ENABLED:
+        cart_sweeper.start()
+    warm_suggestions()
+    yield
+    cart_sweeper.stop()
+    if cart_store is not None:
+        # Write out carts still waiting in the store before the worker exits
+        cart_store.stop()
+    bus.stop()
+
+# Initialize the FastAPI app. Routes that still return models are rendered
+# with orjson; the hot ones hand back pre-serialised bytes (app.api.responses)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 origins = [
     "http://localhost:3000",  # React frontend
     "http://localhost:5173",  # Vite default port if you're using Vite
@@ -21,13 +60,28 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Explicitly allow OPTIONS
-    allow_headers=["Content-Type", "Authorization", "Accept"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],  # Explicitly allow OPTIONS
+    allow_headers=["Content-Type", "Authorization", "Accept", "If-None-Match"],
+    expose_headers=["ETag", "X-Cart-Version", "X-Next-Cursor", "X-DB-Queries", "X-DB-Time-Ms", "X-DB-Repeated-Queries"],
 )
+# Compress JSON bodies above the threshold; small ones aren't worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+app.middleware("http")(query_stats_middleware)
 # Register routes
+if settings.DB_ENGINE == "async":
+    # Async hot paths are registered first so they win over the sync handlers
+    from app.api.controllers.async_controller import (
+        product_router as async_product_router,
+        cart_router as async_cart_router,
+        order_router as async_order_router,
+    )
+    app.include_router(async_cart_router, prefix="/cart", tags=["Cart"])
+    app.include_router(async_order_router, prefix="/order", tags=["Order"])
+    app.include_router(async_product_router, prefix="/product", tags=["Product"])
 app.include_router(admin_router, prefix="/admin", tags=["Admin"])
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 app.include_router(cart_router, prefix="/cart", tags=["Cart"])
+app.include_router(internal_router, prefix="/internal", tags=["Internal"])
 app.include_router(order_router, prefix="/order", tags=["Order"])
 app.include_router(product_router, prefix="/product", tags=["Product"])
 app.include_router(user_router, prefix="/user", tags=["User"])
@@ -0,0 +1,40 @@
+"""store carts.products as jsonb and add carts.version
+
+Revision ID: 5a7c3e91d2b4
+Revises: c4d9e7a2b5f0
+Create Date: 2026-10-17 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a7c3e91d2b4'
+down_revision: Union[str, None] = 'c4d9e7a2b5f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The type change rewrites carts under an exclusive lock; carts are small
+    # rows, but run this in a quiet window
+    op.alter_column(
+        'carts', 'products',
+        type_=postgresql.JSONB(), existing_type=sa.JSON(), postgresql_using='products::jsonb',
+    )
+    op.add_column(
+        'carts',
+        sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('carts', 'version')
+    op.alter_column(
+        'carts', 'products',
+        type_=sa.JSON(), existing_type=postgresql.JSONB(), postgresql_using='products::json',
+    )
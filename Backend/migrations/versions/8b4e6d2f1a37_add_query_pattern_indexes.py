@@ -0,0 +1,55 @@
+"""add indexes for repository query patterns
+
+Revision ID: 8b4e6d2f1a37
+Revises: 3f1c2a9b7d10
+Create Date: 2026-10-17 13:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e6d2f1a37'
+down_revision: Union[str, None] = '3f1c2a9b7d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    # CartRepository.get_by_user; one cart per user
+    ('ix_carts_user_id', 'carts', ['user_id'], True),
+    # OrderRepository.get_by_user, newest first
+    ('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'], False),
+    # ProductRepository.get_by_category, paged by product_id
+    ('ix_products_product_category', 'products', ['product_category', 'product_id'], False),
+    # ProductRepository.get_by_name, called per row during Excel ingestion
+    ('ix_products_product_name', 'products', ['product_name'], False),
+]
+
+
+def upgrade() -> None:
+    duplicate_carts = op.get_bind().execute(sa.text(
+        "SELECT count(*) FROM (SELECT user_id FROM carts WHERE user_id IS NOT NULL "
+        "GROUP BY user_id HAVING count(*) > 1) AS dup"
+    )).scalar()
+    if duplicate_carts:
+        raise RuntimeError(
+            f"{duplicate_carts} users have more than one cart; merge them before "
+            "building the unique ix_carts_user_id index"
+        )
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction. A failed
+    # concurrent build leaves an INVALID index behind, so drop any leftover first.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
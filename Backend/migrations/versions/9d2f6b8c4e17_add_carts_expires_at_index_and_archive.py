@@ -0,0 +1,48 @@
+"""index carts.expires_at and add carts_archive
+
+Revision ID: 9d2f6b8c4e17
+Revises: 5a7c3e91d2b4
+Create Date: 2026-10-17 20:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f6b8c4e17'
+down_revision: Union[str, None] = '5a7c3e91d2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Where the expired-cart sweeper moves carts when CART_SWEEP_ARCHIVE is on
+    op.create_table(
+        'carts_archive',
+        sa.Column('cart_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('products', postgresql.JSONB(), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=True),
+        sa.Column('expires_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('archived_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('cart_id'),
+    )
+    op.create_index('ix_carts_archive_user_id', 'carts_archive', ['user_id'])
+
+    # The sweeper takes the oldest expired carts first (see 8b4e6d2f1a37 for
+    # why any leftover is dropped before a concurrent build)
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_carts_expires_at', table_name='carts', if_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_carts_expires_at', 'carts', ['expires_at'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_carts_expires_at', table_name='carts', if_exists=True, postgresql_concurrently=True)
+    op.drop_index('ix_carts_archive_user_id', table_name='carts_archive')
+    op.drop_table('carts_archive')
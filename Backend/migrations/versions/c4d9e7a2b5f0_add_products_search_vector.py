@@ -0,0 +1,73 @@
+"""add full-text search vector to products
+
+Revision ID: c4d9e7a2b5f0
+Revises: 8b4e6d2f1a37
+Create Date: 2026-10-17 15:20:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d9e7a2b5f0'
+down_revision: Union[str, None] = '8b4e6d2f1a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic")
+
+# Copy of models.PRODUCT_SEARCH_VECTOR at the time of this revision
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(product_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(product_category, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(product_description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    # Adding a stored generated column rewrites products under an exclusive
+    # lock; run this in a quiet window on large catalogs
+    op.add_column(
+        'products',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True)),
+    )
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_products_search_vector', table_name='products', if_exists=True, postgresql_concurrently=True)
+        op.create_index(
+            'ix_products_search_vector', 'products', ['search_vector'],
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+
+        # Trigram matching (SEARCH_TRIGRAM=True) is optional: skip it where
+        # pg_trgm is not installed or we may not create extensions
+        bind = op.get_bind()
+        available = bind.execute(sa.text(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )).scalar()
+        if not available:
+            logger.warning("pg_trgm is not available; skipping ix_products_product_name_trgm")
+            return
+        try:
+            bind.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except sa.exc.DBAPIError as e:
+            logger.warning("Could not create pg_trgm (%s); skipping ix_products_product_name_trgm", e.orig)
+            return
+        op.drop_index('ix_products_product_name_trgm', table_name='products', if_exists=True, postgresql_concurrently=True)
+        op.create_index(
+            'ix_products_product_name_trgm', 'products', ['product_name'],
+            postgresql_using='gin', postgresql_ops={'product_name': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_products_product_name_trgm', table_name='products', if_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_products_search_vector', table_name='products', if_exists=True, postgresql_concurrently=True)
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,107 @@
+"""
+GET /cart/ throughput with sub-only access tokens (the user is looked up
+from the email) vs claims tokens (uid/role/ver signed in, ACCESS_TOKEN_CLAIMS).
+
+    cd Backend && python -m scripts.bench_cart_tokens [--seconds 5] [--concurrency 16]
+
+Drives the app in-process over ASGI against the database from the DB_*
+settings, as one throwaway user (with a cart) that is deleted at the end.
+--rtt-ms adds a delay before every statement, standing in for the round
+trip to a database across the network.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from typing import Dict, List
+
+# Each response reports how many statements it ran
+os.environ["QUERY_STATS_HEADERS"] = "True"
+
+import httpx
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+import main
+from app.db.base import SessionLocal
+from app.services import auth_service
+
+async def _load(token: str, seconds: float, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    queries: List[int] = []
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + seconds
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get("/cart/", headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+                queries.append(int(response.headers["X-DB-Queries"]))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "queries": statistics.mean(queries),
+    }
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rtt-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    user_id = db.execute(
+        text("INSERT INTO users (name, email, role) VALUES ('bench', :email, 2) RETURNING id"),
+        {"email": f"bench-{uuid.uuid4().hex}@bench.local"},
+    ).scalar()
+    db.execute(
+        text("INSERT INTO carts (user_id, products, expires_at) VALUES (:user_id, '[]', now() + interval '1 day')"),
+        {"user_id": user_id},
+    )
+    db.commit()
+    user = db.execute(text("SELECT id, email, role, token_version FROM users WHERE id = :id"), {"id": user_id}).one()
+    sub_token = auth_service.create_access_token(data={"sub": user.email})
+    claims_token = auth_service.create_access_token(
+        data={"sub": user.email, "uid": user.id, "role": user.role, "ver": user.token_version}
+    )
+    cache_get = auth_service.principal_cache.get
+    modes = [
+        # Without the principal cache every request loads the user first
+        ("sub token, no principal cache", sub_token, lambda key: None),
+        ("sub token, principal cache", sub_token, cache_get),
+        ("claims token", claims_token, cache_get),
+    ]
+    if args.rtt_ms:
+        event.listen(Engine, "before_cursor_execute", lambda *_: time.sleep(args.rtt_ms / 1000))
+    try:
+        print(f"GET /cart/, {args.concurrency} concurrent clients for {args.seconds:g} s, +{args.rtt_ms:g} ms per statement")
+        for name, token, principal_lookup in modes:
+            auth_service.principal_cache.get = principal_lookup
+            asyncio.run(_load(token, 1, args.concurrency))  # warm up
+            result = asyncio.run(_load(token, args.seconds, args.concurrency))
+            print(
+                f"{name:30} {result['rps']:6.0f} req/s  p50 {result['p50']:6.2f} ms  p99 {result['p99']:6.2f} ms"
+                f"  {result['queries']:.1f} queries/request"
+            )
+    finally:
+        auth_service.principal_cache.get = cache_get
+        db.execute(text("DELETE FROM carts WHERE user_id = :id"), {"id": user_id})
+        db.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    main_()
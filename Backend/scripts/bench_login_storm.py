@@ -0,0 +1,165 @@
+"""
+Login p99 and catalog-read latency while a login storm is running, with
+bcrypt on the dedicated password pool and the lookup's connection released
+first (after), or as the old sync /auth/login did it (before): bcrypt on the
+default threadpool that also serves the sync catalog endpoints, with the
+session's pooled connection held throughout.
+
+    cd Backend && python -m scripts.bench_login_storm [--logins 64] [--readers 4] [--seconds 10]
+
+Starts the app under uvicorn in a child process for each mode, against the
+database from the DB_* settings, and logs in as one throwaway user that is
+deleted at the end.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Awaitable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import text
+
+PASSWORD = "bench-password"
+
+def serve(port: int, mode: str) -> None:
+    import uvicorn
+    from starlette.concurrency import run_in_threadpool
+
+    import main
+    from app.services import auth_service
+    from app.utils import security
+
+    if mode == "before":
+        # The old login: the lookup keeps its pooled connection while bcrypt
+        # runs, and bcrypt shares the default threadpool with sync endpoints
+        def get_user_holding_connection(db, email: str):
+            return auth_service.user_repository.get_by_email(db, email=email)
+
+        async def verify_on_threadpool(plain_password: str, hashed_password: str) -> bool:
+            return await run_in_threadpool(security.verify_password, plain_password, hashed_password)
+
+        auth_service.get_user_and_release = get_user_holding_connection
+        auth_service.verify_password_async = verify_on_threadpool
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def _send(request: Awaitable[httpx.Response]) -> Optional[httpx.Response]:
+    # A request that dies in the app (e.g. a QueuePool timeout) is dropped
+    # by uvicorn without a response
+    try:
+        return await request
+    except httpx.TransportError:
+        return None
+
+async def _storm(base_url: str, email: str, logins: int, readers: int, seconds: float) -> Dict[str, list]:
+    results: Dict[str, list] = {"login": [], "busy": [], "read": [], "errors": []}
+    limits = httpx.Limits(max_connections=logins + readers)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def login() -> None:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await _send(client.post("/auth/login", json={"email": email, "password": PASSWORD}))
+                elapsed = (time.perf_counter() - started) * 1000
+                if response is None:
+                    results["errors"].append(elapsed)
+                elif response.status_code == 503:
+                    results["busy"].append(elapsed)
+                    await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+                elif response.status_code == 200:
+                    results["login"].append(elapsed)
+                else:
+                    results["errors"].append(elapsed)
+
+        async def read() -> None:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await _send(client.get("/product/", params={"limit": 20}))
+                elapsed = (time.perf_counter() - started) * 1000
+                results["read" if response is not None and response.status_code == 200 else "errors"].append(elapsed)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(*(login() for _ in range(logins)), *(read() for _ in range(readers)))
+    return results
+
+def _wait_until_up(base_url: str) -> None:
+    for _ in range(100):
+        try:
+            httpx.get(base_url + "/", timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:8.1f} ms" if value is not None else "       -   "
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64, help="concurrent login clients")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent catalog readers")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--serve", nargs=2, metavar=("PORT", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(int(args.serve[0]), args.serve[1])
+        return
+
+    from app.db.base import SessionLocal
+    from app.utils.security import get_password_hash
+
+    db = SessionLocal()
+    email = f"bench-{uuid.uuid4().hex}@bench.local"
+    db.execute(
+        text("INSERT INTO users (name, email, password, role) VALUES ('bench', :email, :password, 2)"),
+        {"email": email, "password": get_password_hash(PASSWORD)},
+    )
+    db.commit()
+    try:
+        print(f"{args.logins} login clients, {args.readers} catalog readers (GET /product/), {args.seconds:g} s")
+        print(f"{'':8} {'logins':>7} {'503s':>6} {'errors':>6} {'login p50':>11} {'login p99':>11} {'read p50':>11} {'read p99':>11}")
+        for mode in ("before", "after"):
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = subprocess.Popen(
+                [sys.executable, "-m", "scripts.bench_login_storm", "--serve", str(port), mode],
+                env={**os.environ, "LOG_LEVEL": "ERROR"},
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                _wait_until_up(base_url)
+                idle = asyncio.run(_storm(base_url, email, 0, args.readers, 3))
+                storm = asyncio.run(_storm(base_url, email, args.logins, args.readers, args.seconds))
+            finally:
+                server.terminate()
+                server.wait()
+            print(
+                f"{mode:8} {len(storm['login']):>7} {len(storm['busy']):>6} {len(storm['errors']):>6}"
+                f" {_ms(_percentile(storm['login'], 0.5))} {_ms(_percentile(storm['login'], 0.99))}"
+                f" {_ms(_percentile(storm['read'], 0.5))} {_ms(_percentile(storm['read'], 0.99))}"
+                f"   (idle reads: p50 {statistics.median(idle['read']):.1f} ms)"
+            )
+    finally:
+        db.execute(text("DELETE FROM users WHERE email = :email"), {"email": email})
+        db.commit()
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+OFFSET vs keyset pagination: page 1 and a deep page of the product list, a
+category and a user's orders, through the repositories.
+
+    cd Backend && python -m scripts.bench_pagination [--rows 50000] [--page 1000]
+
+Runs against the database from the DB_* settings. The products and orders it
+seeds live in one transaction that is rolled back at the end, so nothing is
+left behind but advanced id sequences.
+"""
+import argparse
+import statistics
+import time
+from typing import Callable
+
+from sqlalchemy import text
+
+from app.db.base import SessionLocal
+from app.repositories.order_repository import order_repository
+from app.repositories.product_repository import product_repository
+
+CATEGORY = "bench-pagination"
+
+def _timed(run: Callable[[], list], runs: int) -> str:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        rows = run()
+        timings.append((time.perf_counter() - started) * 1000)
+    assert rows, "empty page"
+    return f"{statistics.median(timings):8.2f} ms"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="products and orders to seed")
+    parser.add_argument("--page", type=int, default=1000, help="the deep page to fetch")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    if args.rows < args.page * args.limit:
+        parser.error("--rows must cover --page pages of --limit rows")
+
+    db = SessionLocal()
+    try:
+        db.execute(text(
+            "INSERT INTO products (product_name, product_category, product_description, product_weight,"
+            " product_price, stock_quantity, images, ratings)"
+            " SELECT 'bench ' || n, :category, 'seeded', 1, 10, 5, ARRAY[]::varchar[], 0"
+            " FROM generate_series(1, :rows) AS n"
+        ), {"category": CATEGORY, "rows": args.rows})
+        user_id = db.execute(text(
+            "INSERT INTO users (name, email, role) VALUES ('bench', 'bench-pagination@bench.local', 2) RETURNING id"
+        )).scalar()
+        db.execute(text(
+            "INSERT INTO orders (user_id, products, total_order_price, order_status, delivery_address,"
+            " payment_details, created_at)"
+            " SELECT :user_id, '[]', 10, 1, 'seeded', '{}', now() - n * interval '1 minute'"
+            " FROM generate_series(1, :rows) AS n"
+        ), {"user_id": user_id, "rows": args.rows})
+        db.execute(text("ANALYZE products, orders"))
+        deep_skip = (args.page - 1) * args.limit
+
+        # The keyset cursor for the deep page is the last row of the page before it
+        last_product = db.execute(
+            text("SELECT product_id FROM products ORDER BY product_id OFFSET :skip LIMIT 1"), {"skip": deep_skip - 1}
+        ).scalar()
+        last_in_category = db.execute(text(
+            "SELECT product_id FROM products WHERE product_category = :category"
+            " ORDER BY product_id OFFSET :skip LIMIT 1"
+        ), {"category": CATEGORY, "skip": deep_skip - 1}).scalar()
+        last_order = tuple(db.execute(text(
+            "SELECT created_at, order_id FROM orders WHERE user_id = :user_id"
+            " ORDER BY created_at DESC, order_id DESC OFFSET :skip LIMIT 1"
+        ), {"user_id": user_id, "skip": deep_skip - 1}).one())
+
+        limit = args.limit
+        lists = {
+            "/product/": (
+                lambda skip: product_repository.get_multi(db, skip=skip, limit=limit),
+                lambda after: product_repository.get_multi(db, limit=limit, after=after),
+                last_product,
+            ),
+            "/product/category/{category}": (
+                lambda skip: product_repository.get_by_category(db, category=CATEGORY, skip=skip, limit=limit),
+                lambda after: product_repository.get_by_category(db, category=CATEGORY, limit=limit, after=after),
+                last_in_category,
+            ),
+            "/order/": (
+                lambda skip: order_repository.get_by_user(db, user_id=user_id, skip=skip, limit=limit),
+                lambda after: order_repository.get_by_user(db, user_id=user_id, limit=limit, after=after),
+                last_order,
+            ),
+        }
+        print(f"{args.rows} seeded products and orders, {limit} rows a page, median of {args.runs} runs")
+        print(f"{'list':30} {'page':>6} {'OFFSET':>11} {'keyset':>11}")
+        for name, (by_offset, by_keyset, deep_cursor) in lists.items():
+            print(f"{name:30} {1:>6} {_timed(lambda: by_offset(0), args.runs)} {_timed(lambda: by_keyset(None), args.runs)}")
+            print(
+                f"{name:30} {args.page:>6} {_timed(lambda: by_offset(deep_skip), args.runs)}"
+                f" {_timed(lambda: by_keyset(deep_cursor), args.runs)}"
+            )
+            db.expunge_all()
+    finally:
+        db.rollback()
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Lookup latency of the /product/suggest prefix index on a synthetic catalog.
+
+    cd Backend && python -m scripts.bench_prefix_index [--products 100000]
+
+Prints the median and p99 of PrefixIndex.search for a few prefixes, including
+ones that sort near the end of the term list.
+"""
+import argparse
+import random
+import statistics
+import string
+import time
+
+from app.utils.prefix_index import PrefixIndex
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(20000)]
+    entries = [(i, [" ".join(rng.choices(words, k=3))], rng.random()) for i in range(args.products)]
+    entries.append(("zucchini", ["Zucchini Green"], 5.0))
+    index = PrefixIndex()
+    started = time.perf_counter()
+    index.build(entries)
+    print(f"built {len(index)} entries in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    for prefix in ("ab", "abc", "mno", "zucc", "zucchini gr"):
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            index.search(prefix)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{prefix!r:>15}  median {statistics.median(timings):.4f} ms  p99 {p99:.4f} ms")
+
+if __name__ == "__main__":
+    main()
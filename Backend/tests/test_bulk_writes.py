@@ -0,0 +1,55 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app.repositories.user_repository import user_repository
+
+@pytest.fixture
+def emails(db):
+    # Users these tests write through the bulk methods, deleted afterwards
+    prefix = uuid.uuid4().hex
+    yield lambda *names: [f"{prefix}-{name}@test.local" for name in names]
+    db.rollback()
+    db.execute(text("DELETE FROM users WHERE email LIKE :pattern"), {"pattern": f"{prefix}-%"})
+    db.commit()
+
+def test_bulk_upsert_reports_created_and_updated_in_input_order(db, emails):
+    a, b, c = emails("a", "b", "c")
+    first = user_repository.bulk_upsert(
+        db, objs_in=[{"email": a, "name": "A", "role": 2}, {"email": b, "name": "B", "role": 2}],
+        index_elements=["email"],
+    )
+    assert [outcome.status for outcome in first] == ["created", "created"]
+
+    # b exists now, c doesn't; a chunk size of 1 runs one statement per row
+    second = user_repository.bulk_upsert(
+        db, objs_in=[{"email": c, "name": "C", "role": 2}, {"email": b, "name": "B2", "role": 3}],
+        index_elements=["email"], chunk_size=1,
+    )
+    assert [(outcome.status, outcome.obj.email) for outcome in second] == [("created", c), ("updated", b)]
+    assert second[1].obj.id == first[1].obj.id
+    assert (second[1].obj.name, second[1].obj.role) == ("B2", 3)
+
+    mixed = user_repository.bulk_upsert(
+        db, objs_in=[{"email": a, "name": "A2"}, {"email": c, "name": "C2"}, {"email": emails("d")[0], "name": "D"}],
+        index_elements=["email"],
+    )
+    assert [outcome.status for outcome in mixed] == ["updated", "updated", "created"]
+    assert [outcome.obj.name for outcome in mixed] == ["A2", "C2", "D"]
+
+def test_bulk_update_changes_rows_by_key_and_reports_missing(db, emails):
+    a, b = emails("a", "b")
+    created = user_repository.bulk_create(
+        db, objs_in=[{"email": a, "name": "A", "role": 2}, {"email": b, "name": "B", "role": 2}]
+    )
+    outcomes = user_repository.bulk_update(db, objs_in=[
+        {"id": created[0].obj.id, "name": "A2"},
+        {"id": -1, "name": "nobody"},
+        {"id": created[1].obj.id, "role": 3},
+    ])
+    assert [outcome.status for outcome in outcomes] == ["updated", "missing", "updated"]
+    rows = dict(db.execute(
+        text("SELECT email, name || ':' || role FROM users WHERE email IN (:a, :b)"), {"a": a, "b": b}
+    ).all())
+    assert rows == {a: "A2:2", b: "B:3"}
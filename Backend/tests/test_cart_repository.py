@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from app.db.base import SessionLocal
+from app.models.schemas import CartCreate, CartItemBase, CartUpdate
+from app.repositories.cart_repository import cart_repository
+from app.services import cart_service
+
+@pytest.fixture
+def cart(db, user_id):
+    return cart_repository.create(
+        db, obj_in=CartCreate(user_id=user_id, products=[CartItemBase(product_id=1, product_name="Tomato", quantity=2)])
+    )
+
+def test_change_item_set_increment_and_remove(db, cart):
+    row = cart_repository.change_item(db, user_id=cart.user_id, product_id=1, op="increment", quantity=3)
+    assert (row.version, row.item) == (1, {"product_id": 1, "product_name": "Tomato", "quantity": 5})
+    row = cart_repository.change_item(db, user_id=cart.user_id, product_id=2, op="set", quantity=4, product_name="Onion")
+    assert (row.version, row.item) == (2, {"product_id": 2, "product_name": "Onion", "quantity": 4})
+    row = cart_repository.change_item(db, user_id=cart.user_id, product_id=1, op="remove")
+    assert (row.version, row.item) == (3, None)
+    # Decrementing to zero removes the line too
+    row = cart_repository.change_item(db, user_id=cart.user_id, product_id=2, op="increment", quantity=-4)
+    assert (row.version, row.item) == (4, None)
+    db.expire_all()
+    assert cart_repository.get_by_user(db, user_id=cart.user_id).products == []
+
+def test_change_item_with_stale_version_changes_nothing(db, cart):
+    assert cart_repository.change_item(db, user_id=cart.user_id, product_id=1, op="set", quantity=7, version=0).version == 1
+    assert cart_repository.change_item(db, user_id=cart.user_id, product_id=1, op="set", quantity=9, version=0) is None
+    assert cart_repository.get_version(db, user_id=cart.user_id) == 1
+    db.expire_all()
+    assert cart_repository.get_by_user(db, user_id=cart.user_id).products[0]["quantity"] == 7
+
+def test_change_cart_item_raises_stale_version_with_current_version(db, cart, monkeypatch):
+    monkeypatch.setattr(cart_service, "cart_store", None)
+    cart_service.change_cart_item(db, cart.user_id, 1, "increment", quantity=1, version=0)
+    with pytest.raises(cart_service.StaleCartVersion) as excinfo:
+        cart_service.change_cart_item(db, cart.user_id, 1, "increment", quantity=1, version=0)
+    assert excinfo.value.version == 1
+    assert cart_service.change_cart_item(db, 999_999_999, 1, "increment", quantity=1) is None
+
+def test_concurrent_increments_are_not_lost(cart):
+    def increment() -> None:
+        session = SessionLocal()
+        try:
+            for _ in range(25):
+                cart_repository.change_item(session, user_id=cart.user_id, product_id=1, op="increment", quantity=1)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    session = SessionLocal()
+    try:
+        current = cart_repository.get_by_user(session, user_id=cart.user_id)
+        assert current.products[0]["quantity"] == 2 + 100
+        assert current.version == 100
+    finally:
+        session.close()
+
+def test_whole_cart_writes_reject_a_cart_changed_since_it_was_read(db, cart):
+    loaded = cart_repository.get_by_user(db, user_id=cart.user_id)
+    other = SessionLocal()
+    try:
+        # A PATCH lands between this request's read and its write
+        assert cart_repository.change_item(other, user_id=cart.user_id, product_id=2, op="set", quantity=1).version == 1
+    finally:
+        other.close()
+
+    assert cart_repository.update(
+        db, db_obj=loaded, obj_in=CartUpdate(products=[CartItemBase(product_id=3, quantity=1)])
+    ) is None
+    assert cart_repository.remove_item(db, db_obj=loaded, product_id=2) is None
+    current = cart_repository.get_by_user(db, user_id=cart.user_id)
+    assert (current.version, [item["product_id"] for item in current.products]) == (1, [1, 2])
+
+    # Against what's there now, each write lands and moves the version on
+    merged = cart_repository.update(db, db_obj=current, obj_in=CartUpdate(products=[CartItemBase(product_id=3, quantity=1)]))
+    assert (merged.version, [item["product_id"] for item in merged.products]) == (2, [1, 2, 3])
+    removed = cart_repository.remove_item(db, db_obj=merged, product_id=2)
+    assert (removed.version, [item["product_id"] for item in removed.products]) == (3, [1, 3])
+    assert cart_repository.clear_cart(db, user_id=cart.user_id)
+    assert cart_repository.get_version(db, user_id=cart.user_id) == 4
+    assert not cart_repository.clear_cart(db, user_id=999_999_999)
+
+def test_service_merges_into_the_current_cart_and_bumps_past_patched_versions(db, cart, monkeypatch):
+    monkeypatch.setattr(cart_service, "cart_store", None)
+    change = cart_service.change_cart_item(db, cart.user_id, 2, "set", quantity=1, product_name="Onion")
+    merged = cart_service.create_or_update_cart(db, cart.user_id, [CartItemBase(product_id=3, quantity=1)])
+    assert [item["product_id"] for item in merged.products] == [1, 2, 3]
+    assert merged.version == change.version + 1
+    # A client still holding the PATCHed version is now stale
+    with pytest.raises(cart_service.StaleCartVersion):
+        cart_service.change_cart_item(db, cart.user_id, 2, "remove", version=change.version)
+
+def test_service_gives_up_with_stale_version_when_writes_keep_conflicting(db, cart, monkeypatch):
+    monkeypatch.setattr(cart_service, "cart_store", None)
+    monkeypatch.setattr(cart_repository, "remove_item", lambda db, *, db_obj, product_id: None)
+    with pytest.raises(cart_service.StaleCartVersion) as excinfo:
+        cart_service.remove_item_from_cart(db, cart.user_id, 1)
+    assert excinfo.value.version == 0
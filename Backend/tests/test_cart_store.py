@@ -0,0 +1,129 @@
+import pytest
+
+from app.db.cart_store import CartStore, MemoryCartStore, RedisCartStore
+
+def _cart(user_id, *products, version=0):
+    return {"user_id": user_id, "products": list(products), "version": version, "expires_at": "2026-01-01T00:00:00.000000"}
+
+def _bump(product):
+    return lambda cart: {**cart, "products": cart["products"] + [product], "version": cart["version"] + 1}
+
+class Writer:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    def __call__(self, carts):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.batches.append(sorted(cart["user_id"] for cart in carts))
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return MemoryCartStore(maxsize=10, flush_seconds=60, batch_size=2)
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCartStore("redis://test", ttl=60, flush_seconds=60, batch_size=2, client=fakeredis.FakeRedis())
+
+def test_cart_store_is_abstract():
+    with pytest.raises(TypeError):
+        CartStore(flush_seconds=1, batch_size=1)
+
+def test_repeated_changes_are_written_once_in_batches(store):
+    writer = Writer()
+    store.set_writer(writer)
+    for user_id in (1, 2, 3):
+        store.add(user_id, _cart(user_id))
+        for product_id in range(3):
+            store.update(user_id, _bump(product_id))
+    assert store.pending() == 3
+    assert store.flush() == 3
+    assert sorted(user_id for batch in writer.batches for user_id in batch) == [1, 2, 3]
+    assert all(len(batch) <= 2 for batch in writer.batches)
+    assert store.pending() == 0
+    assert store.flush() == 0
+
+def test_failed_write_keeps_carts_dirty(store):
+    store.set_writer(Writer(fail=True))
+    store.update(1, _bump(7), default=_cart(1))
+    assert store.flush() == 0
+    assert store.pending() == 1
+    writer = Writer()
+    store.set_writer(writer)
+    assert store.flush() == 1
+    assert writer.batches == [[1]]
+
+def test_discard_keeps_dirty_carts(store):
+    store.add(1, _cart(1))
+    store.update(2, _bump(7), default=_cart(2))
+    store.discard([1, 2])
+    assert store.get(1) is None
+    assert store.get(2)["products"] == [7]
+
+def test_memory_store_never_evicts_dirty_carts():
+    store = MemoryCartStore(maxsize=2, flush_seconds=60, batch_size=10)
+    store.update(1, _bump(1), default=_cart(1))
+    store.update(2, _bump(2), default=_cart(2))
+    store.add(3, _cart(3))
+    assert store.get(1) is not None and store.get(2) is not None
+
+def test_redis_claims_left_by_a_crashed_flush_are_recovered():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    crashed = RedisCartStore("redis://test", ttl=60, flush_seconds=60, batch_size=10, client=client)
+    crashed.update(1, _bump(7), default=_cart(1))
+    assert [cart["user_id"] for cart in crashed.take_dirty(10)] == [1]  # then the worker dies
+    assert crashed.pending() == 0
+
+    store = RedisCartStore("redis://test", ttl=60, flush_seconds=60, batch_size=10, client=client)
+    writer = Writer()
+    store.set_writer(writer)
+    assert store.recover() == 1
+    assert store.flush() == 1
+    assert writer.batches == [[1]]
+    assert store.stats()["claimed"] == 0
+
+def test_memory_store_keeps_claimed_carts_until_their_write_lands():
+    store = MemoryCartStore(maxsize=2, flush_seconds=60, batch_size=10)
+    store.update(1, _bump(1), default=_cart(1))
+    claimed = store.take_dirty(10)
+    # Other carts come and go while the write is in flight
+    for user_id in (2, 3, 4):
+        store.add(user_id, _cart(user_id))
+    store.discard([1])
+    assert store.get(1) is not None
+    store.mark_dirty(claimed)  # the write failed
+    writer = Writer()
+    store.set_writer(writer)
+    assert store.flush() == 1
+    assert writer.batches == [[1]]
+    store.add(5, _cart(5))
+    store.add(6, _cart(6))
+    assert store.get(1) is None  # evictable once written
+
+def test_redis_release_leaves_a_claim_on_a_changed_cart_to_its_new_owner():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    first = RedisCartStore("redis://test", ttl=60, flush_seconds=60, batch_size=10, client=client)
+    second = RedisCartStore("redis://test", ttl=60, flush_seconds=60, batch_size=10, client=client)
+    first.update(1, _bump(7), default=_cart(1))
+    taken = first.take_dirty(10)
+    # The cart changes and another worker claims it while the first write is in flight
+    first.update(1, _bump(8))
+    retaken = second.take_dirty(10)
+    assert [cart["version"] for cart in retaken] == [2]
+
+    first.written(taken)
+    assert second.stats()["claimed"] == 1  # still second's claim; a crash now would be recovered
+    second.written(retaken)
+    assert second.stats()["claimed"] == 0 and second.pending() == 0
+
+def test_redis_failed_write_of_a_changed_cart_keeps_it_dirty():
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisCartStore("redis://test", ttl=60, flush_seconds=60, batch_size=10, client=fakeredis.FakeRedis())
+    store.update(1, _bump(7), default=_cart(1))
+    taken = store.take_dirty(10)
+    store.update(1, _bump(8))
+    store.mark_dirty(taken)
+    assert store.pending() == 1
+    assert [cart["version"] for cart in store.take_dirty(10)] == [2]
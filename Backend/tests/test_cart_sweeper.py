@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.db.base import engine
+from app.models.schemas import CartCreate
+from app.repositories.cart_repository import cart_repository
+from app.services.cart_sweeper import CartSweeper, _TRY_LOCK, _UNLOCK
+
+# The test's expired carts expire before this; no real cart does, so a sweep
+# cut off here only takes the test's own rows
+CUTOFF = datetime(2000, 1, 1)
+
+@pytest.fixture(autouse=True)
+def only_test_carts(monkeypatch):
+    sweep_expired = cart_repository.sweep_expired
+    monkeypatch.setattr(
+        cart_repository, "sweep_expired",
+        lambda db, *, before, limit, archive=False: sweep_expired(db, before=CUTOFF, limit=limit, archive=archive),
+    )
+
+def _cart(db, user_id, expires_at: datetime) -> int:
+    cart = cart_repository.create(db, obj_in=CartCreate(user_id=user_id, products=[]))
+    db.execute(
+        text("UPDATE carts SET expires_at = :expires_at WHERE cart_id = :cart_id"),
+        {"expires_at": expires_at, "cart_id": cart.cart_id},
+    )
+    db.commit()
+    return cart.cart_id
+
+def _exists(db, cart_id) -> bool:
+    return db.execute(text("SELECT 1 FROM carts WHERE cart_id = :cart_id"), {"cart_id": cart_id}).scalar() is not None
+
+def test_only_the_lock_holder_sweeps_and_live_carts_stay(db, make_user):
+    expired = _cart(db, make_user(), CUTOFF - timedelta(days=1))
+    live = _cart(db, make_user(), datetime.now() + timedelta(days=1))
+    sweeper = CartSweeper(interval_seconds=60, jitter_seconds=0, batch_size=500, max_batches=20)
+
+    # Another worker is sweeping
+    with engine.connect() as leader:
+        assert leader.scalar(_TRY_LOCK)
+        assert sweeper.sweep() is None
+        assert sweeper.skipped == 1
+        assert _exists(db, expired)
+        leader.execute(_UNLOCK)
+        leader.commit()
+
+    assert sweeper.sweep() == 1
+    assert not _exists(db, expired)
+    assert _exists(db, live)
+
+def test_a_run_is_bounded_by_batch_size_and_max_batches(db, make_user):
+    for days in range(3):
+        _cart(db, make_user(), CUTOFF - timedelta(days=days + 1))
+    sweeper = CartSweeper(interval_seconds=60, jitter_seconds=0, batch_size=1, max_batches=2)
+    assert sweeper.sweep() == 2
+    assert sweeper.stats()["last_run"]["batches"] == 2
+    assert sweeper.sweep() == 1
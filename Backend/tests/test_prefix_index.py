@@ -0,0 +1,57 @@
+import random
+import string
+
+from app.utils.prefix_index import PrefixIndex
+
+def test_matches_any_word_start_and_ranks_by_score():
+    index = PrefixIndex()
+    index.build([
+        ("tomato-red", ["Tomato Red"], 5.0),
+        ("tomato-cherry", ["Cherry Tomato"], 9.0),
+        ("red-onion", ["Red  Onion"], 1.0),
+        ("potato", ["Potato"], 20.0),
+    ])
+    assert index.search("tom") == ["tomato-cherry", "tomato-red"]
+    assert index.search("red") == ["tomato-red", "red-onion"]
+    assert index.search("TOMATO   red") == ["tomato-red"]
+    assert index.search("tom", limit=1) == ["tomato-cherry"]
+    assert index.search("xyz") == []
+    assert index.search("   ") == []
+
+def test_add_and_remove_update_results_and_short_prefix_memo():
+    index = PrefixIndex(memo_length=2)
+    index.build([("a", ["Apple"], 1.0)])
+    assert index.search("ap") == ["a"]
+    index.add("b", ["Apricot"], 2.0)
+    assert index.search("ap") == ["b", "a"]
+    index.add("a", ["Banana"], 1.0)  # replaces a's texts
+    assert index.search("ap") == ["b"]
+    assert index.search("ban") == ["a"]
+    index.remove("b")
+    assert index.search("ap") == []
+    assert len(index) == 1
+
+def test_large_index_finds_entries_anywhere_in_term_order():
+    # 100k products (300k terms); "zucc" sorts near the end of the term list.
+    # Lookup latency is measured by scripts/bench_prefix_index.py.
+    rng = random.Random(1)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(20000)]
+    entries = [(i, [" ".join(rng.choices(words, k=3))], rng.random()) for i in range(100000)]
+    entries += [("zucchini", ["Zucchini Green"], 5.0), ("zucchini-baby", ["Baby Zucchini"], 3.0)]
+    index = PrefixIndex()
+    index.build(entries)
+
+    assert index.search("zucc") == ["zucchini", "zucchini-baby"]
+    assert index.search("zucc", limit=1) == ["zucchini"]
+    assert index.search("zucchini gr") == ["zucchini"]
+    assert index.search("baby zu") == ["zucchini-baby"]
+    results = index.search("a", limit=5)
+    assert len(results) == 5
+    scores = [index.score(key) for key in results]
+    assert scores == sorted(scores, reverse=True)
+
+def test_long_prefixes_rank_only_the_first_scan_limit_terms():
+    index = PrefixIndex(scan_limit=2)
+    index.build([("a", ["pear a"], 1.0), ("b", ["pear b"], 2.0), ("c", ["pear c"], 3.0)])
+    assert index.search("pear") == ["b", "a"]
+    assert index.search("pear c") == ["c"]
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from app.models.schemas import PricedCart
+from app.services.cart_service import _priced
+
+def _product(product_id, price, stock, name="Tomato"):
+    return SimpleNamespace(product_id=product_id, product_name=name, product_price=price, stock_quantity=stock)
+
+def _cart(*items):
+    return SimpleNamespace(cart_id=1, user_id=1, version=3, products=list(items))
+
+def test_prices_lines_and_total():
+    cart = _cart({"product_id": 1, "product_name": None, "quantity": 3}, {"product_id": 2, "product_name": "Onion", "quantity": 5})
+    priced = _priced(cart, {1: _product(1, 40, 10), 2: _product(2, 25, 4, "Onion")})
+    assert [(line["unit_price"], line["line_total"], line["available"]) for line in priced["products"]] == [
+        (40, 120, True), (25, 125, False),
+    ]
+    assert priced["products"][0]["product_name"] == "Tomato"
+    assert priced["total"] == 245
+    assert priced["available"] is False
+    PricedCart.model_validate(priced)
+
+def test_missing_and_null_columns_are_unavailable_not_errors():
+    cart = _cart(
+        {"product_id": 1, "product_name": None, "quantity": 1},
+        {"product_id": 2, "product_name": None, "quantity": 1},
+        {"product_id": 3, "product_name": None, "quantity": 1},
+    )
+    # 1 has no price, 2 has no stock figure, 3 no longer exists
+    priced = _priced(cart, {1: _product(1, None, 10), 2: _product(2, 30, None)})
+    lines = priced["products"]
+    assert (lines[0]["unit_price"], lines[0]["line_total"], lines[0]["available"]) == (None, 0, False)
+    assert (lines[1]["unit_price"], lines[1]["stock_quantity"], lines[1]["available"]) == (30, 0, False)
+    assert (lines[2]["unit_price"], lines[2]["available"]) == (None, False)
+    assert priced["total"] == 30
+    PricedCart.model_validate(priced)
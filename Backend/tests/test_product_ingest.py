@@ -0,0 +1,47 @@
+import io
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from app.services.admin_service import ingest_products_from_excel
+
+PREFIX = "ingest-test "
+
+def _row(name, **values):
+    return {
+        "product_name": name, "product_category": "vegetables", "product_description": "fresh",
+        "product_weight": 1, "product_price": 10, "stock_quantity": 5, "images": "a.png", "ratings": 4.0,
+        **values,
+    }
+
+def _sheet(*rows) -> bytes:
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+@pytest.fixture
+def names(db):
+    yield
+    db.rollback()
+    db.execute(text("DELETE FROM products WHERE product_name LIKE :prefix"), {"prefix": PREFIX + "%"})
+    db.commit()
+
+def test_bad_rows_are_skipped_and_reported_without_losing_their_batch(db, names):
+    sheet = _sheet(
+        _row(PREFIX + "tomato"),
+        _row(PREFIX + "onion", product_price=float("nan")),
+        _row(None),
+        _row(PREFIX + "potato", ratings=None),
+    )
+    result = ingest_products_from_excel(db, sheet)
+    assert (result["success"], result["products_added"], result["products_updated"]) == (True, 2, 0)
+    assert [skipped["row"] for skipped in result["rows_skipped"]] == [3, 4]
+
+    # The same sheet again updates the good rows, still one statement per chunk
+    result = ingest_products_from_excel(db, sheet)
+    assert (result["products_added"], result["products_updated"]) == (0, 2)
+    ratings = dict(db.execute(
+        text("SELECT product_name, ratings FROM products WHERE product_name LIKE :prefix"), {"prefix": PREFIX + "%"}
+    ).all())
+    assert ratings == {PREFIX + "tomato": 4.0, PREFIX + "potato": 0.0}
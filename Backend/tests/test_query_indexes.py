@@ -0,0 +1,69 @@
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.base import SessionLocal
+from app.models.models import Product
+from app.models.schemas import CartCreate, CartItemBase
+from app.repositories import cart_repository as carts
+from app.repositories import order_repository as orders
+from app.repositories import product_repository as products
+
+def explain(db: Session, stmt, params) -> str:
+    """
+    The plan Postgres picks for a repository statement. Sequential scans are
+    disabled for the transaction so tables too small to bother with an index
+    still show whether one can serve the query.
+    """
+    compiled = stmt.compile(dialect=db.get_bind().dialect)
+    cursor = db.connection().connection.cursor()
+    cursor.execute("SET LOCAL enable_seqscan = off")
+    cursor.execute("EXPLAIN " + compiled.string, compiled.construct_params(params))
+    return "\n".join(row[0] for row in cursor.fetchall())
+
+def test_cart_by_user_uses_unique_index(db):
+    assert "ix_carts_user_id" in explain(db, carts._BY_USER, {"user_id": 1})
+
+def test_orders_by_user_use_user_created_at_index(db):
+    stmt, params = orders._user_page(1, skip=0, limit=20, after=None)
+    assert "ix_orders_user_id_created_at" in explain(db, stmt, params)
+
+def test_products_by_category_use_category_index(db):
+    stmt, params = products._category_page("vegetables", skip=0, limit=20, after=None)
+    assert "ix_products_product_category" in explain(db, stmt, params)
+
+def test_product_by_name_uses_name_index(db):
+    stmt = select(Product).where(Product.product_name == "Tomato").limit(1)
+    assert "ix_products_product_name" in explain(db, stmt, {})
+
+def test_concurrent_first_carts_merge_instead_of_conflicting(database, user_id):
+    # Both creates race on the unique carts.user_id index
+    barrier = threading.Barrier(2)
+    errors = []
+
+    def create(product_id: int) -> None:
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            carts.cart_repository.create(
+                session, obj_in=CartCreate(user_id=user_id, products=[CartItemBase(product_id=product_id, quantity=1)])
+            )
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=create, args=(product_id,)) for product_id in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    session = SessionLocal()
+    try:
+        cart = carts.cart_repository.get_by_user(session, user_id=user_id)
+        assert sorted(item["product_id"] for item in cart.products) == [1, 2]
+    finally:
+        session.close()
@@ -0,0 +1,45 @@
+import orjson
+import pytest
+
+from app.services import suggest_service
+from app.utils.prefix_index import PrefixIndex
+
+@pytest.fixture(autouse=True)
+def index(monkeypatch):
+    # Restored after each test
+    for name, value in [("_index", PrefixIndex()), ("_suggestions", {}), ("_units", {}), ("_product_categories", {})]:
+        monkeypatch.setattr(suggest_service, name, value)
+    suggest_service._rebuild([
+        (1, "Tomato", "vegetables", 4.0),
+        (2, "Potato", "vegetables", 2.0),
+        (3, "Mango", "fruits", 5.0),
+    ], units={1: 10, 2: 1, 3: 3})
+
+def _suggest(query):
+    return [(item["kind"], item["text"]) for item in orjson.loads(suggest_service._search(query, 10).body)]
+
+def _update(*rows, product_ids=None):
+    work = (suggest_service._generation, set(product_ids or [row[0] for row in rows]))
+    suggest_service._update(work, rows)
+
+def test_moving_a_product_moves_its_category_score():
+    assert suggest_service._index.score(("category", "vegetables")) == pytest.approx(11.6)
+    _update((1, "Tomato", "fruits", 4.0))
+    assert suggest_service._index.score(("category", "vegetables")) == pytest.approx(1.2)
+    assert suggest_service._index.score(("category", "fruits")) == pytest.approx(13.9)
+    assert _suggest("fru") == [("category", "fruits")]
+
+def test_a_category_goes_with_its_last_product():
+    _update((3, "Mango", "tropical", 5.0))
+    assert _suggest("fru") == []
+    assert _suggest("trop") == [("category", "tropical")]
+    _update(product_ids=[3])  # deleted
+    assert _suggest("trop") == []
+    assert _suggest("man") == []
+    assert _suggest("veg") == [("category", "vegetables")]
+
+def test_patches_claimed_before_a_rebuild_are_dropped():
+    work = (suggest_service._generation - 1, {1})
+    suggest_service._update(work, [(1, "Tomato Cherry", "vegetables", 4.0)])
+    assert _suggest("cherry") == []
+    assert _suggest("tom") == [("product", "Tomato")]